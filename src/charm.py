@@ -5,64 +5,109 @@
 """Charmed Machine Operator for Apache Opensearch Dashboards."""
 
 import logging
-import time
-
-from charms.grafana_agent.v0.cos_agent import COSAgentProvider
-from charms.rolling_ops.v0.rollingops import RollingOpsManager
-from ops.charm import CharmBase, InstallEvent, SecretChangedEvent
-from ops.framework import EventBase
+import os
+from fnmatch import fnmatch
+from functools import cached_property
+from typing import TYPE_CHECKING
+
+from ops.charm import (
+    CharmBase,
+    ConfigChangedEvent,
+    InstallEvent,
+    RelationEvent,
+    SecretChangedEvent,
+    UpdateStatusEvent,
+)
+from ops.framework import EventBase, StoredState
 from ops.main import main
-from ops.model import BlockedStatus, MaintenanceStatus, WaitingStatus
+from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 
+from core.breaker import BREAKER_STATES
+from core.client import HTTPClient
 from core.cluster import ClusterState
+from deadline import deadline, hook_budget
 from events.requirer import RequirerEvents
-from events.tls import TLSEvents
-from events.upgrade import ODUpgradeEvents, OpensearchDashboardsDependencyModel
-from helpers import clear_global_status, clear_status, set_global_status
+from helpers import clear_global_status, clear_status, set_global_status, set_status
 from literals import (
+    CERTS_REL_NAME,
     CHARM_KEY,
     COS_PORT,
     COS_RELATION_NAME,
-    DEPENDENCIES,
+    MAX_RECONCILE_PASSES,
     MSG_APP_STATUS,
     MSG_INCOMPATIBLE_UPGRADE,
+    MSG_INSTALL_FAILED,
     MSG_INSTALLING,
     MSG_STARTING,
     MSG_STARTING_SERVER,
     MSG_STATUS_DB_MISSING,
+    MSG_STATUS_DEGRADED,
     MSG_TLS_CONFIG,
     MSG_UNIT_STATUS,
     MSG_WAITING_FOR_PEER,
     PEER,
-    RESTART_TIMEOUT,
     SERVER_PORT,
     SUBSTRATE,
+    WORK_INSTALL,
+    WORK_OPENSEARCH_CA,
+    WORK_START,
 )
 from managers.api import APIManager
 from managers.config import ConfigManager
 from managers.health import HealthManager
+from managers.locality import LocalityManager
+from managers.metrics import MetricsManager
+from managers.reconcile import ReconcileManager
 from managers.tls import TLSManager
 from managers.upgrade import UpgradeManager
+from timing import timer
 from workload import ODWorkload
 
+if TYPE_CHECKING:
+    from charms.grafana_agent.v0.cos_agent import COSAgentProvider
+    from charms.rolling_ops.v0.rollingops import RollingOpsManager
+
+    from events.tls import TLSEvents
+    from events.upgrade import ODUpgradeEvents
+
 logger = logging.getLogger(__name__)
 
+# Components only built (and their libs only imported) for the hooks/actions they observe
+LAZY_COMPONENTS = {
+    "tls_events": [
+        f"{CERTS_REL_NAME}-relation-*",
+        "config-changed",
+        "secret-expired",
+        "set-tls-private-key",
+    ],
+    "upgrade_events": ["upgrade-relation-*", "upgrade-charm", "pre-upgrade-check"],
+    "restart": ["restart-relation-*", "leader-elected"],
+    "cos_integration": [f"{COS_RELATION_NAME}-relation-*", "config-changed"],
+}
+
 
 class OpensearchDasboardsCharm(CharmBase):
     """Charmed Operator for Opensearch Dashboards."""
 
+    _stored = StoredState()
+
     def __init__(self, *args):
         super().__init__(*args)
         self.name = CHARM_KEY
+        self._reconcile_requests: list[EventBase] = []
+        # the charm's own services are not started again once the unit is going away
+        self._removing = False
+
+        # observed ahead of ClusterState, so state written by the reconcile is flushed too
+        self.framework.observe(self.framework.on.pre_commit, self._on_pre_commit)
         self.state = ClusterState(self, substrate=SUBSTRATE)
         self.workload = ODWorkload()
+        # keep-alive connections shared by all managers for the hook
+        self.http_client = HTTPClient()
 
         # --- CHARM EVENT HANDLERS ---
 
-        self.tls_events = TLSEvents(self)
         self.requirer_events = RequirerEvents(self)
-        dependency_model = OpensearchDashboardsDependencyModel(**DEPENDENCIES)
-        self.upgrade_events = ODUpgradeEvents(self, dependency_model=dependency_model)
 
         # --- MANAGERS ---
 
@@ -73,32 +118,54 @@ class OpensearchDasboardsCharm(CharmBase):
             state=self.state, workload=self.workload, substrate=SUBSTRATE, config=self.config
         )
         self.api_manager = APIManager(
-            state=self.state, workload=self.workload, substrate=SUBSTRATE
+            state=self.state,
+            workload=self.workload,
+            substrate=SUBSTRATE,
+            client=self.http_client,
         )
         self.health_manager = HealthManager(
-            state=self.state, workload=self.workload, substrate=SUBSTRATE
+            state=self.state,
+            workload=self.workload,
+            substrate=SUBSTRATE,
+            config=self.config,
+            stored=self._stored,
+            client=self.http_client,
+        )
+        self.locality_manager = LocalityManager(
+            state=self.state,
+            workload=self.workload,
+            substrate=SUBSTRATE,
+            client=self.http_client,
         )
         self.upgrade_manager = UpgradeManager(
+            state=self.state, workload=self.workload, substrate=SUBSTRATE
+        )
+        self.reconcile_manager = ReconcileManager(
             state=self.state,
             workload=self.workload,
             substrate=SUBSTRATE,
-            dependency_model=dependency_model,
+            config=self.config,
+            stored=self._stored,
+        )
+        self.metrics_manager = MetricsManager(
+            state=self.state, workload=self.workload, substrate=SUBSTRATE, config=self.config
         )
 
-        # --- LIB EVENT HANDLERS ---
+        # every blocking call of the hook draws from its budget, during a Juju dispatch
+        dispatch_path = os.environ.get("JUJU_DISPATCH_PATH", "")
+        deadline.start(
+            hook_budget(dispatch_path.split("/")[-1], str(self.config.get("hook_deadlines", "")))
+            if os.environ.get("JUJU_CONTEXT_ID")
+            else None
+        )
 
-        self.restart = RollingOpsManager(self, relation="restart", callback=self._restart)
+        timer.enabled = self.metrics_manager.enabled
 
-        # --- COS ---
-        self.cos_integration = COSAgentProvider(
-            self,
-            relation_name=COS_RELATION_NAME,
-            metrics_endpoints=[],
-            scrape_configs=self._scrape_config,
-            refresh_events=[self.on.config_changed],
-            metrics_rules_dir="./src/alert_rules/prometheus",
-            log_slots=["opensearch-dashboards:logs"],
-        )
+        # --- LIB EVENT HANDLERS ---
+
+        # TLS, upgrade, rolling restart and COS handlers are only built when observing
+        for component in self._eager_components():
+            getattr(self, component)
 
         # --- CORE EVENTS ---
 
@@ -116,28 +183,148 @@ class OpensearchDasboardsCharm(CharmBase):
 
         self.framework.observe(getattr(self.on, "secret_changed"), self._on_secret_changed)
 
+        self.framework.observe(getattr(self.on, "stop"), self._on_remove)
+        self.framework.observe(getattr(self.on, "remove"), self._on_remove)
+
+        self.framework.observe(self.framework.on.commit, self._on_commit)
+
+    # --- LAZY COMPONENTS ---
+
+    @cached_property
+    def tls_events(self) -> "TLSEvents":
+        """Event handlers for the `certificates` relation."""
+        from events.tls import TLSEvents
+
+        return TLSEvents(self)
+
+    @cached_property
+    def upgrade_events(self) -> "ODUpgradeEvents":
+        """Event handlers for in-place upgrades."""
+        from events.upgrade import ODUpgradeEvents
+
+        return ODUpgradeEvents(self, dependency_model=self.upgrade_manager.dependency_model)
+
+    @cached_property
+    def restart(self) -> "RollingOpsManager":
+        """Rolling restarts across units."""
+        from charms.rolling_ops.v0.rollingops import RollingOpsManager
+
+        return RollingOpsManager(self, relation="restart", callback=self._restart)
+
+    @cached_property
+    def cos_integration(self) -> "COSAgentProvider":
+        """COS integration via the grafana-agent subordinate."""
+        from charms.grafana_agent.v0.cos_agent import COSAgentProvider
+
+        return COSAgentProvider(
+            self,
+            relation_name=COS_RELATION_NAME,
+            metrics_endpoints=[],
+            scrape_configs=self._scrape_config,
+            refresh_events=[self.on.config_changed],
+            metrics_rules_dir="./src/alert_rules/prometheus",
+            log_slots=["opensearch-dashboards:logs"],
+        )
+
+    def _eager_components(self) -> list[str]:
+        """The lazy components that need to observe the current dispatch.
+
+        Everything is built when the dispatched event is unknown (e.g. under Harness).
+        The rolling restart and upgrade libs only defer events while their peer relation
+        is missing, so deferred events are re-emitted by its `relation-created` hook,
+        which builds them.
+        """
+        dispatch_path = os.environ.get("JUJU_DISPATCH_PATH", "")
+        if not dispatch_path:
+            return list(LAZY_COMPONENTS)
+
+        event = dispatch_path.split("/")[-1]
+        return [
+            component
+            for component, triggers in LAZY_COMPONENTS.items()
+            if any(fnmatch(event, trigger) for trigger in triggers)
+        ]
+
     # --- CORE EVENT HANDLERS ---
 
     def _on_install(self, event: InstallEvent) -> None:
         """Handler for the `on_install` event."""
-        self.unit.status = MaintenanceStatus(MSG_INSTALLING)
+        set_status(self.unit, MaintenanceStatus(MSG_INSTALLING))
 
+        # retried by the reconcile of the next hooks until it succeeds
         install = self.workload.install()
         if not install:
-            self.unit.status = BlockedStatus("unable to install Opensearch Dashboards")
+            set_status(self.unit, BlockedStatus(MSG_INSTALL_FAILED))
+            self.state.work_queue.add(WORK_INSTALL)
+            return
 
         # don't complete install until passwords set
         if not self.state.peer_relation:
-            self.unit.status = WaitingStatus(MSG_WAITING_FOR_PEER)
-            event.defer()
+            set_status(self.unit, WaitingStatus(MSG_WAITING_FOR_PEER))
+            self.state.work_queue.add(WORK_INSTALL)
             return
         clear_status(self.unit, [MSG_INSTALLING, MSG_WAITING_FOR_PEER])
 
     def reconcile(self, event: EventBase) -> None:
-        """Generic handler for all 'something changed, update' events across all relations."""
+        """Generic handler for all 'something changed, update' events across all relations.
+
+        During a Juju dispatch, this only requests a reconcile: however many times it is
+        requested, it runs once when all handlers are done, on the most recent state.
+        """
+        if not os.environ.get("JUJU_CONTEXT_ID"):
+            self._reconcile(event)
+            return
+
+        self._reconcile_requests.append(event)
+
+    def _on_pre_commit(self, _: EventBase) -> None:
+        """Handler for the framework `pre_commit` event, running the requested reconcile."""
+        for _ in range(MAX_RECONCILE_PASSES):
+            if not self._reconcile_requests:
+                return
+
+            requests, self._reconcile_requests = self._reconcile_requests, []
+            logger.debug(f"Reconciling once for {len(requests)} request(s)")
+
+            # a departing unit must not restart, whichever request came last
+            event = next(
+                (
+                    request
+                    for request in requests
+                    if getattr(request, "departing_unit", None) == self.unit
+                ),
+                requests[-1],
+            )
+            self._reconcile(event)
+
+        if self._reconcile_requests:
+            logger.warning("Reconcile kept requesting itself, leaving it to the next hook")
+            self._reconcile_requests = []
+
+    def _reconcile(self, event: EventBase) -> None:
+        """Reconciles the unit with the current state."""
+        # re-rank the Opensearch endpoints, if due: a new order is a change to apply
+        self.locality_manager.refresh()
+
+        # 0. Skip if nothing changed since the last healthy run, and both services still are
+        if (
+            not self._drain_work()
+            and isinstance(event, (UpdateStatusEvent, ConfigChangedEvent, RelationEvent))
+            and self.reconcile_manager.unchanged(healthy=self._still_healthy)
+        ):
+            return
+
+        # nothing to run until the install completes
+        if WORK_INSTALL in self.state.work_queue.pending:
+            return
+
+        # the credentials and endpoints the sidecar probes with only change with the inputs
+        if os.environ.get("JUJU_CONTEXT_ID"):
+            self.health_manager.ensure_sidecar()
+
         # 1. Block until peer relation is set
         if not self.state.peer_relation:
-            self.unit.status = WaitingStatus(MSG_WAITING_FOR_PEER)
+            set_status(self.unit, WaitingStatus(MSG_WAITING_FOR_PEER))
             return
 
         outdated_status = [MSG_WAITING_FOR_PEER]
@@ -146,6 +333,10 @@ class OpensearchDasboardsCharm(CharmBase):
         if not self.state.unit_server.started:
             self.init_server()
 
+        # a start still queued has not happened yet
+        if WORK_START not in self.state.work_queue.pending:
+            outdated_status.append(MSG_STARTING)
+
         # don't delay scale-down leader ops by restarting dying unit
         if getattr(event, "departing_unit", None) == self.unit:
             return
@@ -183,7 +374,7 @@ class OpensearchDasboardsCharm(CharmBase):
             if self.state.unit_server.tls and self.tls_manager.certificate_valid():
                 outdated_status.append(MSG_TLS_CONFIG)
             else:
-                self.unit.status = MaintenanceStatus(MSG_TLS_CONFIG)
+                set_status(self.unit, MaintenanceStatus(MSG_TLS_CONFIG))
                 return
         else:
             outdated_status.append(MSG_TLS_CONFIG)
@@ -201,11 +392,12 @@ class OpensearchDasboardsCharm(CharmBase):
         unit_healthy, unit_msg = self.health_manager.unit_healthy()
 
         if not unit_healthy:
-            self.unit.status = BlockedStatus(unit_msg)
+            set_status(self.unit, BlockedStatus(unit_msg))
             return
 
-        if unit_msg:
-            self.unit.status = WaitingStatus(unit_msg)
+        degraded = unit_msg.startswith(MSG_STATUS_DEGRADED.format(""))
+        if unit_msg and not degraded:
+            set_status(self.unit, WaitingStatus(unit_msg))
             return
         else:
             outdated_status += MSG_UNIT_STATUS
@@ -214,8 +406,28 @@ class OpensearchDasboardsCharm(CharmBase):
         for status in outdated_status:
             clear_global_status(self, status)
 
+        # serving, but not healthy enough to be left alone by the fast path
+        if degraded:
+            set_status(self.unit, ActiveStatus(unit_msg))
+            return
+
+        # no longer degraded, showing the applied runtime options instead
+        runtime = self.config_manager.runtime_summary
+        if isinstance(self.unit.status, ActiveStatus) and self.unit.status.message != runtime:
+            set_status(self.unit, ActiveStatus(runtime))
+
+        self.reconcile_manager.set_healthy()
+
+    def _still_healthy(self) -> bool:
+        """Whether Opensearch and the unit pass their health checks, cached within their TTL."""
+        return self.health_manager.app_healthy() == (True, "") and (
+            self.health_manager.unit_healthy() == (True, "")
+        )
+
     def _on_secret_changed(self, event: SecretChangedEvent):
         """Reconfigure services on a secret changed event."""
+        self.state.secret_cache.bump(event.secret.id, event.secret.label)
+
         if not event.secret.label:
             return
 
@@ -238,19 +450,67 @@ class OpensearchDasboardsCharm(CharmBase):
             logger.info(f"Secret {event.secret.label} changed.")
             self.reconcile(event)
 
+    def _on_commit(self, _: EventBase) -> None:
+        """Handler for the framework `commit` event, recording the hook's timings."""
+        http_stats = self.http_client.stats
+        self.http_client.close()
+        reconcile_counters = self.reconcile_manager.pop_counters()
+        if http_stats["requests"]:
+            logger.debug(f"HTTP connections used by the hook: {http_stats}")
+
+        if self._removing:
+            return
+
+        # the metrics of each worker are exported whether hooks are timed or not
+        if not self.metrics_manager.enabled and not self.config_manager.workers.enabled:
+            self.metrics_manager.stop_exporter()
+            return
+
+        gauges = {
+            "health_breaker_state": {
+                target: BREAKER_STATES[state]
+                for target, state in self.health_manager.breaker_states.items()
+            }
+        }
+        for worker, metrics in enumerate(self.health_manager.worker_metrics):
+            for name, value in metrics.items():
+                gauges.setdefault(f"dashboards_worker_{name}", {})[f"worker-{worker}"] = value
+        if self.health_manager.cold_start:
+            gauges["dashboards_cold_start_seconds"] = self.health_manager.cold_start
+
+        if self.metrics_manager.enabled:
+            dispatch_path = os.environ.get("JUJU_DISPATCH_PATH", "unknown")
+            self.metrics_manager.record(
+                event=dispatch_path.split("/")[-1],
+                counters={
+                    **{f"http_{name}": count for name, count in http_stats.items()},
+                    **reconcile_counters,
+                },
+                gauges=gauges,
+                rtts=self.locality_manager.samples,
+            )
+        else:
+            self.metrics_manager.record_gauges(gauges)
+        self.metrics_manager.ensure_exporter()
+
+    def _on_remove(self, _: EventBase) -> None:
+        """Handler for the `stop` and `remove` events, stopping the charm's own services."""
+        self._removing = True
+        self.health_manager.stop_sidecar()
+        self.metrics_manager.stop_exporter()
+
     def _start(self, event: EventBase) -> None:
         """Forces a rolling-restart event.
 
         Necessary for ensuring that `on_start` restarts roll.
         """
         # if not self.state.peer_relation or not self.state.stable or not self.upgrade_events.idle:
-        self.unit.status = MaintenanceStatus(MSG_STARTING)
+        set_status(self.unit, MaintenanceStatus(MSG_STARTING))
         if not self.state.peer_relation or not self.state.stable:
-            event.defer()
+            self.state.work_queue.add(WORK_START)
             return
 
         self.reconcile(event)
-        clear_status(self.unit, MSG_STARTING)
 
     def _restart(self, event: EventBase) -> None:
         """Handler for emitted restart events."""
@@ -262,28 +522,74 @@ class OpensearchDasboardsCharm(CharmBase):
             return
 
         logger.info(f"{self.unit.name} restarting...")
+        # a single worker takes the port of the load balancer back, several give it to it
+        workers = self.config_manager.workers
+        if not workers.enabled:
+            self.config_manager.set_load_balancer()
+        self.workload.set_workers(workers.count)
         self.workload.restart()
+        if workers.enabled:
+            self.config_manager.set_load_balancer()
+        self.health_manager.invalidate()
 
-        start_time = time.time()
-        while not self.workload.alive() and time.time() - start_time < RESTART_TIMEOUT:
-            time.sleep(5)
+        # holding the rolling lock until serving, so only one unit at a time is not
+        if not self.health_manager.wait_until_ready():
+            logger.warning(f"{self.unit.name} not serving yet, releasing the restart lock")
 
         clear_status(self.unit, [MSG_STARTING, MSG_STARTING_SERVER])
         self.on.update_status.emit()
 
     # --- CONVENIENCE METHODS ---
 
+    def _drain_work(self) -> bool:
+        """Runs the queued work whose preconditions now hold.
+
+        Returns:
+            True if any work was run
+        """
+        pending = self.state.work_queue.pending
+        if not pending:
+            return False
+
+        # the install stays queued until the snap is installed
+        if WORK_INSTALL in pending and not self.workload.up_to_date:
+            if not self.workload.install():
+                set_status(self.unit, BlockedStatus(MSG_INSTALL_FAILED))
+                return False
+
+        if not self.state.peer_relation:
+            return False
+
+        if WORK_INSTALL in pending:
+            clear_status(self.unit, [MSG_INSTALLING, MSG_WAITING_FOR_PEER, MSG_INSTALL_FAILED])
+            self.state.work_queue.done(WORK_INSTALL)
+
+        if not self.state.stable:
+            return WORK_INSTALL in pending
+
+        # the reconcile this runs in completes the start and applies the CA
+        if WORK_START in pending:
+            self.state.work_queue.done(WORK_START)
+
+        if WORK_OPENSEARCH_CA in pending:
+            self.requirer_events.write_opensearch_ca()
+
+        return True
+
     def init_server(self):
         """Calls startup functions for server start."""
-        self.unit.status = MaintenanceStatus(MSG_STARTING_SERVER)
+        set_status(self.unit, MaintenanceStatus(MSG_STARTING_SERVER))
         logger.info(f"{self.unit.name} initializing...")
 
         logger.debug("setting properties")
         self.config_manager.set_dashboard_properties()
+        self.config_manager.set_runtime_environment()
+        self.workload.set_workers(self.config_manager.workers.count)
 
         logger.debug("starting Opensearch Dashboards service")
 
         self.workload.start()
+        self.config_manager.set_load_balancer()
 
         # open port
         self.unit.open_port("tcp", port=SERVER_PORT)
@@ -296,11 +602,11 @@ class OpensearchDasboardsCharm(CharmBase):
         clear_status(self.unit, MSG_STARTING_SERVER)
 
         if self.unit.is_leader() and not self.state.opensearch_server:
-            self.app.status = BlockedStatus(MSG_STATUS_DB_MISSING)
+            set_status(self.app, BlockedStatus(MSG_STATUS_DB_MISSING))
 
     def _scrape_config(self) -> list[dict]:
         """Generates the scrape config as needed."""
-        return [
+        scrape_configs = [
             {
                 "metrics_path": "/metrics",
                 "static_configs": [
@@ -310,6 +616,11 @@ class OpensearchDasboardsCharm(CharmBase):
                 "scheme": "http",
             }
         ]
+        # the exporter of the snap sees whichever worker the load balancer picks
+        if self.metrics_manager.enabled or self.config_manager.workers.enabled:
+            scrape_configs.append(self.metrics_manager.scrape_config)
+
+        return scrape_configs
 
 
 if __name__ == "__main__":
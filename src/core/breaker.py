@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Circuit breakers for probes of unreachable services, kept across hooks."""
+import logging
+import time
+
+from ops.framework import StoredState
+
+from literals import HEALTH_BREAKER_BACKOFF, HEALTH_BREAKER_BACKOFF_MAX
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# exported to metrics as gauge values
+BREAKER_STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreakers:
+    """Circuit breaker per probed target.
+
+    A failed probe opens the breaker of its target. While open, the failure is reported
+    again without probing. Once the backoff passed, the breaker is half-open: the next
+    check probes, closing the breaker on success or re-opening it with twice the backoff.
+    """
+
+    def __init__(
+        self,
+        stored: StoredState,
+        backoff: float = HEALTH_BREAKER_BACKOFF,
+        backoff_max: float = HEALTH_BREAKER_BACKOFF_MAX,
+    ):
+        self._stored = stored
+        self._stored.set_default(circuit_breakers={})
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+    def _backoff(self, failures: int) -> float:
+        """Seconds a breaker stays open after the given number of consecutive failures."""
+        return min(self.backoff * 2 ** max(failures - 1, 0), self.backoff_max)
+
+    def state(self, target: str) -> str:
+        """The current state of the breaker of a target."""
+        if not (breaker := self._stored.circuit_breakers.get(target)):
+            return CLOSED
+
+        if time.time() < breaker["opened_at"] + self._backoff(breaker["failures"]):
+            return OPEN
+
+        return HALF_OPEN
+
+    @property
+    def states(self) -> dict[str, str]:
+        """The current state of all breakers that have tripped."""
+        return {target: self.state(target) for target in self._stored.circuit_breakers}
+
+    def failure(self, target: str) -> str | None:
+        """The failure status to report instead of probing, while the breaker is open."""
+        if self.state(target) != OPEN:
+            return None
+
+        return self._stored.circuit_breakers[target]["status"]
+
+    def record(self, target: str, healthy: bool, status: str = "") -> None:
+        """Closes the breaker of a target on a successful probe, opens it on a failed one."""
+        breakers = self._stored.circuit_breakers
+        if healthy:
+            if target in breakers:
+                logger.info(f"{target} reachable again, closing circuit breaker")
+                del breakers[target]
+            return
+
+        failures = breakers[target]["failures"] + 1 if target in breakers else 1
+        breakers[target] = {"failures": failures, "opened_at": time.time(), "status": status}
+        logger.warning(
+            f"{target} probe failed {failures} time(s), not probing for {self._backoff(failures)}s"
+        )
+
+    def half_open(self) -> None:
+        """Allows the next check of every open breaker to probe, e.g. when inputs changed."""
+        for target, breaker in self._stored.circuit_breakers.items():
+            self._stored.circuit_breakers[target] = {**breaker, "opened_at": 0.0}
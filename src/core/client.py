@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""HTTP client shared by the managers for the duration of a hook."""
+import logging
+import os
+import ssl
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from deadline import deadline
+
+logger = logging.getLogger(__name__)
+
+
+class PooledAdapter(HTTPAdapter):
+    """Adapter verifying TLS with the client's SSL context for a CA file.
+
+    The CA is loaded into the context once, instead of on every new connection. The pool
+    is keyed on the context, so a rewritten CA file gets new connections.
+    """
+
+    def __init__(self, client: "HTTPClient", ca: str | None):
+        self.client = client
+        self.ca = ca
+        super().__init__()
+
+    def build_connection_pool_key_attributes(self, request, verify, cert):
+        """Adds the SSL context for the CA to the pool key of HTTPS targets."""
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(
+            request, True, cert
+        )
+        if host_params["scheme"] == "https":
+            pool_kwargs["ssl_context"] = self.client.ssl_context(self.ca)
+
+        return host_params, pool_kwargs
+
+    def cert_verify(self, conn, url, verify, cert):
+        """Leaves loading the CA to the SSL context of the pool."""
+        conn.cert_reqs = "CERT_REQUIRED" if url.lower().startswith("https") else "CERT_NONE"
+
+
+class HTTPClient:
+    """Keep-alive sessions per target, and SSL contexts per CA file, for a hook.
+
+    Sessions are keyed on the target (scheme and network location), the CA file to
+    verify it with and the credentials, which are bound to the session once.
+
+    Requests still running when the client is closed, e.g. probes not waited for once
+    another one answered, close their session themselves when they complete.
+    """
+
+    def __init__(self):
+        self._sessions: dict[tuple, requests.Session] = {}
+        self._contexts: dict[tuple, ssl.SSLContext] = {}
+        self._in_flight: dict[requests.Session, int] = {}
+        self._closing: set[requests.Session] = set()
+        self._lock = threading.RLock()
+
+    def ssl_context(self, ca: str | None) -> ssl.SSLContext:
+        """The SSL context verifying against a CA file, loaded again if the file changed."""
+        try:
+            stat = os.stat(ca) if ca else None
+        except OSError as e:
+            raise requests.exceptions.SSLError(f"Unable to load CA {ca}: {e}")
+
+        key = (ca, stat.st_mtime_ns if stat else None, stat.st_size if stat else None)
+        with self._lock:
+            if key not in self._contexts:
+                self._contexts[key] = ssl.create_default_context(cafile=ca)
+            return self._contexts[key]
+
+    def session(
+        self, url: str, ca: str | None = None, auth: tuple[str | None, str | None] | None = None
+    ) -> requests.Session:
+        """The session for requests to the target of `url`."""
+        target = urlsplit(url)
+        key = (target.scheme, target.netloc, ca, auth)
+        with self._lock:
+            if key not in self._sessions:
+                session = requests.Session()
+                session.auth = auth  # type: ignore [reportAttributeAccessIssue]
+                adapter = PooledAdapter(self, ca)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[key] = session
+
+            return self._sessions[key]
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        ca: str | None = None,
+        auth: tuple[str | None, str | None] | None = None,
+        **kwargs,
+    ) -> requests.Response:
+        """Issues a request over the pooled session for its target.
+
+        Its timeout is bounded by the budget left to the running hook.
+
+        Raises:
+            RequestException (including any descendants from requests.exceptions),
+            DeadlineExceeded if the budget ran out
+        """
+        kwargs["timeout"] = deadline.timeout(kwargs.get("timeout"))
+        with self._lock:
+            session = self.session(url, ca, auth)
+            self._in_flight[session] = self._in_flight.get(session, 0) + 1
+
+        try:
+            return session.request(method=method, url=url, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight[session] -= 1
+                closing = False
+                if not self._in_flight[session]:
+                    del self._in_flight[session]
+                    closing = session in self._closing
+                    self._closing.discard(session)
+
+            if closing:
+                session.close()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Connections opened, TLS handshakes and requests made through the client."""
+        stats = {"connections": 0, "handshakes": 0, "requests": 0}
+        with self._lock:
+            sessions = list(self._sessions.values())
+
+        for session in sessions:
+            pools = session.get_adapter("https://").poolmanager.pools  # type: ignore
+            for key in pools.keys():
+                if not (pool := pools.get(key)):
+                    continue
+                stats["connections"] += pool.num_connections
+                stats["requests"] += pool.num_requests
+                if pool.scheme == "https":
+                    stats["handshakes"] += pool.num_connections
+
+        return stats
+
+    def close(self) -> None:
+        """Closes all pooled connections, once the requests running on them complete."""
+        with self._lock:
+            sessions = [
+                session for session in self._sessions.values() if session not in self._in_flight
+            ]
+            self._closing.update(self._in_flight)
+            self._sessions = {}
+
+        for session in sessions:
+            session.close()
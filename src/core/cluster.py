@@ -4,7 +4,9 @@
 
 """Collection of global cluster state."""
 import logging
+import os
 from ipaddress import IPv4Address, IPv6Address
+from typing import Any, Callable
 
 from charms.data_platform_libs.v0.data_interfaces import (
     DataPeerData,
@@ -12,10 +14,14 @@ from charms.data_platform_libs.v0.data_interfaces import (
     DataPeerUnitData,
     OpenSearchRequiresData,
 )
-from ops.framework import Framework, Object
+from ops.framework import EventBase, Framework, Object, StoredState
 from ops.model import Relation, Unit
 
-from core.models import SUBSTRATES, ODCluster, ODServer, OpensearchServer
+from core.locality import EndpointRanking
+from core.models import SUBSTRATES, ODCluster, ODServer, OpensearchServer, StateBase
+from core.resolver import AddressResolver
+from core.secret_cache import SecretCache
+from core.work_queue import WorkQueue
 from literals import (
     CERTS_REL_NAME,
     DASHBOARD_INDEX,
@@ -33,10 +39,20 @@ logger = logging.getLogger(__name__)
 class ClusterState(Object):
     """Collection of global cluster state for Framework/Object."""
 
+    _stored = StoredState()
+
     def __init__(self, charm: Framework | Object, substrate: SUBSTRATES):
         super().__init__(parent=charm, key="osd_charm_state")
         self.substrate: SUBSTRATES = substrate
         self._servers_data = {}
+        self._snapshots: dict[str, Any] = {}
+        self._snapshot_context: str | None = None
+        self.secret_cache = SecretCache(self._stored)
+        self.resolver = AddressResolver(self._stored)
+        self.work_queue = WorkQueue(self._stored)
+        self.endpoint_ranking = EndpointRanking(
+            self._stored, zone=os.environ.get("JUJU_AVAILABILITY_ZONE")
+        )
 
         self.peer_app_data = DataPeerData(
             self.model, relation_name=PEER, additional_secret_fields=PEER_APP_SECRETS
@@ -51,6 +67,46 @@ class ClusterState(Object):
             extra_user_roles=DASHBOARD_ROLE,
         )
 
+        self.framework.observe(self.framework.on.pre_commit, self._on_pre_commit)
+
+    # --- SNAPSHOT ---
+
+    def _snapshot(self, key: str, factory: Callable[[], Any], cache_secrets: bool = False) -> Any:
+        """Returns the state object for `key`, building it only once per Juju dispatch.
+
+        The snapshot is scoped to the running hook (`JUJU_CONTEXT_ID`). Outside of a
+        dispatch (e.g. direct calls from tests) state objects are always built fresh.
+        Within a dispatch, databag writes are buffered and flushed when the hook exits,
+        and with `cache_secrets` set, secret fields are served from the secret cache.
+        """
+        context_id = os.environ.get("JUJU_CONTEXT_ID")
+        if not context_id:
+            return factory()
+
+        if context_id != self._snapshot_context:
+            self.flush()
+            self._snapshots = {}
+            self._snapshot_context = context_id
+
+        if key not in self._snapshots:
+            state = factory()
+            if isinstance(state, StateBase):
+                state.write_behind = True
+                state.secret_cache = self.secret_cache if cache_secrets else None
+            self._snapshots[key] = state
+
+        return self._snapshots[key]
+
+    def flush(self) -> None:
+        """Writes out all databag updates buffered during the current hook."""
+        for state in self._snapshots.values():
+            if isinstance(state, StateBase):
+                state.flush()
+
+    def _on_pre_commit(self, _: EventBase) -> None:
+        """Handler for the framework `pre_commit` event, emitted once the hook is done."""
+        self.flush()
+
     # --- RAW RELATION ---
 
     @property
@@ -73,35 +129,66 @@ class ClusterState(Object):
     @property
     def unit_server(self) -> ODServer:
         """The server state of the current running Unit."""
-        return ODServer(
-            relation=self.peer_relation,
-            data_interface=self.peer_unit_data,
-            component=self.model.unit,
-            substrate=self.substrate,
+        return self._snapshot(
+            "unit_server",
+            lambda: ODServer(
+                relation=self.peer_relation,
+                data_interface=self.peer_unit_data,
+                component=self.model.unit,
+                substrate=self.substrate,
+                resolver=self.resolver,
+            ),
+            cache_secrets=True,
         )
 
+    def other_unit_data(self, unit: Unit) -> DataPeerOtherUnitData:
+        """The data interface for a peer unit, only built once that unit is looked at."""
+        if unit not in self._servers_data:
+            self._servers_data[unit] = DataPeerOtherUnitData(
+                model=self.model, unit=unit, relation_name=PEER
+            )
+        return self._servers_data[unit]
+
     @property
     def peer_units_data(self) -> dict[Unit, DataPeerOtherUnitData]:
         """The cluster peer relation."""
         if not self.peer_relation or not self.peer_relation.units:
             return {}
 
-        for unit in self.peer_relation.units:
-            if unit not in self._servers_data:
-                self._servers_data[unit] = DataPeerOtherUnitData(
-                    model=self.model, unit=unit, relation_name=PEER
-                )
-        return self._servers_data
+        return {unit: self.other_unit_data(unit) for unit in self.peer_relation.units}
 
     @property
     def cluster(self) -> ODCluster:
-        """The cluster state of the current running App."""
-        return ODCluster(
-            relation=self.peer_relation,
-            data_interface=self.peer_app_data,
-            component=self.model.app,
-            substrate=self.substrate,
-            tls=bool(self.tls_relation),
+        """The cluster state of the current running App.
+
+        Its secret is owned by the app, so no unit is told when the leader changes it:
+        secret fields are not served from the secret cache.
+        """
+        return self._snapshot(
+            "cluster",
+            lambda: ODCluster(
+                relation=self.peer_relation,
+                data_interface=self.peer_app_data,
+                component=self.model.app,
+                substrate=self.substrate,
+                tls=bool(self.tls_relation),
+            ),
+        )
+
+    def server(self, unit: Unit) -> ODServer:
+        """The server state of a peer unit, loaded on first access."""
+        if unit == self.model.unit:
+            return self.unit_server
+
+        return self._snapshot(
+            f"server:{unit.name}",
+            lambda: ODServer(
+                relation=self.peer_relation,
+                data_interface=self.other_unit_data(unit),
+                component=unit,
+                substrate=self.substrate,
+                resolver=self.resolver,
+            ),
         )
 
     @property
@@ -114,23 +201,25 @@ class ClusterState(Object):
         if not self.peer_relation:
             return set()
 
-        servers = set()
-        for unit, data_interface in self.peer_units_data.items():
-            servers.add(
-                ODServer(
-                    relation=self.peer_relation,
-                    data_interface=data_interface,
-                    component=unit,
-                    substrate=self.substrate,
-                )
-            )
-        servers.add(self.unit_server)
+        return {self.server(unit) for unit in self.peer_relation.units} | {self.unit_server}
+
+    @property
+    def unit_count(self) -> int:
+        """Number of units in the peer relation, including this one, without loading their data."""
+        if not self.peer_relation:
+            return 0
 
-        return servers
+        return len(self.peer_relation.units | {self.model.unit})
 
     @property
     def opensearch_server(self) -> OpensearchServer | None:
         """The state for all related client Applications."""
+        return self._snapshot(
+            "opensearch_server", self._build_opensearch_server, cache_secrets=True
+        )
+
+    def _build_opensearch_server(self) -> OpensearchServer | None:
+        """Builds the state for the related Opensearch application."""
         if not self.opensearch_relation or not self.opensearch_relation.app:
             return None
 
@@ -162,7 +251,7 @@ class ClusterState(Object):
         Returns:
             True if all units are related. Otherwise False
         """
-        return len(self.servers) == self.model.app.planned_units()
+        return self.unit_count == self.model.app.planned_units()
 
     # --- HEALTH ---
 
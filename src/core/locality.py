@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Locality- and latency-based ordering of the Opensearch endpoints, kept across hooks."""
+import logging
+import time
+
+from ops.framework import StoredState
+
+from literals import (
+    ENDPOINT_RANKING_INTERVAL,
+    ENDPOINT_RANKING_MARGIN,
+    ENDPOINT_RANKING_MIN_GAIN,
+    ENDPOINT_RTT_SMOOTHING,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointRanking:
+    """Ranks endpoints by availability zone, then by smoothed round-trip time.
+
+    Endpoints in the unit's own zone come first, when zones are known. The ranking is
+    sticky, as every change of the order rewrites `opensearch.hosts` and restarts the
+    service: an endpoint only moves ahead of another one if it is in a preferred zone,
+    or if its RTT is lower by both a relative margin and an absolute gain.
+    """
+
+    def __init__(
+        self,
+        stored: StoredState,
+        interval: float = ENDPOINT_RANKING_INTERVAL,
+        zone: str | None = None,
+    ):
+        self._stored = stored
+        self._stored.set_default(
+            endpoint_ranking=[], endpoint_rtts={}, endpoint_zones={}, endpoint_ranked_at=0.0
+        )
+        self.interval = interval
+        self.zone = zone
+
+    @property
+    def due(self) -> bool:
+        """Whether the endpoints are due to be measured again."""
+        return time.time() - self._stored.endpoint_ranked_at >= self.interval
+
+    @property
+    def ranking(self) -> list[str]:
+        """The endpoints as last ranked."""
+        return list(self._stored.endpoint_ranking)
+
+    @property
+    def rtts(self) -> dict[str, float]:
+        """The smoothed round-trip time to each measured endpoint, in milliseconds."""
+        return dict(self._stored.endpoint_rtts)
+
+    def _zone_rank(self, endpoint: str) -> int:
+        """0 for endpoints in the unit's zone, 1 for others or if unknown."""
+        return 0 if self.zone and self._stored.endpoint_zones.get(endpoint) == self.zone else 1
+
+    def _ahead(self, endpoint: str, other: str) -> bool:
+        """Whether `endpoint` is clearly preferable to `other`."""
+        if self._zone_rank(endpoint) != self._zone_rank(other):
+            return self._zone_rank(endpoint) < self._zone_rank(other)
+
+        rtt = self._stored.endpoint_rtts.get(endpoint)
+        other_rtt = self._stored.endpoint_rtts.get(other)
+        if rtt is None or other_rtt is None:
+            return False
+
+        return (
+            rtt < other_rtt * (1 - ENDPOINT_RANKING_MARGIN)
+            and other_rtt - rtt > ENDPOINT_RANKING_MIN_GAIN
+        )
+
+    def rank(self, endpoints: list[str]) -> list[str]:
+        """The endpoints in ranked order, unranked ones last in the given order."""
+        ranking = [endpoint for endpoint in self._stored.endpoint_ranking if endpoint in endpoints]
+        return ranking + [endpoint for endpoint in endpoints if endpoint not in ranking]
+
+    def update(
+        self,
+        endpoints: list[str],
+        rtts: dict[str, float],
+        zones: dict[str, str] | None = None,
+    ) -> list[str]:
+        """Records new measurements, and re-ranks the endpoints.
+
+        Args:
+            endpoints: the current endpoints
+            rtts: round-trip time measured to each endpoint, in milliseconds. Endpoints
+                without a measurement keep their previous RTT, and so their place.
+            zones: availability zone of each endpoint, if known
+
+        Returns:
+            The new ranking
+        """
+        smoothed = {}
+        for endpoint in endpoints:
+            previous = self._stored.endpoint_rtts.get(endpoint)
+            if (rtt := rtts.get(endpoint)) is None:
+                if previous is not None:
+                    smoothed[endpoint] = previous
+                continue
+
+            smoothed[endpoint] = (
+                rtt if previous is None else previous + ENDPOINT_RTT_SMOOTHING * (rtt - previous)
+            )
+
+        self._stored.endpoint_rtts = smoothed
+        if zones is not None:
+            self._stored.endpoint_zones = {
+                endpoint: zone for endpoint, zone in zones.items() if endpoint in endpoints
+            }
+
+        # moving endpoints ahead only on clear gains, keeping the previous order otherwise
+        ranking = self.rank(endpoints)
+        moved = True
+        while moved:
+            moved = False
+            for i in range(len(ranking) - 1):
+                if self._ahead(ranking[i + 1], ranking[i]):
+                    ranking[i], ranking[i + 1] = ranking[i + 1], ranking[i]
+                    moved = True
+
+        if ranking != list(self._stored.endpoint_ranking):
+            logger.info(f"Opensearch endpoints ranked {ranking} (RTTs {smoothed})")
+
+        self._stored.endpoint_ranking = ranking
+        self._stored.endpoint_ranked_at = time.time()
+        return ranking
@@ -4,13 +4,21 @@
 
 """Collection of state objects for relations, apps and units."""
 import logging
-import socket
 from typing import Literal, MutableMapping
 
-from charms.data_platform_libs.v0.data_interfaces import Data, DataDict
-from ops.model import Application, Relation, Unit
+from charms.data_platform_libs.v0.data_interfaces import (
+    PROV_SECRET_PREFIX,
+    SECRET_GROUPS,
+    Data,
+    DataDict,
+)
+from ops.model import Application, Relation, RelationDataContent, Unit
 from typing_extensions import override
 
+from core.resolver import AddressResolver
+from core.secret_cache import SecretCache
+from timing import timed
+
 logger = logging.getLogger(__name__)
 
 SUBSTRATES = Literal["vm", "k8s"]
@@ -33,14 +41,129 @@ class StateBase:
         self._relation_data = (
             self.data_interface.as_dict(self.relation.id) if self.relation else {}
         )
+        self._snapshot: dict[str, str] | None = None
+        self._withheld: set[str] = set()
+        self._pending_writes: dict[str, str] = {}
+        self.write_behind = False
+        self.secret_cache: SecretCache | None = None
 
     @property
     def relation_data(self) -> MutableMapping[str, str]:
-        """The raw relation data."""
-        return self._relation_data.data if isinstance(self._relation_data, DataDict) else {}
+        """The raw relation data.
+
+        The databag (including secret fields) is fetched on first access only,
+        later reads are served from memory.
+        """
+        if self._snapshot is None:
+            self._snapshot = self._load()
+            self._refresh_snapshot(self._pending_writes)
+        return self._snapshot
+
+    @property
+    def _databags(self) -> list[RelationDataContent]:
+        """The raw databags making up relation_data, as Juju stores them."""
+        if not self.relation:
+            return []
+
+        return [self.relation.data[self.component]]
+
+    @property
+    def secret_id(self) -> str:
+        """The ID(s) of the Juju secret(s) holding the secret fields of the databag.
+
+        Secret URIs published in the databag, or the label of the secret otherwise.
+        """
+        if not self.relation:
+            return ""
+
+        uris = sorted(
+            value
+            for databag in self._databags
+            for key, value in databag.items()
+            if key.startswith(PROV_SECRET_PREFIX)
+        )
+        return ",".join(uris) or self.data_interface._generate_secret_label(
+            self.relation.name, self.relation.id, SECRET_GROUPS.EXTRA  # type:ignore noqa
+        )
+
+    @timed("state_load")
+    def _load(self) -> dict[str, str]:
+        """Fetches the databag, serving secret fields from the secret cache if possible."""
+        if not isinstance(self._relation_data, DataDict):
+            return {}
+
+        databag = {
+            key: value
+            for raw_databag in self._databags
+            for key, value in raw_databag.items()
+            if not key.startswith(PROV_SECRET_PREFIX)
+        }
+
+        if self.secret_cache and (cached := self.secret_cache.get(self.secret_id)):
+            content, withheld = cached
+            self._withheld = set(withheld)
+            return databag | content
+
+        data = dict(self._relation_data.data)
+        if self.secret_cache:
+            self.secret_cache.set(
+                self.secret_id, {k: v for k, v in data.items() if k not in databag}
+            )
+        return data
+
+    def _fetch_withheld(self, key: str) -> str:
+        """Fetches a set field which the secret cache refused to keep, e.g. a password."""
+        if key not in self._withheld:
+            return ""
+
+        value = self._relation_data.get(key) or ""
+        self._withheld.discard(key)
+        self.relation_data[key] = value
+        return value
+
+    def _has(self, key: str) -> bool:
+        """Checks if a field is set, without fetching it if withheld by the secret cache."""
+        return bool(self.relation_data.get(key)) or key in self._withheld
+
+    def _refresh_snapshot(self, items: dict[str, str]) -> None:
+        """Applies written keys to the in-memory databag, leaving all other keys untouched."""
+        if self._snapshot is None:
+            return
+
+        for key, value in items.items():
+            self._withheld.discard(key)
+            if value:
+                self._snapshot[key] = value
+            else:
+                self._snapshot.pop(key, None)
 
     def update(self, items: dict[str, str]) -> None:
-        """Writes to relation_data."""
+        """Writes to relation_data.
+
+        With `write_behind` set, the items are only buffered and reach the databag
+        on the next `flush()`. Reads see buffered values straight away.
+        """
+        if not self.relation or not self.data_interface:
+            return
+
+        self._refresh_snapshot(items)
+
+        if self.write_behind:
+            self._pending_writes.update(items)
+            return
+
+        self._write(items)
+
+    def flush(self) -> None:
+        """Writes all buffered items to the databag in a single update."""
+        if not self._pending_writes:
+            return
+
+        items, self._pending_writes = self._pending_writes, {}
+        self._write(items)
+
+    def _write(self, items: dict[str, str]) -> None:
+        """Writes items to the databag, empty values deleting their keys."""
         if not self.relation or not self.data_interface:
             return
 
@@ -49,8 +172,14 @@ class StateBase:
 
         if update_fields:
             self._relation_data.update(update_fields)
-        for field in delete_fields:
-            del self._relation_data[field]
+        if delete_fields:
+            self.data_interface.delete_relation_data(self.relation.id, delete_fields)
+
+        if self.secret_cache:
+            secret_fields = getattr(self.data_interface, "secret_fields", None) or []
+            self.secret_cache.update(
+                self.secret_id, {k: v for k, v in items.items() if k in secret_fields}
+            )
 
 
 class OpensearchServer(StateBase):
@@ -72,9 +201,20 @@ class OpensearchServer(StateBase):
         self._endpoints = endpoints
         self._local_app = local_app
 
+    @property
     @override
-    def update(self, items: dict[str, str]) -> None:
-        """Overridden update to allow for same interface, but writing to local app bag."""
+    def _databags(self) -> list[RelationDataContent]:
+        if not self.relation:
+            return []
+
+        databags = [self.relation.data[self.app]]
+        if self._local_app:
+            databags.append(self.relation.data[self._local_app])
+        return databags
+
+    @override
+    def _write(self, items: dict[str, str]) -> None:
+        """Overridden write to allow for same interface, but writing to local app bag."""
         if not self.relation or not self._local_app:
             return
 
@@ -88,7 +228,7 @@ class OpensearchServer(StateBase):
     @property
     def password(self) -> str | None:
         """The generated password for the client application."""
-        return self.relation_data.get("password")
+        return self.relation_data.get("password") or self._fetch_withheld("password")
 
     @property
     def endpoints(self) -> list[str]:
@@ -143,9 +283,11 @@ class ODServer(StateBase):
         data_interface: Data,
         component: Unit,
         substrate: SUBSTRATES,
+        resolver: AddressResolver | None = None,
     ):
         super().__init__(relation, data_interface, component, substrate)
         self.unit = component
+        self.resolver = resolver or AddressResolver()
 
     @property
     def unit_id(self) -> int:
@@ -170,23 +312,22 @@ class ODServer(StateBase):
     @property
     def hostname(self) -> str:
         """The hostname for the unit."""
-        return socket.gethostname()
+        return self.resolver.hostname()
 
     @property
     def fqdn(self) -> str:
         """The Fully Qualified Domain Name for the unit."""
-        # return socket.getfqdn(self.private_ip)
-        return socket.getfqdn(self.private_ip)
+        return self.resolver.fqdn(self.private_ip)
 
     @property
     def private_ip(self) -> str:
         """The IP for the unit recovered using socket."""
-        return socket.gethostbyname(self.hostname)
+        return self.resolver.ip(self.hostname)
 
     @property
     def public_ip(self) -> str:
         """The public IP for the unit."""
-        return socket.gethostbyname(self.hostname)
+        return self.resolver.ip(self.hostname)
 
     @property
     def host(self) -> str:
@@ -207,7 +348,7 @@ class ODServer(StateBase):
     @property
     def private_key(self) -> str:
         """The private-key contents for the unit to use for TLS."""
-        return self.relation_data.get("private-key", "")
+        return self.relation_data.get("private-key", "") or self._fetch_withheld("private-key")
 
     @property
     def csr(self) -> str:
@@ -227,7 +368,7 @@ class ODServer(StateBase):
     @property
     def tls(self) -> bool:
         """Flag to check if TLS is enabled for the cluster."""
-        return bool(self.ca) and bool(self.certificate) and bool(self.private_key)
+        return bool(self.ca) and bool(self.certificate) and self._has("private-key")
 
     @property
     def sans(self) -> dict[str, list[str]]:
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Health probes of Opensearch and Opensearch Dashboards, shared by hooks and the sidecar."""
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any
+
+import requests
+
+from core.client import HTTPClient
+from core.service_status import ServiceStatus
+from literals import (
+    HEALTH_OPENSEARCH_STATUS_PARAMS,
+    HEALTH_OPENSEARCH_STATUS_URL,
+    HEALTH_PROBE_TIMEOUT,
+    HEALTH_PROBE_WORKERS,
+    MSG_STATUS_DEGRADED,
+    MSG_STATUS_ERROR,
+    MSG_STATUS_UNAVAIL,
+    MSG_STATUS_UNHEALTHY,
+    MSG_STATUS_UNKNOWN,
+)
+
+logger = logging.getLogger(__name__)
+
+Auth = tuple[str | None, str | None]
+
+# Degradation reported for each runtime metric, and the config option of its threshold
+DEGRADATIONS = {
+    "high latency": ("response_time", "degraded_response_time"),
+    "event loop lag": ("event_loop_delay", "degraded_event_loop_delay"),
+    "heap pressure": ("heap_usage", "degraded_heap_usage"),
+    "connection saturation": ("concurrent_connections", "degraded_concurrent_connections"),
+}
+
+# Runtime metrics exported for each worker, and the name of their gauge
+WORKER_METRICS = {
+    "response_time": "response_time_ms",
+    "event_loop_delay": "event_loop_delay_ms",
+    "heap_usage": "heap_usage_percent",
+    "concurrent_connections": "concurrent_connections",
+}
+
+
+def opensearch_green(client: HTTPClient, endpoint: str, auth: Auth, ca: str) -> bool:
+    """Whether a single Opensearch endpoint reports a green cluster."""
+    try:
+        resp = client.request(
+            method="GET",
+            url=f"https://{endpoint}/{HEALTH_OPENSEARCH_STATUS_URL}",
+            params=HEALTH_OPENSEARCH_STATUS_PARAMS,
+            ca=ca,
+            auth=auth,
+            headers=None,
+            timeout=HEALTH_PROBE_TIMEOUT,
+        )
+        resp.raise_for_status()
+        status = resp.json()
+    except requests.exceptions.RequestException as e:
+        logger.debug(f"Opensearch endpoint {endpoint} unreachable: {e}")
+        return False
+
+    return status.get("status") == "green"
+
+
+def any_opensearch_green(client: HTTPClient, endpoints: list[str], auth: Auth, ca: str) -> bool:
+    """Probes all endpoints concurrently, returning as soon as one reports a green cluster."""
+    if not endpoints:
+        return False
+
+    # not waiting for the remaining probes once one is green, they are bounded by timeouts
+    # and close their session themselves if the client was closed in the meantime
+    executor = ThreadPoolExecutor(max_workers=min(len(endpoints), HEALTH_PROBE_WORKERS))
+    try:
+        probes = [
+            executor.submit(opensearch_green, client, endpoint, auth, ca) for endpoint in endpoints
+        ]
+        for probe in as_completed(probes):
+            if probe.result():
+                return True
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return False
+
+
+def degradations(status: ServiceStatus, thresholds: dict[str, int]) -> list[str]:
+    """The runtime metrics of a service exceeding their thresholds, 0 disabling a threshold."""
+    found = []
+    for reason, (metric, option) in DEGRADATIONS.items():
+        value = getattr(status, metric)
+        threshold = thresholds.get(option, 0)
+        if value is not None and threshold and value > threshold:
+            logger.warning(f"Dashboards {reason}: {value:.1f} above {option}={threshold}")
+            found.append(reason)
+
+    return found
+
+
+def dashboards_health(status_data: dict[str, Any], thresholds: dict[str, int]) -> tuple[bool, str]:
+    """Evaluates an `/api/status` response.
+
+    Returns:
+        Tuple of whether the service is up, and the status message if not fully healthy
+    """
+    status = ServiceStatus(status_data)
+    if status.state == "green":
+        if found := degradations(status, thresholds):
+            return True, MSG_STATUS_DEGRADED.format(", ".join(found))
+        return True, ""
+    elif status.state == "yellow":
+        return True, MSG_STATUS_UNHEALTHY
+    elif status.state != "green":
+        return False, MSG_STATUS_ERROR
+    return True, MSG_STATUS_UNKNOWN
+
+
+def worker_metrics(status_data: dict[str, Any]) -> dict[str, float]:
+    """The runtime metrics of a worker reported in an `/api/status` response, by gauge name."""
+    status = ServiceStatus(status_data)
+    return {
+        name: value
+        for metric, name in WORKER_METRICS.items()
+        if (value := getattr(status, metric)) is not None
+    }
+
+
+def workers_health(results: list[tuple[bool, str]]) -> tuple[bool, str]:
+    """The health of the workers serving a unit, as bad as the worst of them."""
+    for healthy, message in results:
+        if not healthy:
+            return healthy, message
+
+    return next((result for result in results if result[1]), (True, ""))
+
+
+def dashboards_probe(
+    client: HTTPClient, url: str, auth: Auth, ca: str, thresholds: dict[str, int]
+) -> tuple[bool, str, dict[str, float]]:
+    """Queries and evaluates the `/api/status` of an Opensearch Dashboards server.
+
+    Returns:
+        Tuple of whether the service is up, the status message if not fully healthy,
+            and its runtime metrics
+    """
+    try:
+        resp = client.request(
+            method="GET",
+            url=f"{url}/api/status",
+            ca=ca,
+            auth=auth,
+            headers={"Accept": "application/json"},
+            timeout=HEALTH_PROBE_TIMEOUT,
+        )
+        resp.raise_for_status()
+        status_data = resp.json()
+    except requests.exceptions.HTTPError as e:
+        logger.debug(f"Opensearch Dashboards at {url} responded with an error: {e}")
+        if e.response.status_code == 503:
+            return False, MSG_STATUS_UNAVAIL, {}
+        return False, MSG_STATUS_ERROR, {}
+    except requests.exceptions.RequestException as e:
+        logger.debug(f"Opensearch Dashboards at {url} unavailable: {e}")
+        return False, MSG_STATUS_UNAVAIL, {}
+
+    return *dashboards_health(status_data, thresholds), worker_metrics(status_data)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Time-bounded, cached resolution of the unit's host names and addresses."""
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Callable
+
+from ops.framework import StoredState
+
+from literals import RESOLVER_TIMEOUT, RESOLVER_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class AddressResolver:
+    """Resolves host names and addresses without letting a broken DNS stall the hook.
+
+    Lookups are memoized for the running hook (`JUJU_CONTEXT_ID`), and successful ones
+    are kept in the unit state for `ttl` seconds. A lookup not answering within `timeout`
+    seconds falls back to the last known value, expired or not.
+    """
+
+    def __init__(
+        self,
+        stored: StoredState | None = None,
+        timeout: float = RESOLVER_TIMEOUT,
+        ttl: int = RESOLVER_TTL,
+    ):
+        self._stored = stored
+        self.timeout = timeout
+        self.ttl = ttl
+        self._memo: dict[str, str] = {}
+        self._memo_context: str | None = None
+
+        if self._stored is not None:
+            self._stored.set_default(resolved_addresses={})
+
+    def hostname(self) -> str:
+        """The hostname of the machine."""
+        return self._lookup("hostname", socket.gethostname)
+
+    def ip(self, hostname: str) -> str:
+        """The IPv4 address a host name resolves to."""
+        return self._lookup(f"ip:{hostname}", lambda: socket.gethostbyname(hostname))
+
+    def fqdn(self, address: str) -> str:
+        """The Fully Qualified Domain Name of a host name or address."""
+        return self._lookup(f"fqdn:{address}", lambda: socket.getfqdn(address))
+
+    def _lookup(self, key: str, resolve: Callable[[], str]) -> str:
+        """Returns the memoized, cached or freshly resolved value for `key`."""
+        context_id = os.environ.get("JUJU_CONTEXT_ID")
+        if context_id != self._memo_context:
+            self._memo = {}
+            self._memo_context = context_id
+
+        if key in self._memo:
+            return self._memo[key]
+
+        cached = self._stored.resolved_addresses.get(key) if self._stored is not None else None
+        if cached and time.time() - cached["time"] < self.ttl:
+            self._memo[key] = cached["value"]
+            return cached["value"]
+
+        try:
+            value = self._resolve(resolve)
+        except (OSError, TimeoutError) as e:
+            value = cached["value"] if cached else ""
+            logger.warning(f"Unable to resolve {key}: {e}, using '{value}'")
+        else:
+            if self._stored is not None:
+                self._stored.resolved_addresses[key] = {"value": value, "time": time.time()}
+
+        self._memo[key] = value
+        return value
+
+    def _resolve(self, resolve: Callable[[], str]) -> str:
+        """Runs a lookup, giving up after `timeout` seconds.
+
+        The resolver library can't be interrupted, so the lookup runs in a daemon thread
+        that is left behind on timeout, without holding up the hook's exit.
+        """
+        result: dict[str, str | Exception] = {}
+
+        def target():
+            try:
+                result["value"] = resolve()
+            except Exception as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+
+        if thread.is_alive():
+            raise TimeoutError(f"no answer within {self.timeout}s")
+        if "error" in result:
+            raise result["error"]  # type: ignore
+
+        return result["value"]  # type: ignore
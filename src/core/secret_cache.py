@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Persistent cache for secret-backed relation data."""
+import logging
+from fnmatch import fnmatch
+
+from ops.framework import StoredState
+
+from literals import SECRET_CACHE_EXCLUDED_FIELDS
+
+logger = logging.getLogger(__name__)
+
+PRIVATE_KEY_MARKER = "PRIVATE KEY-----"
+
+
+class SecretCache:
+    """Revision-keyed cache of secret-backed databag fields, kept across hooks.
+
+    Entries are keyed on the secret ID (URI or label) and the revision the charm last
+    observed for that secret. A `secret-changed` event moves the revision on, so the
+    next read goes back to Juju.
+
+    Credentials (passwords, tokens and keys) are never written to the (plaintext) unit
+    state: only the names of such fields are kept, their values are fetched from Juju
+    when read, and kept in memory for the current hook only.
+    """
+
+    def __init__(self, stored: StoredState):
+        self._stored = stored
+        self._stored.set_default(secret_revisions={}, secret_contents={})
+
+    @staticmethod
+    def _normalize(secret_id: str) -> str:
+        """Strips the model/scheme prefix, so URIs from events and databags compare equal."""
+        return secret_id.split("/")[-1].split(":")[-1]
+
+    def _revision(self, secret_id: str) -> str:
+        """The last observed revision(s) for a (comma-separated list of) secret ID(s)."""
+        return ",".join(
+            str(self._stored.secret_revisions.get(self._normalize(member), 0))
+            for member in secret_id.split(",")
+        )
+
+    @staticmethod
+    def _withheld(key: str, value: str) -> bool:
+        """Whether the field must not be written to disk."""
+        return (
+            any(fnmatch(key, pattern) for pattern in SECRET_CACHE_EXCLUDED_FIELDS)
+            or PRIVATE_KEY_MARKER in value
+        )
+
+    @property
+    def revisions(self) -> dict[str, int]:
+        """The last observed revision of every secret that changed."""
+        return dict(self._stored.secret_revisions)
+
+    def get(self, secret_id: str) -> tuple[dict[str, str], list[str]] | None:
+        """Returns the cached content and withheld field names, if current.
+
+        Args:
+            secret_id: the secret URI or label, or a comma-separated list of them
+
+        Returns:
+            Tuple of cached field values and names of set but withheld fields, or
+            None if nothing is cached for the current revision
+        """
+        entry = self._stored.secret_contents.get(secret_id)
+        if not entry or entry["revision"] != self._revision(secret_id):
+            return None
+
+        # written before the field was withheld, replaced on the next load
+        if any(self._withheld(key, value) for key, value in entry["content"].items()):
+            return None
+
+        return dict(entry["content"]), list(entry["withheld"])
+
+    def set(self, secret_id: str, content: dict[str, str]) -> None:
+        """Caches the content of a secret for its current revision."""
+        self._stored.secret_contents[secret_id] = {
+            "revision": self._revision(secret_id),
+            "content": {k: v for k, v in content.items() if not self._withheld(k, v)},
+            "withheld": sorted(k for k, v in content.items() if self._withheld(k, v)),
+        }
+
+    def update(self, secret_id: str, items: dict[str, str]) -> None:
+        """Applies items written by the charm to an existing entry, empty values deleting."""
+        if not (cached := self.get(secret_id)):
+            return
+
+        content, withheld = cached
+        for key, value in items.items():
+            content.pop(key, None)
+            if key in withheld:
+                withheld.remove(key)
+            if not value:
+                continue
+
+            if self._withheld(key, value):
+                withheld.append(key)
+            else:
+                content[key] = value
+
+        self._stored.secret_contents[secret_id] = {
+            "revision": self._revision(secret_id),
+            "content": content,
+            "withheld": sorted(withheld),
+        }
+
+    def bump(self, *secret_ids: str | None) -> None:
+        """Records a new revision for the given secrets, invalidating their cached content."""
+        for secret_id in secret_ids:
+            if not secret_id:
+                continue
+
+            member = self._normalize(secret_id)
+            logger.debug(f"Secret {secret_id} changed, invalidating cached content")
+            self._stored.secret_revisions[member] = (
+                self._stored.secret_revisions.get(member, 0) + 1
+            )
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Model of the Opensearch Dashboards `/api/status` response."""
+import logging
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceStatus:
+    """Overall state and runtime metrics reported by Opensearch Dashboards.
+
+    Metrics are averaged by the service over its collection interval. Any metric missing
+    from the response (e.g. right after startup) is None.
+    """
+
+    def __init__(self, data: dict[str, Any]):
+        self.data = data
+        self.metrics = data.get("metrics") or {}
+
+    def _metric(self, *path: str) -> float | None:
+        """A numeric metric at the given path in the `metrics` section."""
+        value: Any = self.metrics
+        for key in path:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+
+        return value if isinstance(value, (int, float)) else None
+
+    @property
+    def state(self) -> str:
+        """The overall state, e.g. green, yellow or red."""
+        return self.data["status"]["overall"]["state"]
+
+    @property
+    def response_time(self) -> float | None:
+        """Average response time, in milliseconds."""
+        return self._metric("response_times", "avg_in_millis")
+
+    @property
+    def max_response_time(self) -> float | None:
+        """Maximum response time, in milliseconds."""
+        return self._metric("response_times", "max_in_millis")
+
+    @property
+    def event_loop_delay(self) -> float | None:
+        """Delay of the Node.js event loop, in milliseconds."""
+        return self._metric("process", "event_loop_delay")
+
+    @property
+    def heap_usage(self) -> float | None:
+        """Used heap, as a percentage of the heap size limit."""
+        used = self._metric("process", "memory", "heap", "used_in_bytes")
+        limit = self._metric("process", "memory", "heap", "size_limit")
+        if used is None or not limit:
+            return None
+
+        return 100 * used / limit
+
+    @property
+    def concurrent_connections(self) -> float | None:
+        """Number of open client connections."""
+        return self._metric("concurrent_connections")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Snapd API client keeping its connection to the snapd socket for the duration of a hook."""
+import http.client
+import json
+import logging
+import socket
+from urllib.parse import urlencode
+
+from charms.operator_libs_linux.v2 import snap
+
+from literals import SNAPD_SOCKET, SNAPD_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    """HTTP/1.1 connection over a unix socket."""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        """Connects to the unix socket instead of a TCP address."""
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class SnapdClient(snap.SnapClient):
+    """The snap lib's client, over one keep-alive connection instead of one per request.
+
+    The connection is opened on the first request, and opened again if snapd closed it
+    in the meantime.
+    """
+
+    def __init__(self, socket_path: str = SNAPD_SOCKET, timeout: float = SNAPD_TIMEOUT):
+        super().__init__(socket_path=socket_path, timeout=timeout)
+        self.socket_path = socket_path
+        self._connection: _UnixConnection | None = None
+        self.requests = 0
+        self.connections = 0
+
+    def _connect(self) -> _UnixConnection:
+        """The open connection, or a new one."""
+        if self._connection is None:
+            self._connection = _UnixConnection(self.socket_path, self.timeout)
+            self.connections += 1
+
+        # bounded again on every request, as the hook's budget shrinks
+        self._connection.timeout = self.timeout
+        if self._connection.sock is not None:
+            self._connection.sock.settimeout(self.timeout)
+        return self._connection
+
+    def close(self) -> None:
+        """Closes the connection, if open."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _request(self, method: str, path: str, query: dict = None, body: dict = None):
+        """Makes a JSON request to snapd, returning the decoded result.
+
+        Raises:
+            SnapAPIError if snapd could not be reached or returned an error
+        """
+        url = f"/v2/{path}" + (f"?{urlencode(query)}" if query else "")
+        headers = {"Accept": "application/json"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        # a kept connection may have been closed by snapd since, retrying it once
+        for attempt in range(2):
+            connection = self._connect()
+            try:
+                connection.request(method, url, body=data, headers=headers)
+                response = connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                self.close()
+                if attempt:
+                    raise snap.SnapAPIError({}, 500, "Not found", str(e))
+            except (OSError, http.client.HTTPException) as e:
+                self.close()
+                raise snap.SnapAPIError({}, 500, "Not found", str(e))
+
+        self.requests += 1
+        if response.will_close:
+            self.close()
+
+        try:
+            result = json.loads(content.decode())["result"]
+        except (ValueError, KeyError) as e:
+            raise snap.SnapAPIError({}, response.status, response.reason, f"{e}")
+
+        if response.status >= 400:
+            message = result.get("message", "") if isinstance(result, dict) else ""
+            raise snap.SnapAPIError(result, response.status, response.reason, message)
+
+        return result
+
+    def get_installed_snap(self, name: str) -> dict:
+        """Query the snap server for a single installed snap."""
+        return self._request("GET", f"snaps/{name}")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Persistent queue of work waiting for its preconditions."""
+import logging
+
+from ops.framework import StoredState
+
+logger = logging.getLogger(__name__)
+
+
+class WorkQueue:
+    """Deduplicating set of pending work items, kept across hooks.
+
+    Used in place of `event.defer()`: however often the same work is requested while
+    its preconditions don't hold, it is recorded once and run once, instead of every
+    deferred event being replayed at the start of each later hook.
+    """
+
+    def __init__(self, stored: StoredState):
+        self._stored = stored
+        self._stored.set_default(pending_work=[])
+
+    def __contains__(self, work: str) -> bool:
+        return work in self._stored.pending_work
+
+    @property
+    def pending(self) -> list[str]:
+        """The pending work items, in the order they were first requested."""
+        return list(self._stored.pending_work)
+
+    def add(self, work: str) -> None:
+        """Records a work item, unless already pending."""
+        if work in self:
+            return
+
+        logger.debug(f"Queueing work '{work}' until its preconditions hold")
+        self._stored.pending_work.append(work)
+
+    def done(self, work: str) -> None:
+        """Removes a completed work item."""
+        if work in self:
+            self._stored.pending_work.remove(work)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Processes of Opensearch Dashboards serving a unit."""
+import logging
+
+from ops.model import ConfigData
+
+from core.cluster import ClusterState
+from core.workload import WorkloadBase
+from literals import SERVER_PORT, WORKER_MEMORY_MIN, WORKER_PORT_BASE, WORKERS_MAX
+
+logger = logging.getLogger(__name__)
+
+
+class Workers:
+    """The Opensearch Dashboards processes of the unit, each on its own port.
+
+    A single one serves the unit by default. With more, a local load balancer serves the
+    unit instead, spreading connections to the workers.
+    """
+
+    def __init__(
+        self, state: ClusterState, workload: WorkloadBase, config: ConfigData | None = None
+    ):
+        self.state = state
+        self.workload = workload
+        self.config = config
+
+    @property
+    def count(self) -> int:
+        """The number of workers, one per core in "auto" mode, as memory allows."""
+        value = str(self.config.get("workers", "1") if self.config is not None else "1").strip()
+        if value == "auto":
+            count = min(self.workload.cores, self.workload.memory // WORKER_MEMORY_MIN)
+        elif value.isdigit():
+            count = int(value)
+        else:
+            logger.error(f"Invalid workers config value of {value}. Defaulting to 1")
+            count = 1
+
+        return max(1, min(count, WORKERS_MAX))
+
+    @property
+    def enabled(self) -> bool:
+        """Whether several workers serve the unit, behind the load balancer."""
+        return self.count > 1
+
+    @property
+    def ports(self) -> list[int]:
+        """The port of each worker."""
+        if not self.enabled:
+            return [SERVER_PORT]
+
+        return [WORKER_PORT_BASE + worker for worker in range(self.count)]
+
+    @property
+    def urls(self) -> list[str]:
+        """The URL of each worker."""
+        if not self.enabled:
+            return [self.state.url]
+
+        scheme = "https" if self.state.unit_server.tls else "http"
+        return [f"{scheme}://{self.state.bind_address}:{port}" for port in self.ports]
@@ -45,6 +45,43 @@ class ODPaths:
         """The certificate for the service to identify itself with for TLS auth."""
         return f"{self.conf_path}/certificates/server.pem"
 
+    @property
+    def environment(self) -> str:
+        """The environment variables of the service, as `KEY=VALUE` lines."""
+        return f"{self.conf_path}/environment"
+
+    @property
+    def optimizer_cache(self) -> str:
+        """The plugin bundles Opensearch Dashboards optimizes on its first start."""
+        return f"{self.data_path}/optimize"
+
+    @property
+    def optimizer_cache_revision(self) -> str:
+        """The snap revision the optimizer cache was fully built by."""
+        return f"{self.data_path}/optimize.revision"
+
+    def optimizer_cache_stash(self, revision: str) -> str:
+        """The optimizer cache of a snap revision, set aside while another one is installed."""
+        return f"{self.data_path}/optimize-{revision}"
+
+    def worker_conf(self, worker: int) -> str:
+        """The configuration directory of an additional worker of the service."""
+        return f"{self.conf_path}/workers/{worker}"
+
+    def worker_data(self, worker: int) -> str:
+        """The data directory of a worker, the first one using the service's."""
+        if not worker:
+            return self.data_path
+
+        return f"{self.data_path}/workers/{worker}"
+
+    def worker_properties(self, worker: int) -> str:
+        """The main properties filepath of a worker, the first one using the service's."""
+        if not worker:
+            return self.properties
+
+        return f"{self.worker_conf(worker)}/opensearch_dashboards.yml"
+
     @property
     def opensearch_ca(self) -> str:
         """The certificate for the service to identify itself with for TLS auth."""
@@ -71,11 +108,90 @@ class WorkloadBase(ABC):
         """Restarts the workload service."""
         ...
 
+    @abstractmethod
+    def reload(self) -> bool:
+        """Makes the workload service re-read its dynamic settings, without a restart.
+
+        Returns:
+            True if the service was signalled
+        """
+        ...
+
     @abstractmethod
     def configure(self, key: str, value: str) -> None:
         """Set workload parameters"""
         ...
 
+    @property
+    @abstractmethod
+    def environment(self) -> list[str]:
+        """The environment variables the workload service starts with, as `KEY=VALUE` lines."""
+        ...
+
+    @abstractmethod
+    def set_environment(self, environment: list[str]) -> None:
+        """Sets the environment variables the workload service starts with.
+
+        Args:
+            environment: `KEY=VALUE` lines
+        """
+        ...
+
+    @abstractmethod
+    def set_workers(self, count: int) -> None:
+        """Sets the number of workers started and stopped along with the workload service.
+
+        Args:
+            count: the number of workers, including the workload service itself
+        """
+        ...
+
+    @property
+    @abstractmethod
+    def load_balancer(self) -> str:
+        """The configuration of the local load balancer in front of the workers, if any."""
+        ...
+
+    @abstractmethod
+    def install_load_balancer(self) -> bool:
+        """Installs the local load balancer, if not installed yet.
+
+        Returns:
+            True if installed
+        """
+        ...
+
+    @abstractmethod
+    def set_load_balancer(self, content: str) -> None:
+        """Configures and (re)loads the local load balancer, or stops it if empty.
+
+        Args:
+            content: the load balancer configuration
+        """
+        ...
+
+    @property
+    @abstractmethod
+    def optimizer_cache_warm(self) -> bool:
+        """Whether the optimizer cache was fully built by the installed revision."""
+        ...
+
+    @abstractmethod
+    def stamp_optimizer_cache(self) -> None:
+        """Marks the optimizer cache as fully built by the installed revision."""
+        ...
+
+    @abstractmethod
+    def set_charm_service(self, name: str, content: str, restart: bool = False) -> None:
+        """Installs and starts a service of the charm, or stops and removes it if empty.
+
+        Args:
+            name: the name of the service unit
+            content: the service unit
+            restart: whether to restart the service even if unchanged, e.g. on new code
+        """
+        ...
+
     @abstractmethod
     def read(self, path: str) -> list[str]:
         """Reads a file from the workload.
@@ -103,6 +219,24 @@ class WorkloadBase(ABC):
         """Runs a command on the workload substrate."""
         ...
 
+    @property
+    @abstractmethod
+    def revision(self) -> str:
+        """The installed workload revision."""
+        ...
+
+    @property
+    @abstractmethod
+    def cores(self) -> int:
+        """The number of cores available to the workload."""
+        ...
+
+    @property
+    @abstractmethod
+    def memory(self) -> int:
+        """The memory available to the workload, in MB."""
+        ...
+
     @property
     @abstractmethod
     def alive(self) -> bool:
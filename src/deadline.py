@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Wall time budget of a hook dispatch, bounding every blocking call."""
+import logging
+import time
+from fnmatch import fnmatch
+from typing import TypeVar
+
+from requests.exceptions import Timeout
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", float, tuple[float, float], None)
+
+
+class DeadlineExceeded(Timeout):
+    """The budget of the running hook ran out before a blocking call.
+
+    A `requests` timeout, so that callers handling unreachable services handle it too.
+    """
+
+
+class HookDeadline:
+    """The point in time at which the running hook should stop blocking.
+
+    Unlimited by default, in which case bounding a timeout returns it unchanged.
+    """
+
+    def __init__(self):
+        self.budget: float | None = None
+        self.expires_at: float | None = None
+
+    def start(self, budget: float | None) -> None:
+        """Starts the budget of a new hook, None or 0 for an unlimited one."""
+        self.budget = budget or None
+        self.expires_at = time.monotonic() + budget if budget else None
+
+    @property
+    def remaining(self) -> float | None:
+        """Seconds left in the budget, None if unlimited."""
+        if self.expires_at is None:
+            return None
+
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        """Whether the budget ran out."""
+        return self.remaining == 0.0
+
+    def timeout(self, default: T) -> T:
+        """Bounds the timeout of a blocking call by the remaining budget.
+
+        Args:
+            default: the timeout of the call, in seconds, or a (connect, read) tuple.
+                None if the call would otherwise not time out.
+
+        Raises:
+            DeadlineExceeded if the budget already ran out
+        """
+        if (remaining := self.remaining) is None:
+            return default
+
+        if not remaining:
+            raise DeadlineExceeded(f"Hook budget of {self.budget}s exhausted")
+
+        if default is None:
+            return remaining  # type: ignore [reportReturnType]
+        if isinstance(default, tuple):
+            return tuple(min(value, remaining) for value in default)  # type: ignore
+        return min(default, remaining)  # type: ignore [reportReturnType]
+
+
+deadline = HookDeadline()
+
+
+def stop_at_deadline(_) -> bool:
+    """Tenacity stop condition, not retrying once the hook's budget ran out."""
+    return deadline.expired
+
+
+def hook_budget(event: str, budgets: str) -> float | None:
+    """The budget of a hook, from the first `pattern=seconds` entry matching it.
+
+    Args:
+        event: the dispatched hook or action
+        budgets: comma-separated `pattern=seconds` entries, 0 seconds for unlimited
+
+    Returns:
+        Seconds, None if unlimited
+    """
+    for entry in budgets.split(","):
+        pattern, _, seconds = entry.strip().partition("=")
+        try:
+            budget = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid hook budget {entry!r}")
+            continue
+
+        if fnmatch(event, pattern.strip()):
+            return budget or None
+
+    return None
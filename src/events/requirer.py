@@ -10,7 +10,7 @@ from charms.data_platform_libs.v0.data_interfaces import OpenSearchRequiresEvent
 from ops.charm import RelationBrokenEvent, RelationEvent
 from ops.framework import Object
 
-from literals import OPENSEARCH_REL_NAME
+from literals import OPENSEARCH_REL_NAME, WORK_OPENSEARCH_CA
 
 if TYPE_CHECKING:
     from charm import OpensearchDasboardsCharm
@@ -40,22 +40,33 @@ class RequirerEvents(Object):
     def _on_client_relation_changed(self, event: RelationEvent) -> None:
         """Updates ACLs while handling `client_relation_changed` events."""
         if not self.charm.state.stable:
-            event.defer()
+            self.charm.state.work_queue.add(WORK_OPENSEARCH_CA)
             return
 
-        if (
+        if self.write_opensearch_ca():
+            self.charm.on.config_changed.emit()
+
+    def write_opensearch_ca(self) -> bool:
+        """Writes the CA of the related Opensearch, once all connection details are known.
+
+        Returns:
+            True if the CA was written
+        """
+        self.charm.state.work_queue.done(WORK_OPENSEARCH_CA)
+        if not (
             self.charm.state.opensearch_server
             and self.charm.state.opensearch_server.username
             and self.charm.state.opensearch_server.password
             and self.charm.state.opensearch_server.endpoints
             and self.charm.state.opensearch_server.tls_ca
         ):
+            return False
 
-            self.charm.workload.write(
-                content=self.charm.state.opensearch_server.tls_ca,
-                path=self.charm.workload.paths.opensearch_ca,
-            )
-            self.charm.on.config_changed.emit()
+        self.charm.workload.write(
+            content=self.charm.state.opensearch_server.tls_ca,
+            path=self.charm.workload.paths.opensearch_ca,
+        )
+        return True
 
     def _on_client_relation_broken(self, event: RelationBrokenEvent) -> None:
         """Restoring config to defaults if the relation is gone.
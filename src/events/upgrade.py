@@ -4,6 +4,7 @@
 
 """Event handler for handling OpensearchDashboards in-place upgrades."""
 import logging
+import time
 from typing import TYPE_CHECKING
 
 from charms.data_platform_libs.v0.upgrade import (
@@ -15,10 +16,13 @@ from charms.data_platform_libs.v0.upgrade import (
     DependencyModel,
     UpgradeGrantedEvent,
 )
+from ops.charm import UpgradeCharmEvent
 from ops.model import BlockedStatus
 from typing_extensions import override
 
-from literals import MSG_INCOMPATIBLE_UPGRADE
+from helpers import set_status
+from literals import MSG_INCOMPATIBLE_UPGRADE, OPENSEARCH_DASHBOARDS_SNAP_REVISION
+from timing import timer
 
 if TYPE_CHECKING:
     from charm import (
@@ -44,7 +48,7 @@ class ODUpgradeEvents(DataUpgrade):
     def post_upgrade_check(self) -> None:
         """Runs necessary checks validating the unit is in a healthy state after upgrade."""
         if not self.charm.upgrade_manager.version_compatible():
-            self.charm.unit.status = BlockedStatus(MSG_INCOMPATIBLE_UPGRADE)
+            set_status(self.charm.unit, BlockedStatus(MSG_INCOMPATIBLE_UPGRADE))
             raise ClusterNotReadyError(
                 message="Post-upgrade check failed and cannot safely upgrade",
                 cause="Opensearch version mismatch",
@@ -81,16 +85,40 @@ class ODUpgradeEvents(DataUpgrade):
         return
 
     @override
-    def _on_upgrade_granted(self, event: UpgradeGrantedEvent) -> None:
-        self.charm.workload.stop()
+    def _on_upgrade_charm(self, event: UpgradeCharmEvent) -> None:
+        # every unit downloads the new revision in parallel, before reporting ready
+        # to be granted its upgrade, so that the upgrade itself only swaps revisions
+        if not self.charm.workload.prestage():
+            logger.warning("Unable to stage the snap, it will be downloaded on upgrade")
+
+        # the sidecar runs the charm's code, restarted on the new one
+        self.charm.health_manager.ensure_sidecar(restart=True)
 
-        if not self.charm.workload.install():
-            logger.error("Unable to install OpensearchDashboards...")
-            self.set_unit_failed(cause="Workload install failed")
-            return
+        super()._on_upgrade_charm(event)
 
-        logger.info(f"{self.charm.unit.name} upgrading workload...")
-        self.charm.workload.restart()
+    @override
+    def _on_upgrade_granted(self, event: UpgradeGrantedEvent) -> None:
+        if self.charm.workload.up_to_date:
+            logger.info(f"Revision {OPENSEARCH_DASHBOARDS_SNAP_REVISION} already installed")
+        else:
+            start = time.perf_counter()
+            with timer.phase("workload_downtime"):
+                self.charm.workload.stop()
+
+                if not self.charm.workload.install():
+                    logger.error("Unable to install OpensearchDashboards...")
+                    self.set_unit_failed(cause="Workload install failed")
+                    return
+
+                logger.info(f"{self.charm.unit.name} upgrading workload...")
+                self.charm.workload.restart()
+
+            logger.info(f"Workload stopped for {time.perf_counter() - start:.2f}s during upgrade")
+            self.charm.health_manager.invalidate()
+
+            # not upgrading the next unit while this one (re)builds its optimizer cache
+            if not self.charm.health_manager.wait_until_ready():
+                logger.warning(f"{self.charm.unit.name} not serving yet after upgrade")
 
         try:
             logger.debug("Running post-upgrade check...")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Resident health prober of Opensearch and Opensearch Dashboards.
+
+Run as a systemd service installed by the `HealthManager`, with a JSON config it
+writes, the sidecar probes both services (each worker of Opensearch Dashboards) every
+interval and atomically writes the results to a state file, which hooks read instead
+of probing themselves. It exits once its config is removed.
+
+    python3 -m health_sidecar <config path>
+"""
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any
+
+from core.client import HTTPClient
+from core.probes import any_opensearch_green, dashboards_probe, workers_health
+from literals import MSG_STATUS_DB_DOWN
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(content: str, path: str) -> None:
+    """Writes a file so readers never see a partial one."""
+    with open(f"{path}.tmp", "w") as f:
+        f.write(content)
+    os.replace(f"{path}.tmp", path)
+
+
+def probe(client: HTTPClient, config: dict[str, Any]) -> dict[str, Any]:
+    """Probes both services, returning the results as written to the state file."""
+    opensearch = config["opensearch"]
+    if any_opensearch_green(
+        client, opensearch["endpoints"], tuple(opensearch["auth"]), opensearch["ca"]
+    ):
+        opensearch_result = (True, "")
+    else:
+        opensearch_result = (False, MSG_STATUS_DB_DOWN)
+
+    dashboards = config["dashboards"]
+    workers = [
+        dashboards_probe(
+            client,
+            url,
+            tuple(dashboards["auth"]),
+            dashboards["ca"],
+            dashboards["thresholds"],
+        )
+        for url in dashboards["urls"]
+    ]
+    dashboards_result = workers_health([(healthy, message) for healthy, message, _ in workers])
+
+    return {
+        "generation": config["generation"],
+        "checked_at": time.time(),
+        "opensearch": list(opensearch_result),
+        "dashboards": list(dashboards_result),
+        "workers": [{"up": float(healthy), **metrics} for healthy, _, metrics in workers],
+    }
+
+
+def run(config_path: str) -> None:
+    """Probes until stopped, re-reading the config on each round."""
+    client = HTTPClient()
+    while True:
+        try:
+            with open(config_path) as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.info(f"Health sidecar stopping: {e}")
+            return
+
+        try:
+            write_atomic(json.dumps(probe(client, config)), config["state_path"])
+        except OSError as e:
+            logger.warning(f"Unable to write health results: {e}")
+
+        time.sleep(config["interval"])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run(sys.argv[1])
@@ -6,12 +6,20 @@
 
 import logging
 
-from charms.tls_certificates_interface.v3.tls_certificates import CharmBase
+from ops.charm import CharmBase
 from ops.model import ActiveStatus, Application, StatusBase, Unit
 
+from timing import timed
+
 logger = logging.getLogger(__name__)
 
 
+@timed("status_write")
+def set_status(scope_obj: Unit | Application, status: StatusBase) -> None:
+    """Set status, timed as a write of the hook's status."""
+    scope_obj.status = status
+
+
 def clear_status(scope_obj: Unit | Application, messages: str | list[str]) -> None:
     """Clear status if set."""
     if not isinstance(messages, list):
@@ -19,7 +27,7 @@ def clear_status(scope_obj: Unit | Application, messages: str | list[str]) -> No
 
     if any([scope_obj.status.message == message for message in messages]):
         logger.debug(f"Clearing status {messages} from {scope_obj}.")
-        scope_obj.status = ActiveStatus()
+        set_status(scope_obj, ActiveStatus())
 
 
 def set_global_status(charm: CharmBase, status: StatusBase | None):
@@ -27,9 +35,9 @@ def set_global_status(charm: CharmBase, status: StatusBase | None):
     if not status:
         return
 
-    charm.unit.status = status
+    set_status(charm.unit, status)
     if charm.unit.is_leader():
-        charm.app.status = status
+        set_status(charm.app, status)
 
 
 def clear_global_status(charm: CharmBase, status: str | None):
@@ -5,6 +5,8 @@
 """Collection of global literals for the charm."""
 
 OPENSEARCH_DASHBOARDS_SNAP_REVISION = "24"
+# Downloads of the target revision, staged for upgrades
+SNAP_STAGING_DIR = "/var/lib/charm-opensearch-dashboards/snaps"
 
 SUBSTRATE = "vm"
 CHARM_KEY = "opensearch-dashboards"
@@ -39,13 +41,61 @@ PEER_APP_SECRETS = [
     "monitor-password",
 ]
 PEER_UNIT_SECRETS = ["ca-cert", "csr", "certificate", "private-key"]
-
-RESTART_TIMEOUT = 30
+# Never persisted in plaintext by the local secret cache: passwords, tokens and keys
+SECRET_CACHE_EXCLUDED_FIELDS = ["*password", "*token", "*key"]
+
+# Seconds between readiness checks after a restart, growing by the factor up to the max
+RESTART_POLL_INTERVAL = 1
+RESTART_POLL_BACKOFF = 1.5
+RESTART_POLL_INTERVAL_MAX = 15
+# Seconds a snapd API call, an openssl or a systemctl invocation may take, within the
+# hook's budget
+SNAPD_TIMEOUT = 30
+SNAPD_SOCKET = "/run/snapd.socket"
+OPENSSL_TIMEOUT = 10
+SYSTEMCTL_TIMEOUT = 10
+# systemd drop-in of the service, pointing it at the environment file written by the charm
+DAEMON_DROP_IN = (
+    "/etc/systemd/system/snap.opensearch-dashboards.opensearch-dashboards-daemon.service.d"
+    "/10-charm-environment.conf"
+)
+# Bounds of the Node.js runtime settings derived from the unit's cores and memory (in MB)
+NODE_HEAP_SIZE_MIN = 512
+NODE_HEAP_SIZE_MAX = 16384
+NODE_THREADPOOL_SIZE_MIN = 4
+NODE_THREADPOOL_SIZE_MAX = 64
+# Workers serving the unit behind a local load balancer, in multi-process mode: the snap's
+# service is the first, the others are instances of a systemd template bound to it
+WORKERS_MAX = 16
+# Memory each worker needs, in MB, bounding the number of workers in "auto" mode
+WORKER_MEMORY_MIN = 1024
+WORKER_PORT_BASE = 5611
+WORKER_UNIT = "charm-opensearch-dashboards-worker@{}.service"
+WORKER_UNIT_TEMPLATE = "/etc/systemd/system/charm-opensearch-dashboards-worker@.service"
+# systemd units of the services the charm runs next to the snap
+CHARM_SERVICE_DIR = "/etc/systemd/system"
+LOAD_BALANCER = "haproxy"
+LOAD_BALANCER_CONF = "/etc/haproxy/haproxy.cfg"
+LOAD_BALANCER_BIN = "/usr/sbin/haproxy"
+LOAD_BALANCER_HEADER = "# Managed by the opensearch-dashboards charm"
+LOAD_BALANCER_TIMEOUT = 120
+# Reconciles a single dispatch may run, when reconciling requests further ones
+MAX_RECONCILE_PASSES = 3
+
+# Work queued until the peer relation exists and the cluster is stable
+WORK_INSTALL = "install"
+WORK_START = "start"
+WORK_OPENSEARCH_CA = "opensearch-ca"
+
+# Seconds a host name/address lookup may take, and resolved values are kept for
+RESOLVER_TIMEOUT = 2
+RESOLVER_TTL = 600
 
 
 # Status messages
 
 MSG_INSTALLING = "installing Opensearch Dashboards..."
+MSG_INSTALL_FAILED = "unable to install Opensearch Dashboards"
 MSG_STARTING = "starting..."
 MSG_STARTING_SERVER = "starting Opensearch Dashboards server..."
 MSG_WAITING_FOR_PEER = "waiting for peer relation"
@@ -56,6 +106,7 @@ MSG_INCOMPATIBLE_UPGRADE = "Incompatible Opensearch and Dashboards versions"
 
 MSG_STATUS_UNAVAIL = "Service unavailable"
 MSG_STATUS_UNHEALTHY = "Service is not in a green health state"
+MSG_STATUS_DEGRADED = "degraded: {}"
 MSG_STATUS_ERROR = "Service is an error state"
 MSG_STATUS_WORKLOAD_DOWN = "Workload is not alive"
 MSG_STATUS_UNKNOWN = "Workload status is not known"
@@ -77,4 +128,44 @@ MSG_UNIT_STATUS = [
 COS_RELATION_NAME = "cos-agent"
 COS_PORT = 9684
 
+HOOK_METRICS_DIR = "/var/lib/charm-opensearch-dashboards/metrics"
+HOOK_METRICS_PORT = 9685
+HOOK_METRICS_SERVICE = "charm-opensearch-dashboards-metrics.service"
+HOOK_METRICS_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+# (connect, read) seconds a call to the Opensearch Dashboards API may take, within the
+# hook's budget
+OSD_API_TIMEOUT = (3, 10)
+
 HEALTH_OPENSEARCH_STATUS_URL = "_cluster/health"
+# Answered from the node's own cluster state, with only the field we check
+HEALTH_OPENSEARCH_STATUS_PARAMS = {"local": "true", "filter_path": "status"}
+# Endpoints probed in parallel, and the (connect, read) seconds each probe may take
+HEALTH_PROBE_WORKERS = 4
+HEALTH_PROBE_TIMEOUT = (3, 5)
+# Seconds an unreachable service is not probed for, doubling per consecutive failure
+HEALTH_BREAKER_BACKOFF = 60
+HEALTH_BREAKER_BACKOFF_MAX = 1800
+# Resident health prober, and the number of its intervals after which its results are stale
+HEALTH_SIDECAR_DIR = "/var/lib/charm-opensearch-dashboards/health"
+HEALTH_SIDECAR_SERVICE = "charm-opensearch-dashboards-health.service"
+HEALTH_SIDECAR_STALE_INTERVALS = 3
+# Seconds between RTT measurements of the Opensearch endpoints, and the smoothing of
+# measurements. An endpoint is ranked ahead of another if faster by both margins.
+ENDPOINT_RANKING_INTERVAL = 300
+ENDPOINT_RTT_SMOOTHING = 0.3
+ENDPOINT_RANKING_MARGIN = 0.3
+ENDPOINT_RANKING_MIN_GAIN = 1.0
+# Opensearch node attribute holding the availability zone of the node
+ENDPOINT_ZONE_ATTRIBUTE = "zone"
+ENDPOINT_RTT_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1]
+# Dispatches after which cached health results are not trusted
+HEALTH_CACHE_INVALIDATED_BY = [
+    "*-relation-*",
+    "config-changed",
+    "secret-changed",
+    "install",
+    "start",
+    "stop",
+    "upgrade-charm",
+]
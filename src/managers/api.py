@@ -7,14 +7,15 @@ import json
 import logging
 from typing import TYPE_CHECKING, Any
 
-import requests
 from requests.exceptions import RequestException
 
 from exceptions import OSDAPIError
+from literals import OSD_API_TIMEOUT
 
 if TYPE_CHECKING:
     pass
 
+from core.client import HTTPClient
 from core.cluster import SUBSTRATES, ClusterState
 from core.workload import WorkloadBase
 
@@ -35,10 +36,12 @@ class APIManager:
         state: ClusterState,
         workload: WorkloadBase,
         substrate: SUBSTRATES,
+        client: HTTPClient | None = None,
     ):
         self.state = state
         self.workload = workload
         self.substrate = substrate
+        self.client = client or HTTPClient()
 
     # =================================
     #  Opensearch connection functions
@@ -50,6 +53,7 @@ class APIManager:
         method: str = "GET",
         headers: dict = HEADERS,
         payload: dict[str, Any] | None = None,
+        url: str | None = None,
     ) -> dict[str, Any]:
         """Issue a "raw"" HTTP(S) request to the OSD Rest API.
 
@@ -61,6 +65,7 @@ class APIManager:
             headers: request headers as a dict
             endpoint: relative to the base uri.
             payload: JSON / map body payload.
+            url: the base uri of a specific worker, instead of the unit's
 
         Raises:
             RequestException (including any descendants from requests.exceptions)
@@ -69,13 +74,14 @@ class APIManager:
         if None in [endpoint, method]:
             raise ValueError("endpoint or method missing")
 
-        full_url = f"{self.state.url}/api/{endpoint}"
+        full_url = f"{url or self.state.url}/api/{endpoint}"
 
         request_kwargs = {
-            "verify": self.workload.paths.ca,
+            "ca": self.workload.paths.ca,
             "method": method.upper(),
             "url": full_url,
             "headers": headers,
+            "timeout": OSD_API_TIMEOUT,
         }
 
         request_kwargs["data"] = json.dumps(payload)
@@ -87,26 +93,30 @@ class APIManager:
             )
 
         try:
-            with requests.Session() as s:
-                s.auth = (  # type: ignore [reportAttributeAccessIssue]
+            resp = self.client.request(
+                auth=(
                     self.state.opensearch_server.username,
                     self.state.opensearch_server.password,
-                )
-                resp = s.request(**request_kwargs)
-                resp.raise_for_status()
+                ),
+                **request_kwargs,
+            )
+            resp.raise_for_status()
         except RequestException as e:
             logger.error(f"Request {method} to {full_url} with payload: {payload} failed. \n{e}")
             raise
 
         return resp.json()
 
-    def service_status(self) -> dict[str, Any]:
+    def service_status(self, url: str | None = None) -> dict[str, Any]:
         """Query service status from the OSD API.
 
         A think wrapper around the Python 'requests' call to OSD API status endpoint.
         No errors/exceptions are handled.
 
+        Args:
+            url: the base uri of a specific worker, instead of the unit's
+
         Raises:
             RequestException (including any descendants from requests.exceptions)
         """
-        return self.request(endpoint="status")
+        return self.request(endpoint="status", url=url)
@@ -4,6 +4,7 @@
 
 """Manager for for handling configuration building + writing."""
 import logging
+from fnmatch import fnmatch
 from typing import TYPE_CHECKING
 
 from ops.model import ConfigData
@@ -12,7 +13,18 @@ if TYPE_CHECKING:
     pass
 
 from core.cluster import SUBSTRATES, ClusterState
+from core.workers import Workers
 from core.workload import WorkloadBase
+from literals import (
+    LOAD_BALANCER_HEADER,
+    LOAD_BALANCER_TIMEOUT,
+    NODE_HEAP_SIZE_MAX,
+    NODE_HEAP_SIZE_MIN,
+    NODE_THREADPOOL_SIZE_MAX,
+    NODE_THREADPOOL_SIZE_MIN,
+    SERVER_PORT,
+)
+from timing import timed
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +46,10 @@ LOG_PROPERTIES = """
 logging.verbose: true
 """
 
+# Properties re-read by the running service on SIGHUP, by name pattern. Any other property
+# is only read on startup.
+DYNAMIC_PROPERTIES = ["logging.*"]
+
 
 class ConfigManager:
     """Manager for for handling configuration building + writing."""
@@ -49,6 +65,7 @@ class ConfigManager:
         self.workload = workload
         self.substrate = substrate
         self.config = config
+        self.workers = Workers(state, workload, config)
 
     @property
     def log_level(self) -> str:
@@ -78,6 +95,107 @@ class ConfigManager:
 
         return ""
 
+    def _runtime_option(self, option: str) -> str:
+        """A Node.js runtime option, "auto" if set to an invalid value."""
+        value = str(self.config[option]).strip()
+        if value in ["", "auto"] or value.isdigit():
+            return value
+
+        logger.error(
+            f"Invalid {option} config value of {value}. "
+            "Must be 'auto', a number or empty. Defaulting to 'auto'"
+        )
+        return "auto"
+
+    @property
+    def node_heap_size(self) -> int | None:
+        """The V8 old space size of the service, in MB, None for the Node.js default.
+
+        Derived from the memory of the unit in "auto" mode: half of it, shared by the
+        workers, leaving the rest to their off-heap memory, the exporter and the OS.
+        """
+        value = self._runtime_option("node_heap_size")
+        if value == "auto":
+            heap_size = self.workload.memory // 2 // self.workers.count
+            return max(NODE_HEAP_SIZE_MIN, min(heap_size, NODE_HEAP_SIZE_MAX))
+
+        return int(value) if value else None
+
+    @property
+    def node_threadpool_size(self) -> int | None:
+        """The libuv threadpool size of the service, None for the Node.js default.
+
+        One thread per core in "auto" mode, as TLS, compression and file system work
+        run on the pool.
+        """
+        value = self._runtime_option("node_threadpool_size")
+        if value == "auto":
+            return max(
+                NODE_THREADPOOL_SIZE_MIN, min(self.workload.cores, NODE_THREADPOOL_SIZE_MAX)
+            )
+
+        return int(value) if value else None
+
+    @property
+    def node_gc_flags(self) -> list[str]:
+        """The V8 garbage collection flags of the service.
+
+        In "auto" mode, a young generation sized with the heap, so that short-lived
+        allocations of requests are collected by fewer scavenges.
+        """
+        value = str(self.config["node_gc_flags"]).strip()
+        if value != "auto":
+            flags = value.split()
+            if invalid := [flag for flag in flags if not flag.startswith("--")]:
+                logger.error(f"Ignoring invalid node_gc_flags {invalid}")
+            return [flag for flag in flags if flag.startswith("--")]
+
+        if not (heap_size := self.node_heap_size):
+            return []
+
+        semi_space_size = 16 if heap_size < 2048 else 32 if heap_size < 8192 else 64
+        return [f"--max-semi-space-size={semi_space_size}"]
+
+    @property
+    def runtime_environment(self) -> list[str]:
+        """The environment of the service, applying the Node.js runtime options.
+
+        Returns:
+            List of `KEY=VALUE` lines
+        """
+        node_options = self.node_gc_flags
+        if self.node_heap_size:
+            node_options = [f"--max-old-space-size={self.node_heap_size}"] + node_options
+
+        environment = [f"NODE_OPTIONS={' '.join(node_options)}"] if node_options else []
+        if self.node_threadpool_size:
+            environment += [f"UV_THREADPOOL_SIZE={self.node_threadpool_size}"]
+
+        return environment
+
+    @property
+    def runtime_summary(self) -> str:
+        """The applied Node.js runtime options, as shown in the unit status.
+
+        Read from the environment file of the service rather than derived from the
+        config, so options not applied yet are not shown.
+        """
+        environment = dict(line.split("=", 1) for line in self.current_environment if "=" in line)
+        node_options = environment.get("NODE_OPTIONS", "").split()
+
+        summary = [
+            f"heap {option.split('=', 1)[1]}MB"
+            for option in node_options
+            if option.startswith("--max-old-space-size=")
+        ]
+        if threadpool_size := environment.get("UV_THREADPOOL_SIZE"):
+            summary += [f"{threadpool_size} uv threads"]
+        summary += [
+            option for option in node_options if not option.startswith("--max-old-space-size=")
+        ]
+
+        return f"runtime: {', '.join(summary)}" if summary else ""
+
     @property
     def dashboard_properties(self) -> list[str]:
         """Build the zoo.cfg content.
@@ -94,8 +212,14 @@ class ConfigManager:
             self.state.opensearch_server.password if self.state.opensearch_server else ""
         )
 
+        # nearest endpoints first, as the service sends most requests to the first host
         opensearch_endpoints = (
-            ", ".join(f"https://{endpoint}" for endpoint in self.state.opensearch_server.endpoints)
+            ", ".join(
+                f"https://{endpoint}"
+                for endpoint in self.state.endpoint_ranking.rank(
+                    self.state.opensearch_server.endpoints
+                )
+            )
             if self.state.opensearch_server and len(self.state.opensearch_server.endpoints) > 0
             else ""
         )
@@ -132,8 +256,55 @@ class ConfigManager:
         # Paths
         properties += [f"path.data: {self.workload.paths.data_path}"]
 
+        # Behind the load balancer, which serves the unit on the default port
+        if self.workers.enabled:
+            properties += [f"server.port: {self.workers.ports[0]}"]
+
         return properties
 
+    def worker_properties(self, worker: int) -> list[str]:
+        """Build the properties of a worker, with a port and data of its own."""
+        return [
+            prop
+            for prop in self.dashboard_properties
+            if not prop.startswith(("server.port:", "path.data:"))
+        ] + [
+            f"path.data: {self.workload.paths.worker_data(worker)}",
+            f"server.port: {self.workers.ports[worker]}",
+        ]
+
+    @property
+    def load_balancer_config(self) -> str:
+        """Build the configuration of the local load balancer, empty with a single worker.
+
+        Connections are passed through to the worker with the least of them, which
+        terminates TLS itself.
+        """
+        if not self.workers.enabled:
+            return ""
+
+        lines = [
+            LOAD_BALANCER_HEADER,
+            "defaults",
+            "    mode tcp",
+            "    timeout connect 5s",
+            f"    timeout client {LOAD_BALANCER_TIMEOUT}s",
+            f"    timeout server {LOAD_BALANCER_TIMEOUT}s",
+            "",
+            "frontend opensearch-dashboards",
+            f"    bind {self.state.bind_address}:{SERVER_PORT}",
+            "    default_backend workers",
+            "",
+            "backend workers",
+            "    balance leastconn",
+        ]
+        lines += [
+            f"    server worker-{worker} {self.state.bind_address}:{port} check"
+            for worker, port in enumerate(self.workers.ports)
+        ]
+
+        return "\n".join(lines) + "\n"
+
     @property
     def current_properties(self) -> list[str]:
         """The current configuration properties set to zoo.cfg."""
@@ -144,6 +315,11 @@ class ConfigManager:
         """The current /etc/environment variables."""
         return self.workload.read(path="/etc/environment")
 
+    @property
+    def current_environment(self) -> list[str]:
+        """The current environment variables of the service."""
+        return self.workload.environment
+
     @property
     def static_properties(self) -> list[str]:
         """Build the zoo.cfg content, without dynamic options.
@@ -153,13 +329,37 @@ class ConfigManager:
         """
         return self.build_static_properties(self.dashboard_properties)
 
+    @timed("config_render")
     def set_dashboard_properties(self) -> None:
-        """Writes built config file."""
+        """Writes built config file, and the ones of the other workers."""
+        for worker in range(1, self.workers.count):
+            self.workload.write(
+                content="\n".join(self.worker_properties(worker)),
+                path=self.workload.paths.worker_properties(worker),
+            )
+
         self.workload.write(
             content="\n".join(self.dashboard_properties),
             path=self.workload.paths.properties,
         )
 
+    def set_load_balancer(self) -> None:
+        """Applies the load balancer configuration, once the workers listen on their ports."""
+        self.workload.set_load_balancer(self.load_balancer_config)
+
+    def set_runtime_environment(self) -> bool:
+        """Writes the environment of the service, if changed.
+
+        Returns:
+            True if the environment changed
+        """
+        if set(self.current_environment) == set(self.runtime_environment):
+            return False
+
+        logger.info(f"Updating environment to {self.runtime_environment}")
+        self.workload.set_environment(self.runtime_environment)
+        return True
+
     @staticmethod
     def build_static_properties(properties: list[str]) -> list[str]:
         """Removes dynamic config options from list of properties.
@@ -173,27 +373,51 @@ class ConfigManager:
         return [
             prop
             for prop in properties
-            if ("clientPort" not in prop and "secureClientPort" not in prop)
+            if not any(
+                fnmatch(prop.split(":")[0].strip(), pattern) for pattern in DYNAMIC_PROPERTIES
+            )
         ]
 
+    @timed("config_render")
     def config_changed(self) -> bool:
-        """Compares expected vs actual config that would require a restart to apply."""
-        server_properties = self.build_static_properties(self.current_properties)
-        config_properties = self.static_properties
+        """Compares expected vs actual config that would require a restart to apply.
+
+        Changes of dynamic properties only are applied here, by reloading the service.
+        Changes of the environment and of the workers are written here, and require a
+        restart.
+        """
+        environment_changed = self.set_runtime_environment()
+        # the load balancer is only swapped in or out by the restart
+        workers_changed = self.workload.load_balancer != self.load_balancer_config
+
+        # installed ahead of the restart swapping it in, not while holding its lock
+        if workers_changed and self.workers.enabled and not self.workload.install_load_balancer():
+            logger.error(f"Unable to serve {self.workers.count} workers, keeping the current ones")
+            return environment_changed
+
+        server_properties = self.current_properties
+        config_properties = self.dashboard_properties
 
         properties_changed = set(server_properties) ^ set(config_properties)
 
-        if not properties_changed:
-            return False
+        if not properties_changed and not workers_changed:
+            return environment_changed
 
-        if properties_changed:
-            logger.info(
-                (
-                    f"Server.{self.state.unit_server.unit_id} updating properties - "
-                    f"OLD PROPERTIES = {set(server_properties) - set(config_properties)}, "
-                    f"NEW PROPERTIES = {set(config_properties) - set(server_properties)}"
-                )
+        logger.info(
+            (
+                f"Server.{self.state.unit_server.unit_id} updating properties - "
+                f"OLD PROPERTIES = {set(server_properties) - set(config_properties)}, "
+                f"NEW PROPERTIES = {set(config_properties) - set(server_properties)}, "
+                f"WORKERS = {self.workers.count}"
             )
-            self.set_dashboard_properties()
+        )
+        self.set_dashboard_properties()
 
-        return True
+        if environment_changed or workers_changed:
+            return True
+
+        if set(self.build_static_properties(server_properties)) != set(self.static_properties):
+            return True
+
+        # restarting only if the service could not be told to reload
+        return not self.workload.reload()
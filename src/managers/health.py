@@ -4,27 +4,51 @@
 
 """Manager for handling service health."""
 
+import hashlib
+import json
 import logging
 import os
+import sys
+import time
+from fnmatch import fnmatch
+from typing import Any, Callable
 
-import requests
-from requests.exceptions import ConnectionError, HTTPError
+from ops.framework import StoredState
+from ops.model import ConfigData
+from requests.exceptions import HTTPError, RequestException
 
+from core.breaker import CLOSED, CircuitBreakers
+from core.client import HTTPClient
 from core.cluster import SUBSTRATES, ClusterState
+from core.probes import (
+    DEGRADATIONS,
+    any_opensearch_green,
+    dashboards_health,
+    worker_metrics,
+    workers_health,
+)
+from core.workers import Workers
 from core.workload import WorkloadBase
+from deadline import deadline
 from exceptions import OSDAPIError
 from literals import (
-    HEALTH_OPENSEARCH_STATUS_URL,
+    HEALTH_CACHE_INVALIDATED_BY,
+    HEALTH_SIDECAR_DIR,
+    HEALTH_SIDECAR_SERVICE,
+    HEALTH_SIDECAR_STALE_INTERVALS,
     MSG_STATUS_APP_REMOVED,
     MSG_STATUS_DB_DOWN,
     MSG_STATUS_DB_MISSING,
     MSG_STATUS_ERROR,
     MSG_STATUS_UNAVAIL,
-    MSG_STATUS_UNHEALTHY,
     MSG_STATUS_UNKNOWN,
     MSG_STATUS_WORKLOAD_DOWN,
+    RESTART_POLL_BACKOFF,
+    RESTART_POLL_INTERVAL,
+    RESTART_POLL_INTERVAL_MAX,
 )
 from managers.api import APIManager
+from timing import timed
 
 logger = logging.getLogger(__name__)
 
@@ -37,30 +61,170 @@ class HealthManager:
         state: ClusterState,
         workload: WorkloadBase,
         substrate: SUBSTRATES,
+        config: ConfigData | None = None,
+        stored: StoredState | None = None,
+        client: HTTPClient | None = None,
     ):
         self.state = state
         self.workload = workload
         self.substrate = substrate
-        self.api_manager = APIManager(state, workload, substrate)
+        self.config = config
+        self._stored = stored
+        self.client = client or HTTPClient()
+        self.api_manager = APIManager(state, workload, substrate, client=self.client)
+        self.sidecar_dir = HEALTH_SIDECAR_DIR
+        self.workers = Workers(state, workload, config)
+        # up and runtime metrics of each worker, as last probed by the hook or the sidecar
+        self.worker_metrics: list[dict[str, float]] = []
+        # seconds the service took to serve after a restart, by optimizer cache state
+        self.cold_start: dict[str, float] = {}
+
+        self.breakers = None
+        if self._stored is not None:
+            self._stored.set_default(
+                health_results={}, health_context="", health_invalidated_at=0.0
+            )
+            self.breakers = CircuitBreakers(self._stored)
+
+    @property
+    def ttl(self) -> int:
+        """Seconds a healthy probe result is reused for, across hooks."""
+        if self.config is None:
+            return 0
+
+        return max(int(self.config.get("health_cache_ttl", 0)), 0)
+
+    @property
+    def _persistent(self) -> bool:
+        """Whether probe results are kept across hooks, for the running hook.
+
+        Kept results are dropped on the first use in a hook that may have changed their
+        inputs: relation, config and secret changes, and (re)starts of the workload.
+        """
+        context = os.environ.get("JUJU_CONTEXT_ID")
+        if not context or self._stored is None:
+            return False
+
+        if self._stored.health_context != context:
+            self._stored.health_context = context
+            event = os.environ.get("JUJU_DISPATCH_PATH", "").split("/")[-1]
+            if any(fnmatch(event, trigger) for trigger in HEALTH_CACHE_INVALIDATED_BY):
+                self.invalidate()
+
+        return True
+
+    def invalidate(self) -> None:
+        """Drops the cached probe results, and lets open breakers probe again.
+
+        Results of the sidecar checked until now are not used anymore either.
+        """
+        if self._stored is None:
+            return
+
+        self._stored.health_invalidated_at = time.time()
+        if self._stored.health_results:
+            logger.debug("Dropping cached health results")
+            self._stored.health_results = {}
+
+        if self.breakers:
+            self.breakers.half_open()
+
+    @property
+    def breaker_states(self) -> dict[str, str]:
+        """The circuit breaker state of each probed target."""
+        return {
+            target: self.breakers.state(target) if self.breakers else CLOSED
+            for target in ["opensearch", "dashboards"]
+        }
+
+    def _checked(self, name: str, probe: Callable[[], tuple[bool, str]]) -> tuple[bool, str]:
+        """Runs a probe, unless it was healthy within the TTL or its target is unreachable.
+
+        Recent results of the sidecar are used as they are, without probing. Otherwise,
+        only healthy results are cached, failures open the circuit breaker of the target
+        instead: they are reported again without probing, until its backoff passed.
+        Once the hook's budget ran out, the last healthy result is reported instead.
+        """
+        if not self._persistent or not self.breakers:
+            return probe()
+
+        if (result := self._sidecar_result(name)) is not None:
+            return result
+
+        results = self._stored.health_results  # type: ignore [reportOptionalMemberAccess]
+        if self.ttl and (cached := results.get(name)) and time.time() - cached["at"] < self.ttl:
+            logger.debug(f"Reusing {name} health result from {cached['at']}")
+            return True, ""
 
+        if (status := self.breakers.failure(name)) is not None:
+            logger.debug(f"Circuit breaker for {name} open, not probing")
+            return False, status
+
+        if deadline.expired:
+            return self._fallback(name)
+
+        healthy, message = probe()
+        if not healthy and deadline.expired:
+            # cut short by the hook's budget, which says nothing about the target
+            return self._fallback(name)
+
+        self.breakers.record(name, healthy, message)
+        if healthy and not message:
+            results[name] = {"at": time.time()}
+        else:
+            results.pop(name, None)
+
+        return healthy, message
+
+    def _fallback(self, name: str) -> tuple[bool, str]:
+        """The last healthy result of a probe, however old, if the hook's budget ran out.
+
+        Unknown if there is none, which does not block the unit.
+        """
+        results = self._stored.health_results  # type: ignore [reportOptionalMemberAccess]
+        if cached := results.get(name):
+            logger.warning(f"Hook budget exhausted, reusing {name} health from {cached['at']}")
+            return True, ""
+
+        logger.warning(f"Hook budget exhausted, {name} health unknown")
+        return True, MSG_STATUS_UNKNOWN
+
+    @timed("health_probe")
     def status_ok(self) -> tuple[bool, str]:
-        """Health status"""
+        """Health status, as bad as the worst of the workers."""
+        results = []
+        self.worker_metrics = []
+        for url in self.workers.urls:
+            healthy, message, metrics = self._worker_status(url)
+            if not healthy:
+                logger.debug(f"Worker at {url} not healthy: {message}")
+            results.append((healthy, message))
+            self.worker_metrics.append({"up": float(healthy), **metrics})
+
+        return workers_health(results)
+
+    def _worker_status(self, url: str) -> tuple[bool, str, dict[str, float]]:
+        """Health status and runtime metrics of a single worker."""
         try:
-            status_data = self.api_manager.service_status()
+            status_data = self.api_manager.service_status(url=url)
         except HTTPError as err:
             if err.response.status_code == 503:
-                return False, MSG_STATUS_UNAVAIL
-        except (ConnectionError, OSDAPIError):
-            return False, MSG_STATUS_UNAVAIL
+                return False, MSG_STATUS_UNAVAIL, {}
+            return False, MSG_STATUS_ERROR, {}
+        except (RequestException, OSDAPIError):
+            return False, MSG_STATUS_UNAVAIL, {}
 
-        if status_data["status"]["overall"]["state"] == "green":
-            return True, ""
-        elif status_data["status"]["overall"]["state"] == "yellow":
-            return True, MSG_STATUS_UNHEALTHY
-        elif status_data["status"]["overall"]["state"] != "green":
-            return False, MSG_STATUS_ERROR
-        return True, MSG_STATUS_UNKNOWN
+        return *dashboards_health(status_data, self.thresholds), worker_metrics(status_data)
 
+    @property
+    def thresholds(self) -> dict[str, int]:
+        """The configured runtime metric thresholds, above which the service is degraded."""
+        if self.config is None:
+            return {}
+
+        return {option: self.config.get(option, 0) for _, option in DEGRADATIONS.values()}
+
+    @timed("health_probe")
     def opensearch_ok(self) -> tuple[bool, str]:
         """Verify if associated Opensearch service is up and running."""
 
@@ -73,44 +237,223 @@ class HealthManager:
         ):
             return False, MSG_STATUS_DB_MISSING
 
-        for endpoint in self.state.opensearch_server.endpoints:
-            full_url = f"https://{endpoint}/{HEALTH_OPENSEARCH_STATUS_URL}"
+        endpoints = self.state.opensearch_server.endpoints
+        if not endpoints:
+            return False, MSG_STATUS_DB_DOWN
 
-            request_kwargs = {
-                "url": full_url,
-                "method": "GET",
-                "verify": self.workload.paths.opensearch_ca,
-                "headers": None,
-            }
-
-            try:
-                with requests.Session() as s:
-                    s.auth = (  # type: ignore [reportAttributeAccessIssue]
-                        self.state.opensearch_server.username,
-                        self.state.opensearch_server.password,
-                    )
-                    resp = s.request(**request_kwargs)
-                    resp.raise_for_status()
-            except requests.exceptions.RequestException:
-                continue
-
-            if resp.status_code == 200:
-                try:
-                    status = resp.json()
-                except requests.exceptions.JSONDecodeError:
-                    continue
-                if status.get("status") == "green":
-                    return True, ""
+        # relation data is read here, probe threads only do network I/O
+        auth = (self.state.opensearch_server.username, self.state.opensearch_server.password)
+        if any_opensearch_green(self.client, endpoints, auth, self.workload.paths.opensearch_ca):
+            return True, ""
 
         return False, MSG_STATUS_DB_DOWN
 
+    @property
+    def ready_timeout(self) -> int:
+        """Seconds to wait for the service to serve requests after a restart."""
+        if self.config is None:
+            return 0
+
+        return max(int(self.config.get("restart_ready_timeout", 0)), 0)
+
+    @timed("cold_start")
+    def wait_until_ready(self) -> bool:
+        """Polls the service status until it serves requests, with a growing interval.
+
+        Gives up after the ready timeout, or once the hook's budget runs out. Once
+        serving, the optimizer cache it started with is fully built.
+
+        Returns:
+            True if the service serves requests
+        """
+        cache = "warm" if self.workload.optimizer_cache_warm else "cold"
+        start = time.monotonic()
+        interval = RESTART_POLL_INTERVAL
+        while True:
+            ready, message = self.status_ok()
+            elapsed = time.monotonic() - start
+            if ready:
+                logger.info(f"Service ready {elapsed:.1f}s after restart, {cache} optimizer cache")
+                self.cold_start = {cache: elapsed}
+                self.workload.stamp_optimizer_cache()
+                return True
+
+            remaining = self.ready_timeout - elapsed
+            if deadline.remaining is not None:
+                remaining = min(remaining, deadline.remaining)
+            if remaining <= 0:
+                logger.warning(f"Service not ready {elapsed:.1f}s after restart: {message}")
+                return False
+
+            logger.debug(f"Service not ready yet ({message}), checking again in {interval}s")
+            time.sleep(min(interval, remaining))
+            interval = min(interval * RESTART_POLL_BACKOFF, RESTART_POLL_INTERVAL_MAX)
+
     def app_healthy(self) -> tuple[bool, str]:
         """Unit-level global healthcheck."""
-        return self.opensearch_ok()
+        return self._checked("opensearch", self.opensearch_ok)
 
     def unit_healthy(self) -> tuple[bool, str]:
         """Unit-level global healthcheck."""
         if not self.workload.alive:
             return False, MSG_STATUS_WORKLOAD_DOWN
 
-        return self.status_ok()
+        return self._checked("dashboards", self.status_ok)
+
+    # =================================
+    #  Health sidecar
+    # =================================
+
+    @property
+    def sidecar_interval(self) -> int:
+        """Seconds between the probes of the sidecar, 0 if disabled."""
+        if self.config is None:
+            return 0
+
+        return max(int(self.config.get("health_sidecar_interval", 0)), 0)
+
+    @property
+    def sidecar_config_path(self) -> str:
+        """What and how the sidecar probes, including credentials."""
+        return f"{self.sidecar_dir}/config.json"
+
+    @property
+    def sidecar_state_path(self) -> str:
+        """The latest results of the sidecar."""
+        return f"{self.sidecar_dir}/state.json"
+
+    @property
+    def sidecar_config(self) -> dict[str, Any] | None:
+        """The config of the sidecar, None if there is nothing to probe.
+
+        Its generation changes with any of its inputs, so results probed with a previous
+        config are never used.
+        """
+        if not self.state.url or not self.state.opensearch_server:
+            return None
+
+        if not (endpoints := self.state.opensearch_server.endpoints):
+            return None
+
+        auth = [self.state.opensearch_server.username, self.state.opensearch_server.password]
+        config = {
+            "interval": self.sidecar_interval,
+            "state_path": self.sidecar_state_path,
+            "opensearch": {
+                "endpoints": endpoints,
+                "auth": auth,
+                "ca": self.workload.paths.opensearch_ca,
+            },
+            "dashboards": {
+                "urls": self.workers.urls,
+                "auth": auth,
+                "ca": self.workload.paths.ca,
+                "thresholds": self.thresholds,
+            },
+        }
+        config["generation"] = hashlib.sha256(
+            json.dumps(config, sort_keys=True).encode()
+        ).hexdigest()
+        return config
+
+    def _sidecar_result(self, name: str) -> tuple[bool, str] | None:
+        """The sidecar's result for a target, None if disabled, missing or outdated."""
+        if not self.sidecar_interval:
+            return None
+
+        try:
+            with open(self.sidecar_state_path) as f:
+                results = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (
+            not (config := self.sidecar_config)
+            or results.get("generation") != config["generation"]
+        ):
+            return None
+
+        checked_at = results.get("checked_at", 0.0)
+        if (
+            time.time() - checked_at > HEALTH_SIDECAR_STALE_INTERVALS * self.sidecar_interval
+            or checked_at < self._stored.health_invalidated_at  # type: ignore [reportOptionalMemberAccess]
+        ):
+            logger.debug(f"Health sidecar results from {checked_at} outdated")
+            return None
+
+        healthy, message = results[name]
+        logger.debug(f"Using {name} health result of the sidecar from {checked_at}")
+        if name == "dashboards":
+            self.worker_metrics = results.get("workers", [])
+        return bool(healthy), message
+
+    @property
+    def sidecar_service(self) -> str:
+        """The systemd unit of the sidecar, running the charm's code without the hook's env."""
+        src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        charm_dir = os.path.dirname(src)
+        python_path = ":".join([src, f"{charm_dir}/lib", f"{charm_dir}/venv"])
+        return "\n".join(
+            [
+                "[Unit]",
+                "Description=Health prober of the opensearch-dashboards charm",
+                "After=network-online.target",
+                "",
+                "[Service]",
+                f"Environment=PYTHONPATH={python_path}",
+                f"WorkingDirectory={charm_dir}",
+                f"ExecStart={sys.executable} -m health_sidecar {self.sidecar_config_path}",
+                "Restart=on-failure",
+                "RestartSec=5",
+                "",
+                "[Install]",
+                "WantedBy=multi-user.target",
+                "",
+            ]
+        )
+
+    def _write_atomic(self, content: str, path: str) -> None:
+        """Writes a file readable by the owner only, so the sidecar never reads a partial one."""
+        fd = os.open(f"{path}.tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.replace(f"{path}.tmp", path)
+
+    def ensure_sidecar(self, restart: bool = False) -> None:
+        """Keeps the sidecar running with the current config, or stops it if not needed.
+
+        Args:
+            restart: whether to restart a running sidecar, e.g. on new charm code
+        """
+        if not self.sidecar_interval or not (config := self.sidecar_config):
+            self.stop_sidecar()
+            return
+
+        content = json.dumps(config, sort_keys=True)
+        try:
+            os.makedirs(self.sidecar_dir, mode=0o700, exist_ok=True)
+            try:
+                with open(self.sidecar_config_path) as f:
+                    changed = f.read() != content
+            except FileNotFoundError:
+                changed = True
+
+            # picked up by the running sidecar on its next round
+            if changed:
+                self._write_atomic(content, self.sidecar_config_path)
+        except OSError as e:
+            logger.warning(f"Unable to configure health sidecar: {e}")
+            return
+
+        self.workload.set_charm_service(HEALTH_SIDECAR_SERVICE, self.sidecar_service, restart)
+
+    def stop_sidecar(self) -> None:
+        """Stops and removes the sidecar, if installed, and drops its config and results."""
+        self.workload.set_charm_service(HEALTH_SIDECAR_SERVICE, "")
+        for path in [self.sidecar_config_path, self.sidecar_state_path]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Unable to remove {path}: {e}")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Manager for measuring the locality of the Opensearch endpoints."""
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from core.client import HTTPClient
+from core.cluster import SUBSTRATES, ClusterState
+from core.workload import WorkloadBase
+from deadline import DeadlineExceeded, deadline
+from literals import ENDPOINT_ZONE_ATTRIBUTE, HEALTH_PROBE_TIMEOUT, HEALTH_PROBE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class LocalityManager:
+    """Measures the round-trip time and zone of each Opensearch endpoint, for ranking."""
+
+    def __init__(
+        self,
+        state: ClusterState,
+        workload: WorkloadBase,
+        substrate: SUBSTRATES,
+        client: HTTPClient | None = None,
+    ):
+        self.state = state
+        self.workload = workload
+        self.substrate = substrate
+        self.client = client or HTTPClient()
+        # RTTs measured by the running hook, in seconds
+        self.samples: dict[str, float] = {}
+
+    @staticmethod
+    def _connect_time(endpoint: str) -> float | None:
+        """Milliseconds taken to open a TCP connection to an endpoint, None if unreachable."""
+        host, _, port = endpoint.rpartition(":")
+        try:
+            timeout = deadline.timeout(HEALTH_PROBE_TIMEOUT[0])
+            start = time.perf_counter()
+            with socket.create_connection((host.strip("[]"), int(port)), timeout=timeout):
+                return (time.perf_counter() - start) * 1000
+        except (OSError, ValueError, DeadlineExceeded) as e:
+            logger.debug(f"Unable to connect to Opensearch endpoint {endpoint}: {e}")
+            return None
+
+    def _zones(self, endpoints: list[str]) -> dict[str, str] | None:
+        """The zone attribute of each endpoint's node, from the first endpoint answering."""
+        if not self.state.endpoint_ranking.zone or not self.state.opensearch_server:
+            return None
+
+        auth = (self.state.opensearch_server.username, self.state.opensearch_server.password)
+        for endpoint in endpoints:
+            try:
+                resp = self.client.request(
+                    "GET",
+                    f"https://{endpoint}/_nodes/http",
+                    ca=self.workload.paths.opensearch_ca,
+                    auth=auth,
+                    params={
+                        "filter_path": "nodes.*.http.publish_address,nodes.*.attributes",
+                    },
+                    timeout=HEALTH_PROBE_TIMEOUT,
+                )
+                resp.raise_for_status()
+                nodes = resp.json().get("nodes", {})
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"Unable to get node zones from {endpoint}: {e}")
+                continue
+
+            zones = {}
+            for node in nodes.values():
+                # either `ip:port` or `hostname/ip:port`
+                address = node.get("http", {}).get("publish_address", "").split("/")[-1]
+                if zone := node.get("attributes", {}).get(ENDPOINT_ZONE_ATTRIBUTE):
+                    zones[address] = zone
+            return {endpoint: zones[endpoint] for endpoint in endpoints if endpoint in zones}
+
+        return None
+
+    def refresh(self) -> None:
+        """Measures the endpoints and re-ranks them, if due during a Juju dispatch."""
+        ranking = self.state.endpoint_ranking
+        if not os.environ.get("JUJU_CONTEXT_ID") or not ranking.due:
+            return
+
+        if not self.state.opensearch_server:
+            return
+
+        if not (endpoints := self.state.opensearch_server.endpoints):
+            return
+
+        with ThreadPoolExecutor(max_workers=min(len(endpoints), HEALTH_PROBE_WORKERS)) as executor:
+            rtts = dict(zip(endpoints, executor.map(self._connect_time, endpoints)))
+
+        if deadline.expired:
+            # measurements cut short by the hook's budget, not ranking on them
+            return
+
+        # failed measurements leave an endpoint where it is, as moving it restarts every
+        # unit (and moving it back once reachable again): the health check reports it
+        measured = {endpoint: rtt for endpoint, rtt in rtts.items() if rtt is not None}
+        self.samples = {endpoint: rtt / 1000 for endpoint, rtt in measured.items()}
+        ranking.update(endpoints, rtts=measured, zones=self._zones(ranking.rank(endpoints)))
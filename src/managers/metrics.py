@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Manager for exporting the charm's own hook timings."""
+import json
+import logging
+import os
+import sys
+
+from ops.model import ConfigData
+
+from core.cluster import SUBSTRATES, ClusterState
+from core.workload import WorkloadBase
+from literals import (
+    ENDPOINT_RTT_BUCKETS,
+    HOOK_METRICS_BUCKETS,
+    HOOK_METRICS_DIR,
+    HOOK_METRICS_PORT,
+    HOOK_METRICS_SERVICE,
+)
+from timing import timer
+
+logger = logging.getLogger(__name__)
+
+GAUGE_HELP = {
+    "health_breaker_state": "Circuit breaker of health probes: 0 closed, 1 half-open, 2 open.",
+    "dashboards_worker_up": "Whether an Opensearch Dashboards worker served its last probe.",
+    "dashboards_worker_response_time_ms": "Average response time of a worker.",
+    "dashboards_worker_event_loop_delay_ms": "Node.js event loop delay of a worker.",
+    "dashboards_worker_heap_usage_percent": "Used heap of a worker, of its heap size limit.",
+    "dashboards_worker_concurrent_connections": "Concurrent client connections of a worker.",
+    "dashboards_cold_start_seconds": "Seconds the service took to serve after its last restart.",
+}
+
+
+class MetricsManager:
+    """Keeps cumulative hook duration histograms, and serves them to Prometheus."""
+
+    def __init__(
+        self,
+        state: ClusterState,
+        workload: WorkloadBase,
+        substrate: SUBSTRATES,
+        config: ConfigData,
+        metrics_dir: str = HOOK_METRICS_DIR,
+    ):
+        self.state = state
+        self.workload = workload
+        self.substrate = substrate
+        self.config = config
+        self.metrics_dir = metrics_dir
+
+    @property
+    def enabled(self) -> bool:
+        """Whether hook timings are collected and exported."""
+        return bool(self.config.get("hook_metrics", False))
+
+    @property
+    def histograms_path(self) -> str:
+        """The cumulative histograms, across hooks."""
+        return f"{self.metrics_dir}/hook_metrics.json"
+
+    @property
+    def export_dir(self) -> str:
+        """The directory served by the exporter, holding nothing but the exposition."""
+        return f"{self.metrics_dir}/export"
+
+    @property
+    def exposition_path(self) -> str:
+        """The histograms in the Prometheus text format, as served to the scraper."""
+        return f"{self.export_dir}/hook_metrics.prom"
+
+    @property
+    def exporter_service(self) -> str:
+        """The systemd unit of the exporter, serving the exposition on localhost."""
+        command = " ".join(
+            [
+                sys.executable,
+                "-m",
+                "http.server",
+                str(HOOK_METRICS_PORT),
+                "--bind",
+                "127.0.0.1",
+                "--directory",
+                self.export_dir,
+            ]
+        )
+        return "\n".join(
+            [
+                "[Unit]",
+                "Description=Hook metrics exporter of the opensearch-dashboards charm",
+                "",
+                "[Service]",
+                f"ExecStart={command}",
+                "Restart=on-failure",
+                "RestartSec=5",
+                "",
+                "[Install]",
+                "WantedBy=multi-user.target",
+                "",
+            ]
+        )
+
+    @property
+    def scrape_config(self) -> dict:
+        """The scrape job for the exported hook timings."""
+        return {
+            "job_name": "hook_metrics",
+            "metrics_path": f"/{os.path.basename(self.exposition_path)}",
+            "static_configs": [{"targets": [f"localhost:{HOOK_METRICS_PORT}"]}],
+            "scheme": "http",
+        }
+
+    @staticmethod
+    def _observe(
+        histogram: dict, value: float, buckets: list[float] = HOOK_METRICS_BUCKETS
+    ) -> dict:
+        """Adds an observation to a cumulative histogram."""
+        histogram = histogram or {"buckets": [0] * len(buckets), "sum": 0.0}
+        for i, le in enumerate(buckets):
+            if value <= le:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] = histogram.get("count", 0) + 1
+        return histogram
+
+    @staticmethod
+    def _render_histogram(
+        name: str, labels: str, histogram: dict, buckets: list[float] = HOOK_METRICS_BUCKETS
+    ) -> list[str]:
+        """Renders a histogram in the Prometheus text format."""
+        lines = [
+            f'{name}_bucket{{{labels},le="{le}"}} {count}'
+            for le, count in zip(buckets, histogram["buckets"])
+        ]
+        lines += [
+            f'{name}_bucket{{{labels},le="+Inf"}} {histogram["count"]}',
+            f"{name}_sum{{{labels}}} {histogram['sum']:.6f}",
+            f"{name}_count{{{labels}}} {histogram['count']}",
+        ]
+        return lines
+
+    def render(self, histograms: dict) -> str:
+        """Renders all histograms in the Prometheus text format."""
+        lines = [
+            "# HELP charm_hook_duration_seconds Wall time of charm hook dispatches.",
+            "# TYPE charm_hook_duration_seconds histogram",
+        ]
+        for event, histogram in sorted(histograms.get("hooks", {}).items()):
+            lines += self._render_histogram(
+                "charm_hook_duration_seconds", f'event="{event}"', histogram
+            )
+
+        lines += [
+            "# HELP charm_hook_phase_duration_seconds Wall time of the phases of charm hooks.",
+            "# TYPE charm_hook_phase_duration_seconds histogram",
+        ]
+        for event, phases in sorted(histograms.get("phases", {}).items()):
+            for phase, histogram in sorted(phases.items()):
+                lines += self._render_histogram(
+                    "charm_hook_phase_duration_seconds",
+                    f'event="{event}",phase="{phase}"',
+                    histogram,
+                )
+
+        if rtts := histograms.get("rtts"):
+            lines += [
+                "# HELP charm_opensearch_endpoint_rtt_seconds TCP connect time to Opensearch "
+                "endpoints.",
+                "# TYPE charm_opensearch_endpoint_rtt_seconds histogram",
+            ]
+            for endpoint, histogram in sorted(rtts.items()):
+                lines += self._render_histogram(
+                    "charm_opensearch_endpoint_rtt_seconds",
+                    f'endpoint="{endpoint}"',
+                    histogram,
+                    ENDPOINT_RTT_BUCKETS,
+                )
+
+        for name, events in sorted(histograms.get("counters", {}).items()):
+            lines += [
+                f"# HELP charm_hook_{name}_total Total {name.replace('_', ' ')} of charm hooks.",
+                f"# TYPE charm_hook_{name}_total counter",
+            ]
+            lines += [
+                f'charm_hook_{name}_total{{event="{event}"}} {count}'
+                for event, count in sorted(events.items())
+            ]
+
+        for name, targets in sorted(histograms.get("gauges", {}).items()):
+            lines += [
+                f"# HELP charm_{name} {GAUGE_HELP.get(name, name.replace('_', ' '))}",
+                f"# TYPE charm_{name} gauge",
+            ]
+            lines += [
+                f'charm_{name}{{target="{target}"}} {value}'
+                for target, value in sorted(targets.items())
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def _write_atomic(self, content: str, path: str) -> None:
+        """Writes a file so the exporter never serves a partial one."""
+        with open(f"{path}.tmp", "w") as f:
+            f.write(content)
+        os.replace(f"{path}.tmp", path)
+
+    def record(
+        self,
+        event: str,
+        counters: dict[str, int] | None = None,
+        gauges: dict[str, dict[str, float]] | None = None,
+        rtts: dict[str, float] | None = None,
+    ) -> None:
+        """Adds the timings (and counters) of the finished hook to the exported metrics.
+
+        Args:
+            event: the dispatched hook or action
+            counters: totals accumulated per hook, by name
+            gauges: current values per target, by name
+            rtts: seconds measured to each Opensearch endpoint
+        """
+        try:
+            histograms = self._load()
+
+            hooks = histograms.setdefault("hooks", {})
+            hooks[event] = self._observe(hooks.get(event, {}), timer.elapsed)
+
+            phases = histograms.setdefault("phases", {}).setdefault(event, {})
+            for phase, elapsed in timer.phases.items():
+                phases[phase] = self._observe(phases.get(phase, {}), elapsed)
+
+            for name, count in (counters or {}).items():
+                events = histograms.setdefault("counters", {}).setdefault(name, {})
+                events[event] = events.get(event, 0) + count
+
+            histograms.setdefault("gauges", {}).update(gauges or {})
+
+            endpoint_rtts = histograms.setdefault("rtts", {})
+            for endpoint, rtt in (rtts or {}).items():
+                endpoint_rtts[endpoint] = self._observe(
+                    endpoint_rtts.get(endpoint, {}), rtt, ENDPOINT_RTT_BUCKETS
+                )
+
+            self._save(histograms)
+        except OSError as e:
+            logger.warning(f"Unable to record hook metrics: {e}")
+
+    def record_gauges(self, gauges: dict[str, dict[str, float]]) -> None:
+        """Updates the exported gauges only, when hooks are not timed.
+
+        Args:
+            gauges: current values per target, by name
+        """
+        try:
+            histograms = self._load()
+            histograms.setdefault("gauges", {}).update(gauges)
+            self._save(histograms)
+        except OSError as e:
+            logger.warning(f"Unable to record metrics: {e}")
+
+    def _load(self) -> dict:
+        """The cumulative metrics recorded until now."""
+        os.makedirs(self.export_dir, exist_ok=True)
+        try:
+            with open(self.histograms_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, histograms: dict) -> None:
+        """Writes the cumulative metrics, and their exposition."""
+        self._write_atomic(json.dumps(histograms), self.histograms_path)
+        self._write_atomic(self.render(histograms), self.exposition_path)
+
+    def ensure_exporter(self) -> None:
+        """Installs and starts the exporter, unless already installed."""
+        try:
+            os.makedirs(self.export_dir, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Unable to start hook metrics exporter: {e}")
+            return
+
+        self.workload.set_charm_service(HOOK_METRICS_SERVICE, self.exporter_service)
+
+    def stop_exporter(self) -> None:
+        """Stops and removes the exporter, if installed."""
+        self.workload.set_charm_service(HOOK_METRICS_SERVICE, "")
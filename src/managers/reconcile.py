@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Manager for skipping reconciles whose inputs did not change."""
+import hashlib
+import json
+import logging
+import time
+from typing import Callable
+
+from ops.framework import StoredState
+from ops.model import ConfigData, Relation
+
+from core.cluster import SUBSTRATES, ClusterState
+from core.workload import WorkloadBase
+from literals import OPENSEARCH_DASHBOARDS_SNAP_REVISION
+
+logger = logging.getLogger(__name__)
+
+
+class ReconcileManager:
+    """Fingerprints the reconcile inputs, to short-circuit runs that would change nothing."""
+
+    def __init__(
+        self,
+        state: ClusterState,
+        workload: WorkloadBase,
+        substrate: SUBSTRATES,
+        config: ConfigData,
+        stored: StoredState,
+    ):
+        self.state = state
+        self.workload = workload
+        self.substrate = substrate
+        self.config = config
+        self._stored = stored
+        self._stored.set_default(
+            reconcile_fingerprint="",
+            reconcile_healthy_since=0.0,
+            reconcile_fast_path=0,
+            reconcile_full=0,
+        )
+        # outcomes of the current hook, exported with the hook metrics
+        self.counters = {"reconcile_fast_path": 0, "reconcile_full": 0}
+
+    @property
+    def window(self) -> int:
+        """Seconds a healthy reconcile result is trusted for, while inputs are unchanged."""
+        return max(int(self.config.get("reconcile_window", 0)), 0)
+
+    @property
+    def fast_path_count(self) -> int:
+        """Number of reconciles skipped because nothing changed."""
+        return self._stored.reconcile_fast_path
+
+    @property
+    def full_count(self) -> int:
+        """Number of reconciles that ran the full pipeline."""
+        return self._stored.reconcile_full
+
+    def pop_counters(self) -> dict[str, int]:
+        """The fast path and full reconciles of the current hook, counting again from zero.
+
+        Returns:
+            Dict of the number of reconciles by outcome, for the hook metrics
+        """
+        counters = self.counters
+        self.counters = {"reconcile_fast_path": 0, "reconcile_full": 0}
+        return counters
+
+    def _databags(self, relation: Relation | None) -> dict[str, dict[str, str]]:
+        """The raw databags relevant to this unit, holding secret URIs rather than contents."""
+        if not relation:
+            return {}
+
+        entities = [self.state.model.app, self.state.model.unit]
+        if relation.app and relation.app != self.state.model.app:
+            entities.append(relation.app)
+
+        return {entity.name: dict(relation.data[entity]) for entity in entities}
+
+    def _file_hash(self, path: str) -> str:
+        """Hash of a workload file, empty if missing."""
+        try:
+            content = "\n".join(self.workload.read(path))
+        except FileNotFoundError:
+            return ""
+
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash over everything the outcome of a reconcile depends on."""
+        peer_relation = self.state.peer_relation
+        inputs = {
+            "peer": self._databags(peer_relation),
+            "peer_units": (
+                sorted(unit.name for unit in peer_relation.units) if peer_relation else []
+            ),
+            "opensearch": self._databags(self.state.opensearch_relation),
+            "opensearch_ranking": self.state.endpoint_ranking.ranking,
+            "tls": bool(self.state.tls_relation),
+            "secrets": self.state.secret_cache.revisions,
+            "config": dict(self.config),
+            "leader": self.state.model.unit.is_leader(),
+            "files": {
+                path: self._file_hash(path)
+                for path in [
+                    self.workload.paths.certificate,
+                    self.workload.paths.ca,
+                    self.workload.paths.opensearch_ca,
+                ]
+            },
+            "bind_address": str(self.state.bind_address),
+            # the revision the charm installs, without asking snapd
+            "revision": OPENSEARCH_DASHBOARDS_SNAP_REVISION,
+        }
+
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def unchanged(self, healthy: Callable[[], bool] = lambda: True) -> bool:
+        """Checks whether the last healthy reconcile still applies, counting the outcome.
+
+        Args:
+            healthy: checks the services are still healthy, once the inputs match
+
+        Returns:
+            True if the inputs match the last healthy reconcile within the window, and
+                the services are still healthy
+        """
+        healthy_since = self._stored.reconcile_healthy_since
+        if (
+            self.window
+            and healthy_since
+            and time.time() - healthy_since < self.window
+            and self.fingerprint == self._stored.reconcile_fingerprint
+            and healthy()
+        ):
+            self._stored.reconcile_fast_path += 1
+            self.counters["reconcile_fast_path"] += 1
+            logger.debug(
+                f"Reconcile inputs unchanged, skipping - fast path taken "
+                f"{self.fast_path_count}/{self.fast_path_count + self.full_count} times"
+            )
+            return True
+
+        self._stored.reconcile_full += 1
+        self.counters["reconcile_full"] += 1
+        self._stored.reconcile_healthy_since = 0.0
+        return False
+
+    def set_healthy(self) -> None:
+        """Records the current inputs as fully reconciled and healthy."""
+        if not self.window:
+            return
+
+        self._stored.reconcile_fingerprint = self.fingerprint
+        self._stored.reconcile_healthy_since = time.time()
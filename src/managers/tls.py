@@ -5,12 +5,15 @@
 """Manager for building necessary files for Java TLS auth."""
 import logging
 import subprocess
-from subprocess import STDOUT, CalledProcessError
+from subprocess import STDOUT, CalledProcessError, TimeoutExpired
 
 import ops.pebble
 
 from core.cluster import SUBSTRATES, ClusterState
 from core.workload import WorkloadBase
+from deadline import DeadlineExceeded, deadline
+from literals import OPENSSL_TIMEOUT
+from timing import timed
 
 logger = logging.getLogger(__name__)
 
@@ -71,16 +74,28 @@ class TLSManager:
             raise e
         self.workload.configure("scheme", "http")
 
+    @timed("certificate_check")
     def certificate_valid(self) -> bool:
-        """Check if server certificate is valid"""
+        """Check if server certificate is valid.
+
+        If the hook's budget runs out, the certificate is assumed to be unchanged, and
+        checked again by the next hook.
+        """
         cmd = f"openssl x509 -in {self.workload.paths.certificate} -subject -noout"
         try:
             response = subprocess.check_output(
-                cmd, stderr=STDOUT, shell=True, universal_newlines=True
+                cmd,
+                stderr=STDOUT,
+                shell=True,
+                universal_newlines=True,
+                timeout=deadline.timeout(OPENSSL_TIMEOUT),
             )
         except CalledProcessError as error:
             logging.error(f"Checking certificate failed: {error.output}")
             return False
+        except (TimeoutExpired, DeadlineExceeded) as e:
+            logger.warning(f"Certificate not checked, assuming unchanged: {e}")
+            return True
 
         logger.debug(f"Response of openssl cert decode: {response}")
         logger.debug(
@@ -4,11 +4,15 @@
 
 """Manager for building necessary files for TLS auth."""
 import logging
-
-from charms.data_platform_libs.v0.upgrade import DependencyModel
+from functools import cached_property
+from typing import TYPE_CHECKING
 
 from core.cluster import SUBSTRATES, ClusterState
 from core.workload import WorkloadBase
+from literals import DEPENDENCIES
+
+if TYPE_CHECKING:
+    from events.upgrade import OpensearchDashboardsDependencyModel
 
 logger = logging.getLogger(__name__)
 
@@ -21,12 +25,26 @@ class UpgradeManager:
         state: ClusterState,
         workload: WorkloadBase,
         substrate: SUBSTRATES,
-        dependency_model: DependencyModel,
     ):
         self.state = state
         self.workload = workload
         self.substrate = substrate
-        self.dependency_model = dependency_model
+
+    @cached_property
+    def dependency_model(self) -> "OpensearchDashboardsDependencyModel":
+        """The validated charm dependencies, only built when upgrade logic needs them."""
+        from events.upgrade import OpensearchDashboardsDependencyModel
+
+        return OpensearchDashboardsDependencyModel(**DEPENDENCIES)
+
+    @property
+    def required_opensearch_version(self) -> str:
+        """The Opensearch version Dashboards depends on."""
+        # avoids importing pydantic for the plain version lookup done on every reconcile
+        if "dependency_model" not in self.__dict__:
+            return DEPENDENCIES["osd_upstream"]["dependencies"]["opensearch"]
+
+        return self.dependency_model.osd_upstream.dependencies["opensearch"]
 
     def version_compatible(self) -> bool:
         """Verify version compatibility with Opensearch."""
@@ -37,7 +55,7 @@ class UpgradeManager:
         if not (srv_version_actual := self.state.opensearch_server.version):
             return False
 
-        srv_version_required = self.dependency_model.osd_upstream.dependencies["opensearch"]
+        srv_version_required = self.required_opensearch_version
         major_actual, minor_actual = srv_version_actual.split(".")[:2]
         major_required, minor_required = srv_version_required.split(".")[:2]
         return major_actual <= major_required and minor_actual <= minor_required
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Opt-in timing of the phases of a hook dispatch."""
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class HookTimer:
+    """Accumulates the wall time spent in each phase of the running hook.
+
+    Disabled by default, in which case timing a phase costs one attribute lookup.
+    Nested phases of the same name (e.g. retried snapd calls) are only counted once.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self._active: set[str] = set()
+
+    def reset(self) -> None:
+        """Starts timing a new hook."""
+        self.started = time.perf_counter()
+        self.phases = {}
+        self._active = set()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the hook started."""
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times the enclosed block as (part of) phase `name`."""
+        if not self.enabled or name in self._active:
+            yield
+            return
+
+        self._active.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            self._active.discard(name)
+
+
+timer = HookTimer()
+
+
+def timed(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator timing every call of the decorated function as phase `name`."""
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> T:
+            with timer.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
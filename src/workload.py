@@ -3,22 +3,43 @@
 # See LICENSE file for licensing details.
 
 """Implementation of WorkloadBase for running on VMs."""
+import glob
 import logging
 import os
 import secrets
 import shutil
 import string
 import subprocess
+from fnmatch import fnmatch
+from functools import cached_property
 
+from charms.operator_libs_linux.v0 import apt
 from charms.operator_libs_linux.v2 import snap
 from tenacity import retry
 from tenacity.retry import retry_any, retry_if_exception, retry_if_not_result
-from tenacity.stop import stop_after_attempt
+from tenacity.stop import stop_after_attempt, stop_any
 from tenacity.wait import wait_fixed
 from typing_extensions import override
 
+from core.snapd import SnapdClient
 from core.workload import WorkloadBase
-from literals import OPENSEARCH_DASHBOARDS_SNAP_REVISION
+from deadline import DeadlineExceeded, deadline, stop_at_deadline
+from literals import (
+    CHARM_SERVICE_DIR,
+    DAEMON_DROP_IN,
+    LOAD_BALANCER,
+    LOAD_BALANCER_BIN,
+    LOAD_BALANCER_CONF,
+    LOAD_BALANCER_HEADER,
+    OPENSEARCH_DASHBOARDS_SNAP_REVISION,
+    SNAP_STAGING_DIR,
+    SNAPD_TIMEOUT,
+    SYSTEMCTL_TIMEOUT,
+    WORKER_UNIT,
+    WORKER_UNIT_TEMPLATE,
+    WORKERS_MAX,
+)
+from timing import timed
 
 logger = logging.getLogger(__name__)
 
@@ -31,26 +52,64 @@ class ODWorkload(WorkloadBase):
     SNAP_EXPORTER_SERVICE = "kibana-exporter-daemon"
 
     def __init__(self):
-        self.dashboards = snap.SnapCache()[self.SNAP_NAME]
+        self.snapd = SnapdClient()
+        # services seen active by the running hook, until it starts or stops them
+        self._services_active = False
+
+    @cached_property
+    @timed("snapd")
+    def dashboards(self) -> snap.Snap:
+        """The snap, looked up on first use instead of loading the whole snap cache."""
+        try:
+            info = self.snapd.get_installed_snap(self.SNAP_NAME)
+        except snap.SnapAPIError as e:
+            if e.code != 404:
+                raise
+            # not installed yet, looked up in the store
+            return snap.SnapCache()[self.SNAP_NAME]
+
+        dashboards = snap.Snap(
+            name=info["name"],
+            state=snap.SnapState.Latest,
+            channel=info["channel"],
+            revision=info["revision"],
+            confinement=info["confinement"],
+            apps=info.get("apps"),
+        )
+        dashboards._snap_client = self.snapd
+        return dashboards
+
+    def _bound_snapd(self) -> None:
+        """Bounds the next snapd API calls by the budget left to the running hook.
+
+        Raises:
+            DeadlineExceeded if the budget ran out
+        """
+        self.snapd.timeout = deadline.timeout(SNAPD_TIMEOUT)
 
     @override
+    @timed("snapd")
     def start(self) -> None:
+        self._services_active = False
         try:
             self.dashboards.start(services=[self.SNAP_APP_SERVICE, self.SNAP_EXPORTER_SERVICE])
         except snap.SnapError as e:
             logger.exception(str(e))
 
     @override
+    @timed("snapd")
     def stop(self) -> None:
+        self._services_active = False
         try:
             self.dashboards.stop(services=[self.SNAP_APP_SERVICE, self.SNAP_EXPORTER_SERVICE])
         except snap.SnapError as e:
             logger.exception(str(e))
 
     @override
+    @timed("snapd")
     @retry(
         wait=wait_fixed(1),
-        stop=stop_after_attempt(5),
+        stop=stop_any(stop_after_attempt(5), stop_at_deadline),
         retry_error_callback=lambda state: state.outcome.result(),  # type: ignore
         retry=retry_any(
             retry_if_not_result(lambda result: True if result else False),
@@ -58,6 +117,7 @@ class ODWorkload(WorkloadBase):
         ),
     )
     def restart(self) -> bool:
+        self._services_active = False
         try:
             self.dashboards.restart(services=[self.SNAP_APP_SERVICE, self.SNAP_EXPORTER_SERVICE])
         except snap.SnapError as e:
@@ -65,12 +125,247 @@ class ODWorkload(WorkloadBase):
         return self.alive()
 
     @override
+    def reload(self) -> bool:
+        # the running workers too, not signalled along with the service they are part of
+        units = [f"snap.{self.SNAP_NAME}.{self.SNAP_APP_SERVICE}.service", WORKER_UNIT.format("*")]
+        if not self._systemctl("kill", "--signal=SIGHUP", "--kill-whom=main", *units):
+            return False
+
+        logger.info(f"Reloaded {' '.join(units)}")
+        return True
+
+    @override
+    @timed("snapd")
     def configure(self, key, value) -> None:
+        # the snap's configure hook may restart the services
+        self._services_active = False
         try:
             self.dashboards.set(config={key: value})
         except snap.SnapError as e:
             logger.exception(str(e))
 
+    @property
+    @override
+    def environment(self) -> list[str]:
+        try:
+            with open(self.paths.environment) as f:
+                return [line for line in f.read().split("\n") if line]
+        except FileNotFoundError:
+            return []
+
+    @override
+    def set_environment(self, environment: list[str]) -> None:
+        self.write(content="\n".join(environment), path=self.paths.environment)
+        if os.path.exists(DAEMON_DROP_IN):
+            return
+
+        # root-owned, only the environment file it points to is written afterwards
+        os.makedirs(os.path.dirname(DAEMON_DROP_IN), exist_ok=True)
+        with open(DAEMON_DROP_IN, "w") as f:
+            f.write(f"[Service]\nEnvironmentFile=-{self.paths.environment}\n")
+
+        self._systemctl("daemon-reload")
+
+    def _systemctl(self, *args: str) -> bool:
+        """Runs a systemctl command, within the hook's budget.
+
+        Returns:
+            True if it succeeded
+        """
+        try:
+            subprocess.check_output(
+                ["systemctl", *args],
+                stderr=subprocess.STDOUT,
+                universal_newlines=True,
+                timeout=deadline.timeout(SYSTEMCTL_TIMEOUT),
+            )
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, DeadlineExceeded) as e:
+            logger.warning(f"Unable to run systemctl {' '.join(args)}: {getattr(e, 'output', e)}")
+            return False
+
+        return True
+
+    @property
+    def _enabled_workers(self) -> list[str]:
+        """The worker units enabled along with the snap's service."""
+        daemon = f"snap.{self.SNAP_NAME}.{self.SNAP_APP_SERVICE}.service"
+        try:
+            units = os.listdir(f"{os.path.dirname(WORKER_UNIT_TEMPLATE)}/{daemon}.wants")
+        except FileNotFoundError:
+            return []
+
+        return [unit for unit in units if fnmatch(unit, WORKER_UNIT.format("*"))]
+
+    @override
+    def set_workers(self, count: int) -> None:
+        enabled = self._enabled_workers
+        if count <= 1 and not enabled:
+            return
+
+        for worker in range(1, count):
+            # workers may not share the data of a running instance
+            if not os.path.isdir(data := self.paths.worker_data(worker)):
+                os.makedirs(data)
+                shutil.chown(data, user="snap_daemon", group="root")
+
+        if not os.path.exists(WORKER_UNIT_TEMPLATE):
+            daemon = f"snap.{self.SNAP_NAME}.{self.SNAP_APP_SERVICE}.service"
+            # started, stopped and restarted along with the snap's service
+            with open(WORKER_UNIT_TEMPLATE, "w") as f:
+                f.write(
+                    "\n".join(
+                        [
+                            "[Unit]",
+                            "Description=OpenSearch Dashboards worker %i",
+                            f"After={daemon}",
+                            f"PartOf={daemon}",
+                            "",
+                            "[Service]",
+                            f"Environment=OSD_PATH_CONF={self.paths.conf_path}/workers/%i",
+                            f"EnvironmentFile=-{self.paths.environment}",
+                            f"ExecStart=/usr/bin/snap run {self.SNAP_NAME}.{self.SNAP_APP_SERVICE}",
+                            "Restart=on-failure",
+                            "",
+                            "[Install]",
+                            f"WantedBy={daemon}",
+                            "",
+                        ]
+                    )
+                )
+            self._systemctl("daemon-reload")
+
+        # the first worker is the snap's service
+        workers = [WORKER_UNIT.format(worker) for worker in range(1, WORKERS_MAX)]
+        if started := [unit for unit in workers[: count - 1] if unit not in enabled]:
+            self._systemctl("enable", *started)
+        if stopped := [unit for unit in workers[max(count - 1, 0) :] if unit in enabled]:
+            self._systemctl("disable", "--now", *stopped)
+
+    @property
+    @override
+    def load_balancer(self) -> str:
+        try:
+            with open(LOAD_BALANCER_CONF) as f:
+                content = f.read()
+        except FileNotFoundError:
+            return ""
+
+        # only a configuration written by the charm is managed by it
+        return content if content.startswith(LOAD_BALANCER_HEADER) else ""
+
+    @override
+    def install_load_balancer(self) -> bool:
+        if os.path.exists(LOAD_BALANCER_BIN):
+            return True
+
+        try:
+            apt.add_package(LOAD_BALANCER)
+        except (apt.PackageError, apt.PackageNotFoundError) as e:
+            logger.error(f"Unable to install {LOAD_BALANCER}: {e}")
+            return False
+
+        return True
+
+    @override
+    def set_load_balancer(self, content: str) -> None:
+        if content == self.load_balancer:
+            return
+
+        if not content:
+            self._systemctl("disable", "--now", f"{LOAD_BALANCER}.service")
+            os.remove(LOAD_BALANCER_CONF)
+            return
+
+        if not os.path.exists(LOAD_BALANCER_BIN):
+            logger.error(f"{LOAD_BALANCER} not installed, unable to serve the workers")
+            return
+
+        with open(LOAD_BALANCER_CONF, "w") as f:
+            f.write(content)
+
+        self._systemctl("enable", f"{LOAD_BALANCER}.service")
+        self._systemctl("reload-or-restart", f"{LOAD_BALANCER}.service")
+
+    @override
+    def set_charm_service(self, name: str, content: str, restart: bool = False) -> None:
+        path = f"{CHARM_SERVICE_DIR}/{name}"
+        try:
+            with open(path) as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = ""
+
+        if not content:
+            if current:
+                self._systemctl("disable", "--now", name)
+                os.remove(path)
+                self._systemctl("daemon-reload")
+            return
+
+        if content != current:
+            with open(path, "w") as f:
+                f.write(content)
+            self._systemctl("daemon-reload")
+            self._systemctl("enable", name)
+            restart = True
+
+        if restart:
+            self._systemctl("restart", name)
+
+    @property
+    @override
+    def optimizer_cache_warm(self) -> bool:
+        built = self._optimizer_cache_built
+        return bool(built) and os.path.isdir(self.paths.optimizer_cache) and built == self.revision
+
+    @override
+    def stamp_optimizer_cache(self) -> None:
+        if not os.path.isdir(self.paths.optimizer_cache):
+            return
+
+        if self._optimizer_cache_built != (revision := self.revision):
+            self.write(content=revision, path=self.paths.optimizer_cache_revision)
+
+    @property
+    def _optimizer_cache_built(self) -> str:
+        """The revision which fully built the optimizer cache, empty if unknown."""
+        try:
+            with open(self.paths.optimizer_cache_revision) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def _swap_optimizer_cache(self, revision: str) -> None:
+        """Sets the optimizer cache of the installed revision aside, for the one of `revision`.
+
+        The cache of the previous revision is kept, to be restored if it is installed
+        again (e.g. on rollback). A cache of unknown revision may be partial, and is removed.
+        """
+        built = self._optimizer_cache_built
+        if built == revision:
+            return
+
+        cache = self.paths.optimizer_cache
+        try:
+            for stash in glob.glob(self.paths.optimizer_cache_stash("*")):
+                if stash not in [self.paths.optimizer_cache_stash(r) for r in (built, revision)]:
+                    shutil.rmtree(stash)
+
+            if built and os.path.isdir(cache):
+                shutil.rmtree(self.paths.optimizer_cache_stash(built), ignore_errors=True)
+                os.rename(cache, self.paths.optimizer_cache_stash(built))
+            else:
+                shutil.rmtree(cache, ignore_errors=True)
+
+            if os.path.isdir(stash := self.paths.optimizer_cache_stash(revision)):
+                os.rename(stash, cache)
+                self.write(content=revision, path=self.paths.optimizer_cache_revision)
+                logger.info(f"Restored the optimizer cache of revision {revision}")
+            elif os.path.exists(self.paths.optimizer_cache_revision):
+                os.remove(self.paths.optimizer_cache_revision)
+        except OSError as e:
+            logger.warning(f"Unable to swap the optimizer cache: {e}")
+
     @override
     def read(self, path: str) -> list[str]:
         if not os.path.exists(path):
@@ -100,20 +395,51 @@ class ODWorkload(WorkloadBase):
             cwd=working_dir,
         )
 
+    @property
+    @override
+    def revision(self) -> str:
+        return str(self.dashboards.revision)
+
+    @property
     @override
+    def cores(self) -> int:
+        # the cores the charm may run on, as restricted by cpusets
+        return len(os.sched_getaffinity(0))
+
+    @property
+    @override
+    def memory(self) -> int:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 1024**2
+
+    @override
+    @timed("snapd")
     @retry(
         wait=wait_fixed(1),
-        stop=stop_after_attempt(5),
+        stop=stop_any(stop_after_attempt(5), stop_at_deadline),
         retry_error_callback=lambda state: state.outcome.result(),  # type: ignore
         retry=retry_if_not_result(lambda result: True if result else False),
     )
     def alive(self) -> bool:
+        # only active services are remembered, inactive ones may be starting
+        if self._services_active:
+            return True
+
         try:
-            return bool(self.dashboards.services[self.SNAP_APP_SERVICE]["active"]) and bool(
-                self.dashboards.services[self.SNAP_EXPORTER_SERVICE]["active"]
+            self._bound_snapd()
+            services = self.dashboards.services
+            self._services_active = bool(services[self.SNAP_APP_SERVICE]["active"]) and bool(
+                services[self.SNAP_EXPORTER_SERVICE]["active"]
             )
         except KeyError:
             return False
+        except snap.SnapAPIError as e:
+            logger.warning(f"Unable to get services from snapd: {e}")
+            return False
+        except DeadlineExceeded as e:
+            logger.warning(f"Unable to check services: {e}")
+            return False
+
+        return self._services_active
 
     @override
     def healthy(self) -> bool:
@@ -121,12 +447,107 @@ class ODWorkload(WorkloadBase):
 
     # --- Charm Specific ---
 
+    @property
+    def up_to_date(self) -> bool:
+        """Whether the target revision of the snap is installed."""
+        try:
+            return self.dashboards.present and self.revision == OPENSEARCH_DASHBOARDS_SNAP_REVISION
+        except (snap.SnapError, snap.SnapAPIError, snap.SnapNotFoundError) as e:
+            logger.debug(f"Unable to get the installed snap: {e}")
+            return False
+
+    @property
+    def staged(self) -> tuple[str, str]:
+        """The downloaded snap and assertion files of the target revision."""
+        name = f"{SNAP_STAGING_DIR}/{self.SNAP_NAME}_{OPENSEARCH_DASHBOARDS_SNAP_REVISION}"
+        return f"{name}.snap", f"{name}.assert"
+
+    def _snap_cli(self, *args: str) -> None:
+        """Runs a snap command, for as long as the hook's budget allows.
+
+        Raises:
+            CalledProcessError, TimeoutExpired, DeadlineExceeded
+        """
+        subprocess.check_output(
+            ["snap", *args],
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            timeout=deadline.timeout(None),
+        )
+
+    @timed("snap_download")
+    def prestage(self) -> bool:
+        """Downloads the target revision of the snap, and acknowledges its assertions.
+
+        Lets a later install swap revisions without going to the store. Previously
+        staged revisions are removed.
+
+        Returns:
+            True if the target revision is installed or staged
+        """
+        if self.up_to_date:
+            return True
+
+        snap_file, assert_file = self.staged
+        try:
+            os.makedirs(SNAP_STAGING_DIR, exist_ok=True)
+            for staged in os.listdir(SNAP_STAGING_DIR):
+                if f"{SNAP_STAGING_DIR}/{staged}" not in self.staged:
+                    os.remove(f"{SNAP_STAGING_DIR}/{staged}")
+
+            if not (os.path.exists(snap_file) and os.path.exists(assert_file)):
+                logger.info(
+                    f"Downloading {self.SNAP_NAME} revision {OPENSEARCH_DASHBOARDS_SNAP_REVISION}"
+                )
+                self._snap_cli(
+                    "download",
+                    self.SNAP_NAME,
+                    f"--revision={OPENSEARCH_DASHBOARDS_SNAP_REVISION}",
+                    f"--target-directory={SNAP_STAGING_DIR}",
+                )
+
+            # verifies the signatures of the assertions the snap is checked against
+            self._snap_cli("ack", assert_file)
+        except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"Unable to stage {self.SNAP_NAME}: {getattr(e, 'output', e)}")
+            return False
+
+        return True
+
+    @timed("snapd")
     def install(self) -> bool:
         """Loads the snap from LP, returning a StatusBase for the Charm to set.
 
+        Nothing is done if the target revision is already installed, and a staged
+        download of it is installed instead of downloading it again. Once installed, the
+        optimizer cache is swapped for the one the target revision built, if kept.
+
         Returns:
             True if successfully installed. False otherwise.
         """
+        if self.up_to_date:
+            logger.info(f"{self.SNAP_NAME} revision {self.revision} already installed")
+            return True
+
+        snap_file, assert_file = self.staged
+        if os.path.exists(snap_file) and os.path.exists(assert_file):
+            try:
+                self._snap_cli("ack", assert_file)
+                self._snap_cli("install", snap_file)
+            except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                logger.warning(f"Unable to install staged {snap_file}: {getattr(e, 'output', e)}")
+            else:
+                for path in [snap_file, assert_file]:
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        logger.warning(f"Unable to remove staged {path}: {e}")
+
+                # looked up again with the new revision
+                self.__dict__.pop("dashboards", None)
+                self._installed()
+                return True
+
         try:
             cache = snap.SnapCache()
             dashboards = cache[self.SNAP_NAME]
@@ -137,14 +558,27 @@ class ODWorkload(WorkloadBase):
                 channel="edge",
             )
 
+            dashboards._snap_client = self.snapd
             self.dashboards = dashboards
-            self.dashboards.hold()
-
-            return True
         except snap.SnapError as e:
             logger.error(str(e))
             return False
 
+        self._installed()
+        return True
+
+    def _installed(self) -> None:
+        """Completes an install of the target revision: holds it, and swaps the optimizer cache.
+
+        The snap is installed by then, so failing to hold it is only logged.
+        """
+        self._swap_optimizer_cache(OPENSEARCH_DASHBOARDS_SNAP_REVISION)
+
+        try:
+            self.dashboards.hold()
+        except (snap.SnapError, snap.SnapAPIError) as e:
+            logger.error(f"Unable to hold {self.SNAP_NAME}: {e}")
+
     def generate_password(self) -> str:
         """Creates randomized string for use as app passwords.
 
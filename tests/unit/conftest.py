@@ -1,11 +1,27 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
 
-from unittest.mock import PropertyMock
+import datetime
+import ipaddress
+import json
+import socket
+import ssl
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, PropertyMock
 
 import pytest
+from charms.operator_libs_linux.v2 import snap
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
 from ops import JujuVersion
 
+from literals import OPENSEARCH_DASHBOARDS_SNAP_REVISION
+
 
 @pytest.fixture(autouse=True)
 def patched_wait(mocker):
@@ -22,12 +38,123 @@ def patched_healthy(mocker):
     mocker.patch("workload.ODWorkload.healthy", new_callable=PropertyMock, return_value=True)
 
 
+@pytest.fixture(autouse=True)
+def installed_snap(mocker, request):
+    """The snap at its target revision, instead of looked up from snapd.
+
+    Left to the tests serving their own snapd socket.
+    """
+    if "snapd" in request.fixturenames:
+        return None
+
+    dashboards = MagicMock(
+        spec=snap.Snap, present=True, revision=OPENSEARCH_DASHBOARDS_SNAP_REVISION, services={}
+    )
+    mocker.patch("workload.ODWorkload.dashboards", dashboards)
+    return dashboards
+
+
+@pytest.fixture(autouse=True)
+def patched_drop_in(mocker, tmp_path):
+    mocker.patch("workload.DAEMON_DROP_IN", str(tmp_path / "daemon.service.d/environment.conf"))
+
+
+@pytest.fixture(autouse=True)
+def charm_services(mocker, tmp_path_factory):
+    """The directory the charm installs its own services' units to."""
+    path = tmp_path_factory.mktemp("systemd")
+    mocker.patch("workload.CHARM_SERVICE_DIR", str(path))
+    return path
+
+
 @pytest.fixture(autouse=True)
 def juju_has_secrets(mocker):
     """Using Juju3 we should always have secrets available."""
     mocker.patch.object(JujuVersion, "has_secrets", new_callable=PropertyMock).return_value = True
 
 
+@pytest.fixture(scope="session")
+def tls_files(tmp_path_factory):
+    """A self-signed certificate for 127.0.0.1, and its key."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]),
+            critical=False,
+        )
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+
+    path = tmp_path_factory.mktemp("tls")
+    (path / "cert.pem").write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    (path / "key.pem").write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption(),
+        )
+    )
+    return str(path / "cert.pem"), str(path / "key.pem")
+
+
+@pytest.fixture
+def standin(tls_files):
+    """Starts local stand-ins for Opensearch nodes (or Dashboards), returning their endpoints."""
+    servers = []
+    requests_seen = []
+
+    def start(behaviour: str, delay: float = 0.0, body: dict | None = None) -> str:
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                requests_seen.append(self.path)
+                if behaviour == "reset":
+                    # RST instead of a response
+                    self.connection.setsockopt(
+                        socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+                    )
+                    self.close_connection = True
+                    return
+
+                time.sleep(delay)
+                content = json.dumps(body or {"status": behaviour}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*tls_files)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"127.0.0.1:{server.server_address[1]}"
+
+    start.requests = requests_seen
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
 # @pytest.fixture(autouse=True)
 # def patched_idle(mocker):
 #     mocker.patch(
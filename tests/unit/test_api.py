@@ -12,7 +12,13 @@ import yaml
 from ops.testing import Harness
 
 from charm import OpensearchDasboardsCharm
-from literals import CHARM_KEY, CONTAINER, OPENSEARCH_REL_NAME, SUBSTRATE
+from literals import (
+    CHARM_KEY,
+    CONTAINER,
+    OPENSEARCH_REL_NAME,
+    OSD_API_TIMEOUT,
+    SUBSTRATE,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -107,6 +113,17 @@ def test_api_request(harness):
     assert all(field in response["status"] for field in ["statuses", "overall"])
 
 
+@responses.activate
+def test_api_request_times_out(harness):
+    responses.add(method="GET", url=f"{harness.charm.state.url}/api/status", json={})
+    client = harness.charm.api_manager.client
+
+    with patch.object(client, "request", wraps=client.request) as request:
+        harness.charm.api_manager.request("status")
+
+    assert request.call_args.kwargs["timeout"] == OSD_API_TIMEOUT
+
+
 @responses.activate
 def test_status(harness):
 
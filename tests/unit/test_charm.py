@@ -13,12 +13,14 @@ from ops.framework import EventBase
 from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 from ops.testing import Harness
 
-from charm import OpensearchDasboardsCharm, OpensearchDashboardsDependencyModel
+from charm import OpensearchDasboardsCharm
+from events.upgrade import OpensearchDashboardsDependencyModel
 from helpers import clear_status
 from literals import CHARM_KEY, CONTAINER, OPENSEARCH_REL_NAME, PEER, SUBSTRATE
 from src.literals import (
     MSG_INCOMPATIBLE_UPGRADE,
     MSG_STATUS_ERROR,
+    MSG_STATUS_UNAVAIL,
     MSG_STATUS_UNHEALTHY,
 )
 
@@ -268,6 +270,10 @@ def test_restart_restarts_with_sleep(harness):
     with (
         patch("workload.ODWorkload.restart") as patched_restart,
         patch("managers.config.ConfigManager.set_dashboard_properties"),
+        patch(
+            "managers.health.HealthManager.status_ok",
+            side_effect=[(False, MSG_STATUS_UNAVAIL), (True, "")],
+        ),
         patch("time.sleep") as patched_sleep,
     ):
         harness.charm._restart(EventBase(harness.charm))
@@ -536,6 +542,9 @@ def test_service_available(harness):
         patch("workload.ODWorkload.start", return_value=True),
         patch("managers.config.ConfigManager.config_changed", return_value=False),
         patch("managers.config.ConfigManager.set_dashboard_properties"),
+        # not touching the units and packages of the machine running the tests
+        patch("workload.ODWorkload._systemctl") as systemctl,
+        patch("workload.apt.add_package"),
         patch("os.path.exists", return_value=True),
         patch("os.path.getsize", return_value=1),
         patch(
@@ -560,6 +569,8 @@ def test_service_available(harness):
         ),
     ):
         harness.charm.init_server()
+        # a single worker, none to enable or disable
+        systemctl.assert_not_called()
         harness.charm.on.update_status.emit()
 
         assert isinstance(harness.model.unit.status, ActiveStatus)
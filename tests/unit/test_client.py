@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import logging
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from requests.exceptions import SSLError
+
+from core.client import HTTPClient
+
+logger = logging.getLogger(__name__)
+
+
+def test_requests_reuse_connection_per_target(tls_files, standin):
+    endpoint = standin("green")
+    client = HTTPClient()
+
+    for _ in range(5):
+        response = client.request("GET", f"https://{endpoint}/", ca=tls_files[0], timeout=5)
+        assert response.json() == {"status": "green"}
+
+    logger.info(f"5 requests to one target: {client.stats}")
+    assert client.stats == {"connections": 1, "handshakes": 1, "requests": 5}
+
+    other = standin("green")
+    client.request("GET", f"https://{other}/", ca=tls_files[0], timeout=5)
+    assert client.stats == {"connections": 2, "handshakes": 2, "requests": 6}
+
+    client.close()
+    assert client.stats == {"connections": 0, "handshakes": 0, "requests": 0}
+
+
+def test_close_leaves_running_requests_their_session(tls_files, standin):
+    idle, slow = standin("green"), standin("green", delay=1)
+    client = HTTPClient()
+    client.request("GET", f"https://{idle}/", ca=tls_files[0], timeout=5)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        running = executor.submit(
+            client.request, "GET", f"https://{slow}/", ca=tls_files[0], timeout=5
+        )
+        time.sleep(0.5)
+        session = client.session(f"https://{slow}/", tls_files[0])
+        with patch.object(session, "close", wraps=session.close) as close:
+            client.close()
+            close.assert_not_called()
+
+            # closed by the request itself, once it completes
+            assert running.result().json() == {"status": "green"}
+            close.assert_called_once()
+
+    assert client.stats == {"connections": 0, "handshakes": 0, "requests": 0}
+
+
+def test_credentials_bound_per_session(tls_files):
+    client = HTTPClient()
+    session = client.session("https://127.0.0.1:9200/a", tls_files[0], ("admin", "pw"))
+
+    assert session.auth == ("admin", "pw")
+    assert client.session("https://127.0.0.1:9200/b", tls_files[0], ("admin", "pw")) is session
+    assert client.session("https://127.0.0.1:9200/", tls_files[0], ("admin", "new")) is not session
+    assert client.session("https://127.0.0.1:9201/", tls_files[0], ("admin", "pw")) is not session
+
+
+def test_ssl_context_reloaded_for_changed_ca(tls_files, tmp_path):
+    ca = str(tmp_path / "ca.pem")
+    shutil.copy(tls_files[0], ca)
+    client = HTTPClient()
+    context = client.ssl_context(ca)
+    assert client.ssl_context(ca) is context
+
+    with open(ca, "a") as f:
+        f.write("\n")
+    assert client.ssl_context(ca) is not context
+
+
+def test_missing_ca_raises_request_exception(standin, tmp_path):
+    endpoint = standin("green")
+    with pytest.raises(SSLError):
+        HTTPClient().request("GET", f"https://{endpoint}/", ca=str(tmp_path / "missing.pem"))
@@ -101,3 +101,119 @@ def test_tls_enabled(harness):
 #
 #     assert "ssl.keyStore.password=mellon" in harness.charm.config_manager.dashboard_properties
 #     assert "ssl.trustStore.password=friend" in harness.charm.config_manager.dashboard_properties
+
+
+def test_static_properties_exclude_logging(harness):
+    static = harness.charm.config_manager.static_properties
+
+    assert "logging.verbose: true" in harness.charm.config_manager.dashboard_properties
+    assert not [prop for prop in static if prop.startswith("logging.")]
+    assert f"server.host: '{harness.charm.state.bind_address}'" in static
+
+
+@pytest.mark.parametrize("reloaded,restart", [(True, False), (False, True)])
+def test_log_level_change_reloads(harness, reloaded, restart):
+    current = DEFAULT_CONF.format(ip=harness.charm.state.bind_address).split("\n")
+    with harness.hooks_disabled():
+        harness.update_config({"log_level": "ERROR"})
+
+    with (
+        patch("workload.ODWorkload.read", return_value=current),
+        patch("workload.ODWorkload.write") as write,
+        patch("workload.ODWorkload.reload", return_value=reloaded) as reload,
+    ):
+        assert harness.charm.config_manager.config_changed() == restart
+
+    reload.assert_called_once()
+    assert "logging.silent: true" in write.call_args.kwargs["content"]
+
+
+def test_static_change_restarts(harness):
+    current = DEFAULT_CONF.format(ip="10.0.0.99").split("\n")
+
+    with (
+        patch("workload.ODWorkload.read", return_value=current),
+        patch("workload.ODWorkload.write"),
+        patch("workload.ODWorkload.reload") as reload,
+    ):
+        assert harness.charm.config_manager.config_changed()
+
+    reload.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "cores,memory,environment",
+    [
+        (16, 64 * 1024, ["NODE_OPTIONS=--max-old-space-size=16384 --max-semi-space-size=64"]),
+        (4, 8 * 1024, ["NODE_OPTIONS=--max-old-space-size=4096 --max-semi-space-size=32"]),
+        (1, 512, ["NODE_OPTIONS=--max-old-space-size=512 --max-semi-space-size=16"]),
+    ],
+)
+def test_runtime_sized_to_unit(harness, cores, memory, environment):
+    with harness.hooks_disabled():
+        harness.update_config(
+            {"node_heap_size": "auto", "node_threadpool_size": "auto", "node_gc_flags": "auto"}
+        )
+
+    with (
+        patch("workload.ODWorkload.cores", new_callable=PropertyMock, return_value=cores),
+        patch("workload.ODWorkload.memory", new_callable=PropertyMock, return_value=memory),
+    ):
+        threads = max(4, cores)
+        assert harness.charm.config_manager.runtime_environment == environment + [
+            f"UV_THREADPOOL_SIZE={threads}"
+        ]
+
+
+def test_runtime_options_set(harness):
+    assert harness.charm.config_manager.runtime_environment == []
+    assert harness.charm.config_manager.runtime_summary == ""
+
+    with harness.hooks_disabled():
+        harness.update_config(
+            {
+                "node_heap_size": "3072",
+                "node_threadpool_size": "many",
+                "node_gc_flags": "--max-semi-space-size=8 expose-gc",
+            }
+        )
+
+    with patch("workload.ODWorkload.cores", new_callable=PropertyMock, return_value=2):
+        environment = harness.charm.config_manager.runtime_environment
+        assert environment == [
+            "NODE_OPTIONS=--max-old-space-size=3072 --max-semi-space-size=8",
+            "UV_THREADPOOL_SIZE=4",
+        ]
+
+    # shown once the service runs with them
+    assert harness.charm.config_manager.runtime_summary == ""
+    with patch(
+        "workload.ODWorkload.environment", new_callable=PropertyMock, return_value=environment
+    ):
+        assert harness.charm.config_manager.runtime_summary == (
+            "runtime: heap 3072MB, 4 uv threads, --max-semi-space-size=8"
+        )
+
+
+def test_runtime_change_restarts(harness):
+    current = DEFAULT_CONF.format(ip=harness.charm.state.bind_address).split("\n")
+    with harness.hooks_disabled():
+        harness.update_config({"node_threadpool_size": "8"})
+
+    with (
+        patch("workload.ODWorkload.read", return_value=current),
+        patch("workload.ODWorkload.set_environment") as set_environment,
+        patch("workload.ODWorkload.reload") as reload,
+    ):
+        assert harness.charm.config_manager.config_changed()
+        set_environment.assert_called_once_with(["UV_THREADPOOL_SIZE=8"])
+
+        with patch(
+            "workload.ODWorkload.environment",
+            new_callable=PropertyMock,
+            return_value=["UV_THREADPOOL_SIZE=8"],
+        ):
+            assert not harness.charm.config_manager.config_changed()
+
+    set_environment.assert_called_once()
+    reload.assert_not_called()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import logging
+import time
+
+import pytest
+from ops.model import BlockedStatus, WaitingStatus
+from requests.exceptions import Timeout
+
+from core.client import HTTPClient
+from deadline import DeadlineExceeded, deadline, hook_budget
+from literals import CHARM_KEY, MSG_STATUS_DB_DOWN, MSG_STATUS_UNKNOWN
+from tests.unit.test_health import emit_in_hook
+from tests.unit.test_state import build_harness
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(autouse=True)
+def unlimited():
+    deadline.start(None)
+    yield
+    deadline.start(None)
+
+
+@pytest.mark.parametrize(
+    "event,budget",
+    [
+        ("update-status", 45),
+        ("config-changed", 600),
+        ("opensearch-client-relation-changed", 120),
+        ("install", None),
+    ],
+)
+def test_hook_budget_first_match(event, budget):
+    budgets = "update-status=45, *-relation-*=120, install=0, invalid, *=600"
+    assert hook_budget(event, budgets) == budget
+
+
+def test_timeouts_bounded_by_remaining_budget():
+    assert deadline.timeout((3, 5)) == (3, 5)
+    assert deadline.timeout(None) is None
+
+    deadline.start(2)
+    assert deadline.timeout(30) <= 2
+    assert deadline.timeout(1) == 1
+    assert deadline.timeout(None) <= 2
+    connect, read = deadline.timeout((1, 5))
+    assert connect == 1 and 1 < read <= 2
+
+    deadline.start(0.01)
+    time.sleep(0.02)
+    assert deadline.expired
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout(30)
+
+
+def test_requests_bounded_by_budget(tls_files, standin):
+    endpoint = standin("green", delay=3)
+    client = HTTPClient()
+
+    deadline.start(0.5)
+    start = time.perf_counter()
+    with pytest.raises(Timeout):
+        client.request("GET", f"https://{endpoint}/", ca=tls_files[0], timeout=5)
+    assert time.perf_counter() - start < 2
+
+    with pytest.raises(DeadlineExceeded):
+        client.request("GET", f"https://{endpoint}/", ca=tls_files[0], timeout=5)
+
+
+@pytest.mark.parametrize("hook,budget", [("update-status", 45), ("config-changed", 600)])
+def test_budget_started_per_hook(monkeypatch, hook, budget):
+    monkeypatch.setenv("JUJU_DISPATCH_PATH", f"hooks/{hook}")
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-{hook}-1")
+    build_harness()
+
+    assert deadline.budget == budget
+    assert budget - 1 < deadline.remaining <= budget
+
+
+def exhaust():
+    deadline.start(0.001)
+    time.sleep(0.002)
+
+
+def test_exhausted_budget_reports_last_healthy_result(monkeypatch):
+    harness = build_harness()
+    assert emit_in_hook(harness, monkeypatch, "update-status", 1) == 2
+
+    exhaust()
+    assert emit_in_hook(harness, monkeypatch, "update-status", 2, opensearch_health="red") == 0
+    assert harness.charm.unit.status != BlockedStatus(MSG_STATUS_DB_DOWN)
+
+
+def test_exhausted_budget_reports_unknown_health(monkeypatch):
+    harness = build_harness()
+
+    exhaust()
+    assert emit_in_hook(harness, monkeypatch, "update-status", 1) == 0
+    assert harness.charm.unit.status == WaitingStatus(MSG_STATUS_UNKNOWN)
+    # not a failure of the targets
+    assert harness.charm.health_manager.breaker_states["opensearch"] == "closed"
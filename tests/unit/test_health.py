@@ -2,24 +2,37 @@
 # Copyright 2022 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+import json
 import logging
+import os
+import subprocess
+import time
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import PropertyMock, patch
 
 import pytest
 import responses
 import yaml
+from ops.model import ActiveStatus, BlockedStatus
 from ops.testing import Harness
 
+import health_sidecar
 from charm import OpensearchDasboardsCharm
+from core.client import HTTPClient
+from core.probes import dashboards_probe
 from literals import (
     CHARM_KEY,
     CONTAINER,
+    HEALTH_OPENSEARCH_STATUS_URL,
+    HEALTH_SIDECAR_SERVICE,
+    MSG_STATUS_ERROR,
     MSG_STATUS_UNAVAIL,
     OPENSEARCH_REL_NAME,
     SUBSTRATE,
 )
 from src.literals import MSG_STATUS_DB_DOWN
+from tests.unit.test_reconcile import emit_update_status
+from tests.unit.test_state import build_harness
 
 logger = logging.getLogger(__name__)
 
@@ -189,3 +202,437 @@ def test_health_opensearch_unavailable(harness):
 
     with patch("os.path.exists", return_value=True), patch("os.path.getsize", return_value=1):
         assert (False, MSG_STATUS_DB_DOWN) == harness.charm.health_manager.opensearch_ok()
+
+
+def probe(harness, tls_files, *endpoints) -> tuple[tuple[bool, str], float]:
+    """Runs `opensearch_ok` against the given endpoints, returning the result and duration."""
+    opensearch_rel_id = harness.model.get_relation(OPENSEARCH_REL_NAME).id
+    harness.update_relation_data(
+        opensearch_rel_id, "opensearch", {"endpoints": ",".join(endpoints)}
+    )
+    with patch(
+        "core.workload.ODPaths.opensearch_ca", new_callable=PropertyMock, return_value=tls_files[0]
+    ):
+        start = time.perf_counter()
+        result = harness.charm.health_manager.opensearch_ok()
+        return result, time.perf_counter() - start
+
+
+def test_health_opensearch_first_green_short_circuits(harness, tls_files, standin):
+    endpoints = [standin("green", delay=3), standin("reset"), standin("green")]
+
+    result, elapsed = probe(harness, tls_files, *endpoints)
+
+    assert result == (True, "")
+    assert elapsed < 2
+
+
+def test_health_opensearch_trims_response(harness, tls_files, standin):
+    result, _ = probe(harness, tls_files, standin("green"))
+
+    assert result == (True, "")
+    (path,) = standin.requests
+    assert path.startswith(f"/{HEALTH_OPENSEARCH_STATUS_URL}?")
+    assert "local=true" in path
+    assert "filter_path=status" in path
+
+
+def test_health_opensearch_yellow_or_reset_is_down(harness, tls_files, standin):
+    result, _ = probe(harness, tls_files, standin("yellow"), standin("reset"))
+
+    assert result == (False, MSG_STATUS_DB_DOWN)
+
+
+def test_health_opensearch_slow_endpoints_time_out(harness, tls_files, standin):
+    endpoints = [standin("green", delay=3), standin("green", delay=3)]
+
+    with patch("core.probes.HEALTH_PROBE_TIMEOUT", (0.5, 0.5)):
+        result, elapsed = probe(harness, tls_files, *endpoints)
+
+    assert result == (False, MSG_STATUS_DB_DOWN)
+    assert elapsed < 2
+
+
+def test_managers_share_client(harness, tls_files, standin):
+    assert harness.charm.health_manager.client is harness.charm.http_client
+    assert harness.charm.health_manager.api_manager.client is harness.charm.http_client
+    assert harness.charm.api_manager.client is harness.charm.http_client
+
+    endpoint = standin("green")
+    for _ in range(3):
+        assert probe(harness, tls_files, endpoint)[0] == (True, "")
+
+    assert harness.charm.http_client.stats["handshakes"] == 1
+    assert harness.charm.http_client.stats["requests"] == 3
+
+
+def dashboards_metrics(
+    response_time: float = 20, event_loop_delay: float = 1, heap_used: int = 100, connections=2
+) -> dict:
+    """The `metrics` section of the `/api/status` response."""
+    return {
+        "collection_interval_in_millis": 5000,
+        "process": {
+            "memory": {"heap": {"used_in_bytes": heap_used, "size_limit": 1000}},
+            "event_loop_delay": event_loop_delay,
+        },
+        "response_times": {"avg_in_millis": response_time, "max_in_millis": response_time * 2},
+        "requests": {"disconnects": 0, "total": 10},
+        "concurrent_connections": connections,
+    }
+
+
+@responses.activate
+@pytest.mark.parametrize(
+    "metrics,message",
+    [
+        (dashboards_metrics(), ""),
+        ({}, ""),
+        (dashboards_metrics(response_time=1500), "degraded: high latency"),
+        (dashboards_metrics(event_loop_delay=400), "degraded: event loop lag"),
+        (
+            dashboards_metrics(response_time=1500, heap_used=950),
+            "degraded: high latency, heap pressure",
+        ),
+    ],
+)
+def test_health_status_degraded(harness, metrics, message):
+    responses.add(
+        method="GET",
+        url=f"{harness.charm.state.url}/api/status",
+        json={"status": {"overall": {"state": "green"}}, "metrics": metrics},
+    )
+
+    assert harness.charm.health_manager.status_ok() == (True, message)
+
+
+@responses.activate
+def test_health_status_thresholds_configurable(harness):
+    responses.add(
+        method="GET",
+        url=f"{harness.charm.state.url}/api/status",
+        json={
+            "status": {"overall": {"state": "green"}},
+            "metrics": dashboards_metrics(connections=50),
+        },
+    )
+    assert harness.charm.health_manager.status_ok() == (True, "")
+
+    harness.update_config({"degraded_concurrent_connections": 40, "degraded_heap_usage": 5})
+    assert harness.charm.health_manager.status_ok() == (
+        True,
+        "degraded: heap pressure, connection saturation",
+    )
+
+
+def test_degraded_unit_not_active_green():
+    harness = build_harness(reconcile_window=600)
+
+    emit_update_status(harness, dashboards_metrics=dashboards_metrics(event_loop_delay=400))
+    assert harness.charm.unit.status == ActiveStatus("degraded: event loop lag")
+
+    # not left alone by the fast path
+    emit_update_status(harness, dashboards_metrics=dashboards_metrics())
+    assert harness.charm.unit.status == ActiveStatus()
+    assert harness.charm.reconcile_manager.full_count == 2
+
+
+def emit_in_hook(harness, monkeypatch, hook: str, hook_id: int, **kwargs) -> int:
+    """Runs a reconcile as part of the given hook, returning the number of probes made."""
+    monkeypatch.setenv("JUJU_DISPATCH_PATH", f"hooks/{hook}")
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-{hook}-{hook_id}")
+    return emit_update_status(harness, **kwargs)
+
+
+def test_health_results_reused_within_ttl(monkeypatch):
+    harness = build_harness(health_cache_ttl=300)
+
+    assert emit_in_hook(harness, monkeypatch, "update-status", 1) == 2
+    assert emit_in_hook(harness, monkeypatch, "update-status", 2) == 0
+    assert emit_in_hook(harness, monkeypatch, "leader-settings-changed", 3) == 0
+
+    with patch("managers.health.time.time", return_value=time.time() + 301):
+        assert emit_in_hook(harness, monkeypatch, "update-status", 4) == 2
+
+
+@pytest.mark.parametrize(
+    "hook", ["opensearch-client-relation-changed", "config-changed", "secret-changed"]
+)
+def test_health_results_dropped_on_changes(monkeypatch, hook):
+    harness = build_harness(health_cache_ttl=300)
+
+    assert emit_in_hook(harness, monkeypatch, "update-status", 1) == 2
+    assert emit_in_hook(harness, monkeypatch, hook, 2) == 2
+    assert emit_in_hook(harness, monkeypatch, "update-status", 3) == 0
+
+
+def test_unhealthy_results_not_reused(monkeypatch):
+    harness = build_harness(health_cache_ttl=300)
+
+    assert emit_in_hook(harness, monkeypatch, "update-status", 1, opensearch_health="yellow") == 1
+    assert not harness.charm._stored.health_results
+
+    # probed again as soon as the breaker allows
+    with patch("core.breaker.time.time", return_value=time.time() + 61):
+        assert emit_in_hook(harness, monkeypatch, "update-status", 2) == 2
+
+
+def test_breaker_backs_off_from_unreachable_opensearch(monkeypatch):
+    harness = build_harness()
+    now = time.time()
+
+    def hook(hook_id: int, elapsed: float, health: str = "yellow") -> int:
+        with patch("core.breaker.time.time", return_value=now + elapsed):
+            return emit_in_hook(
+                harness, monkeypatch, "update-status", hook_id, opensearch_health=health
+            )
+
+    assert hook(1, 0) == 1
+    assert harness.charm.health_manager.breaker_states["opensearch"] == "open"
+
+    # the failure is reported without probing while open
+    harness.charm.unit.status = ActiveStatus()
+    assert hook(2, 30) == 0
+    assert harness.charm.unit.status == BlockedStatus(MSG_STATUS_DB_DOWN)
+
+    # half-open after the backoff, failing again doubles it
+    assert hook(3, 61) == 1
+    assert hook(4, 61 + 119) == 0
+    assert hook(5, 61 + 121, health="green") == 2
+    assert harness.charm.health_manager.breaker_states == {
+        "opensearch": "closed",
+        "dashboards": "closed",
+    }
+
+
+def test_breaker_probes_again_on_changes(monkeypatch):
+    harness = build_harness()
+
+    assert emit_in_hook(harness, monkeypatch, "update-status", 1, opensearch_health="red") == 1
+    assert emit_in_hook(harness, monkeypatch, "update-status", 2, opensearch_health="red") == 0
+    assert emit_in_hook(harness, monkeypatch, "opensearch-client-relation-changed", 3) == 2
+
+
+def test_health_cache_disabled(monkeypatch):
+    harness = build_harness(health_cache_ttl=0)
+
+    assert emit_in_hook(harness, monkeypatch, "update-status", 1) == 2
+    assert emit_in_hook(harness, monkeypatch, "update-status", 2) == 2
+
+
+def test_sidecar_probes_both_services(tls_files, standin):
+    opensearch = standin("green")
+    dashboards = standin(
+        "", body={"status": {"overall": {"state": "green"}}, "metrics": dashboards_metrics()}
+    )
+    config = {
+        "generation": "abc",
+        "opensearch": {"endpoints": [opensearch], "auth": ["admin", "pw"], "ca": tls_files[0]},
+        "dashboards": {
+            "urls": [f"https://{dashboards}"],
+            "auth": ["admin", "pw"],
+            "ca": tls_files[0],
+            "thresholds": {"degraded_response_time": 10},
+        },
+    }
+
+    results = health_sidecar.probe(HTTPClient(), config)
+
+    assert results["generation"] == "abc"
+    assert results["opensearch"] == [True, ""]
+    assert results["dashboards"] == [True, "degraded: high latency"]
+
+    config["dashboards"]["urls"] = [f"https://{standin('reset')}"]
+    config["opensearch"]["endpoints"] = [standin("yellow")]
+    results = health_sidecar.probe(HTTPClient(), config)
+    assert results["opensearch"] == [False, MSG_STATUS_DB_DOWN]
+    assert results["dashboards"] == [False, MSG_STATUS_UNAVAIL]
+
+
+@responses.activate
+@pytest.mark.parametrize("status,message", [(503, MSG_STATUS_UNAVAIL), (500, MSG_STATUS_ERROR)])
+def test_sidecar_probe_http_errors(status, message):
+    url = "https://dashboards:5601"
+    responses.add(method="GET", url=f"{url}/api/status", status=status)
+
+    assert dashboards_probe(HTTPClient(), url, ("admin", "pw"), "", {}) == (False, message, {})
+
+
+def test_sidecar_runs_as_service(tls_files, standin, charm_services, tmp_path):
+    harness = build_harness(health_sidecar_interval=1)
+    health_manager = harness.charm.health_manager
+    health_manager.sidecar_dir = str(tmp_path / "health")
+    with harness.hooks_disabled():
+        harness.update_relation_data(
+            harness.charm.state.opensearch_relation.id,
+            "opensearch",
+            {"endpoints": standin("green")},
+        )
+
+    with (
+        patch(
+            "core.workload.ODPaths.opensearch_ca",
+            new_callable=PropertyMock,
+            return_value=tls_files[0],
+        ),
+        patch("workload.ODWorkload._systemctl") as systemctl,
+    ):
+        health_manager.ensure_sidecar()
+        generation = health_manager.sidecar_config["generation"]
+
+        # already installed
+        health_manager.ensure_sidecar()
+
+    assert [call.args for call in systemctl.call_args_list] == [
+        ("daemon-reload",),
+        ("enable", HEALTH_SIDECAR_SERVICE),
+        ("restart", HEALTH_SIDECAR_SERVICE),
+    ]
+    assert oct(os.stat(health_manager.sidecar_config_path).st_mode)[-3:] == "600"
+
+    # run as systemd would, without the environment of the hook
+    service = (charm_services / HEALTH_SIDECAR_SERVICE).read_text()
+    settings = dict(line.split("=", 1) for line in service.split("\n") if "=" in line)
+    process = subprocess.Popen(
+        settings["ExecStart"].split(),
+        cwd=settings["WorkingDirectory"],
+        env=dict([settings["Environment"].split("=", 1)]),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + 15
+        while not os.path.exists(health_manager.sidecar_state_path) and time.time() < deadline:
+            time.sleep(0.1)
+
+        with open(health_manager.sidecar_state_path) as f:
+            results = json.load(f)
+        assert results["generation"] == generation
+        assert results["opensearch"] == [True, ""]
+    finally:
+        with patch("workload.ODWorkload._systemctl") as systemctl:
+            harness.charm.on.stop.emit()
+
+    # exits once its config is removed
+    assert process.wait(timeout=5) == 0
+    assert [call.args for call in systemctl.call_args_list] == [
+        ("disable", "--now", HEALTH_SIDECAR_SERVICE),
+        ("daemon-reload",),
+    ]
+    assert not os.path.exists(health_manager.sidecar_config_path)
+    assert not (charm_services / HEALTH_SIDECAR_SERVICE).exists()
+
+
+def write_sidecar_results(harness, tmp_path, age: float = 0, generation: str | None = None):
+    """Writes healthy sidecar results for the current config, as of `age` seconds ago."""
+    health_manager = harness.charm.health_manager
+    health_manager.sidecar_dir = str(tmp_path)
+    results = {
+        "generation": generation or health_manager.sidecar_config["generation"],
+        "checked_at": time.time() - age,
+        "opensearch": [True, ""],
+        "dashboards": [True, ""],
+    }
+    Path(health_manager.sidecar_state_path).write_text(json.dumps(results))
+
+
+@pytest.mark.parametrize(
+    "age,generation,probes",
+    [(0, None, 0), (10, None, 0), (91, None, 2), (0, "outdated", 2)],
+)
+def test_sidecar_results_used_by_hooks(monkeypatch, tmp_path, age, generation, probes):
+    harness = build_harness(health_sidecar_interval=30)
+    write_sidecar_results(harness, tmp_path, age, generation)
+
+    with patch("managers.health.HealthManager.ensure_sidecar"):
+        assert emit_in_hook(harness, monkeypatch, "update-status", 1) == probes
+
+
+def test_sidecar_results_not_used_after_changes(monkeypatch, tmp_path):
+    harness = build_harness(health_sidecar_interval=30)
+    write_sidecar_results(harness, tmp_path, age=1)
+
+    with patch("managers.health.HealthManager.ensure_sidecar"):
+        assert emit_in_hook(harness, monkeypatch, "config-changed", 1) == 2
+        assert emit_in_hook(harness, monkeypatch, "update-status", 2) == 2
+
+        write_sidecar_results(harness, tmp_path)
+        assert emit_in_hook(harness, monkeypatch, "update-status", 3) == 0
+
+
+@responses.activate
+def test_wait_until_ready_backs_off(harness):
+    url = f"{harness.charm.state.url}/api/status"
+    for _ in range(3):
+        responses.add(method="GET", url=url, status=503)
+    responses.add(method="GET", url=url, json={"status": {"overall": {"state": "green"}}})
+
+    with patch("managers.health.time.sleep") as patched_sleep:
+        assert harness.charm.health_manager.wait_until_ready()
+
+    assert [call.args[0] for call in patched_sleep.call_args_list] == [1, 1.5, 2.25]
+
+
+@responses.activate
+def test_wait_until_ready_gives_up(harness):
+    responses.add(method="GET", url=f"{harness.charm.state.url}/api/status", status=503)
+    harness.update_config({"restart_ready_timeout": 5})
+
+    now = time.monotonic()
+    clock = [now, now + 2, now + 4.5, now + 6]
+    with (
+        patch("managers.health.time.monotonic", side_effect=clock),
+        patch("managers.health.time.sleep") as patched_sleep,
+    ):
+        assert not harness.charm.health_manager.wait_until_ready()
+
+    # never sleeping past the timeout
+    assert [call.args[0] for call in patched_sleep.call_args_list] == [1, 0.5]
+
+
+@responses.activate
+@pytest.mark.parametrize("warm", [True, False])
+def test_cold_start_reported(harness, warm):
+    responses.add(
+        method="GET",
+        url=f"{harness.charm.state.url}/api/status",
+        json={"status": {"overall": {"state": "green"}}},
+    )
+
+    with (
+        patch("workload.ODWorkload.optimizer_cache_warm", new_callable=PropertyMock) as cache,
+        patch("workload.ODWorkload.stamp_optimizer_cache") as stamp,
+    ):
+        cache.return_value = warm
+        assert harness.charm.health_manager.wait_until_ready()
+
+    stamp.assert_called_once()
+    cold_start = harness.charm.health_manager.cold_start
+    assert list(cold_start) == ["warm" if warm else "cold"]
+
+    with (
+        patch("managers.metrics.MetricsManager.enabled", new_callable=PropertyMock) as enabled,
+        patch("managers.metrics.MetricsManager.record") as record,
+        patch("managers.metrics.MetricsManager.ensure_exporter"),
+    ):
+        enabled.return_value = True
+        harness.charm._on_commit(None)
+
+    assert record.call_args.kwargs["gauges"]["dashboards_cold_start_seconds"] == cold_start
+
+
+def test_runtime_shown_in_active_status():
+    harness = build_harness(node_heap_size="2048", node_threadpool_size="8")
+    harness.charm.unit.status = ActiveStatus()
+
+    with patch(
+        "workload.ODWorkload.environment",
+        new_callable=PropertyMock,
+        return_value=harness.charm.config_manager.runtime_environment,
+    ):
+        emit_update_status(harness)
+    assert harness.charm.unit.status == ActiveStatus("runtime: heap 2048MB, 8 uv threads")
+
+    # degradations shown first
+    emit_update_status(harness, dashboards_metrics=dashboards_metrics(event_loop_delay=400))
+    assert harness.charm.unit.status == ActiveStatus("degraded: event loop lag")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import logging
+import random
+import socket
+from unittest.mock import patch
+
+import pytest
+import responses
+
+from core.locality import EndpointRanking
+from literals import CHARM_KEY
+from managers.metrics import MetricsManager
+from tests.unit.test_state import build_harness
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ["10.0.0.1:9200", "10.0.0.2:9200", "10.0.0.3:9200"]
+
+
+@pytest.fixture
+def harness(monkeypatch):
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-1")
+    return build_harness()
+
+
+@pytest.fixture
+def ranking(harness):
+    return EndpointRanking(harness.charm.state._stored, interval=0)
+
+
+def opensearch_hosts(harness) -> str:
+    (hosts,) = [
+        prop
+        for prop in harness.charm.config_manager.dashboard_properties
+        if prop.startswith("opensearch.hosts")
+    ]
+    return hosts
+
+
+def test_ranking_by_rtt(ranking):
+    assert ranking.rank(ENDPOINTS) == ENDPOINTS
+
+    assert ranking.update(ENDPOINTS, {ENDPOINTS[0]: 20.0, ENDPOINTS[1]: 8.0, ENDPOINTS[2]: 1.0})
+    assert ranking.rank(ENDPOINTS) == [ENDPOINTS[2], ENDPOINTS[1], ENDPOINTS[0]]
+
+
+def test_ranking_is_stable_under_jitter(ranking):
+    ranking.update(ENDPOINTS, {ENDPOINTS[0]: 2.0, ENDPOINTS[1]: 2.2, ENDPOINTS[2]: 5.0})
+    first = ranking.rank(ENDPOINTS)
+
+    random.seed(0)
+    changes = 0
+    for _ in range(200):
+        before = ranking.rank(ENDPOINTS)
+        after = ranking.update(
+            ENDPOINTS,
+            {
+                ENDPOINTS[0]: random.uniform(1.5, 2.5),
+                ENDPOINTS[1]: random.uniform(1.5, 2.5),
+                ENDPOINTS[2]: random.uniform(4.5, 6.0),
+            },
+        )
+        changes += before != after
+
+    logger.info(f"ranking changes over 200 noisy measurements: {changes}")
+    assert changes == 0
+    assert ranking.rank(ENDPOINTS) == first
+
+
+def test_ranking_prefers_own_zone(harness):
+    ranking = EndpointRanking(harness.charm.state._stored, interval=0, zone="az2")
+    ranking.update(
+        ENDPOINTS,
+        {ENDPOINTS[0]: 1.0, ENDPOINTS[1]: 1.0, ENDPOINTS[2]: 30.0},
+        zones={ENDPOINTS[0]: "az1", ENDPOINTS[1]: "az1", ENDPOINTS[2]: "az2"},
+    )
+
+    assert ranking.rank(ENDPOINTS) == [ENDPOINTS[2], ENDPOINTS[0], ENDPOINTS[1]]
+
+
+def test_ranking_follows_endpoint_changes(ranking):
+    ranking.update(ENDPOINTS, {ENDPOINTS[0]: 20.0, ENDPOINTS[1]: 10.0, ENDPOINTS[2]: 1.0})
+
+    endpoints = [ENDPOINTS[0], ENDPOINTS[1], "10.0.0.4:9200"]
+    assert ranking.rank(endpoints) == [ENDPOINTS[1], ENDPOINTS[0], "10.0.0.4:9200"]
+
+
+def test_refresh_ranks_reachable_endpoints(harness, standin):
+    reachable = standin("green").replace("127.0.0.1", "localhost")
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        unreachable = f"127.0.0.1:{s.getsockname()[1]}"
+
+    with harness.hooks_disabled():
+        harness.update_relation_data(
+            harness.charm.state.opensearch_relation.id,
+            "opensearch",
+            {"endpoints": f"{unreachable},{reachable}"},
+        )
+
+    harness.charm.locality_manager.refresh()
+
+    # not moved on a failed measurement, left to the health check
+    assert opensearch_hosts(harness) == (
+        f"opensearch.hosts: [https://{unreachable}, https://{reachable}]"
+    )
+    assert list(harness.charm.locality_manager.samples) == [reachable]
+    assert list(harness.charm.state.endpoint_ranking.rtts) == [reachable]
+
+    # not measured again until due
+    with patch("managers.locality.LocalityManager._connect_time") as connect_time:
+        harness.charm.locality_manager.refresh()
+    connect_time.assert_not_called()
+
+
+def test_unreachable_endpoint_not_moved(harness):
+    with harness.hooks_disabled():
+        harness.update_relation_data(
+            harness.charm.state.opensearch_relation.id,
+            "opensearch",
+            {"endpoints": ",".join(ENDPOINTS)},
+        )
+    ranking = harness.charm.state.endpoint_ranking
+    ranking.interval = 0
+
+    measurements = [
+        {ENDPOINTS[0]: 1.0, ENDPOINTS[1]: 5.0, ENDPOINTS[2]: 10.0},
+        # the fastest endpoint down for a while, then back
+        {ENDPOINTS[0]: None, ENDPOINTS[1]: 5.0, ENDPOINTS[2]: 10.0},
+        {ENDPOINTS[0]: None, ENDPOINTS[1]: 5.0, ENDPOINTS[2]: 10.0},
+        {ENDPOINTS[0]: 1.0, ENDPOINTS[1]: 5.0, ENDPOINTS[2]: 10.0},
+    ]
+    rankings = []
+    for rtts in measurements:
+        with patch("managers.locality.LocalityManager._connect_time", side_effect=rtts.get):
+            harness.charm.locality_manager.refresh()
+        rankings.append(ranking.ranking)
+        assert ranking.rtts[ENDPOINTS[0]] == 1.0
+
+    assert rankings == [ENDPOINTS] * 4
+
+
+def test_rtts_exported_as_histograms(harness, tmp_path):
+    metrics = MetricsManager(
+        harness.charm.state, harness.charm.workload, "vm", harness.charm.config, str(tmp_path)
+    )
+    metrics.record(event="update-status", rtts={ENDPOINTS[0]: 0.002})
+    metrics.record(event="update-status", rtts={ENDPOINTS[0]: 0.02})
+
+    with open(metrics.exposition_path) as f:
+        exposition = f.read()
+
+    labels = f'endpoint="{ENDPOINTS[0]}"'
+    assert f'charm_opensearch_endpoint_rtt_seconds_bucket{{{labels},le="0.0025"}} 1' in exposition
+    assert f'charm_opensearch_endpoint_rtt_seconds_bucket{{{labels},le="0.025"}} 2' in exposition
+    assert f"charm_opensearch_endpoint_rtt_seconds_count{{{labels}}} 2" in exposition
+
+
+@responses.activate
+def test_refresh_reads_zones_from_node_attributes(harness):
+    with harness.hooks_disabled():
+        harness.update_relation_data(
+            harness.charm.state.opensearch_relation.id,
+            "opensearch",
+            {"endpoints": ",".join(ENDPOINTS)},
+        )
+    harness.charm.state.endpoint_ranking.zone = "az2"
+    responses.add(
+        method="GET",
+        url=f"https://{ENDPOINTS[0]}/_nodes/http",
+        json={
+            "nodes": {
+                f"node-{i}": {
+                    "http": {"publish_address": f"opensearch-{i}/{endpoint}"},
+                    "attributes": {"zone": "az2" if i == 1 else "az1"},
+                }
+                for i, endpoint in enumerate(ENDPOINTS)
+            }
+        },
+    )
+
+    with patch("managers.locality.LocalityManager._connect_time", return_value=1.0):
+        harness.charm.locality_manager.refresh()
+
+    assert opensearch_hosts(harness) == (
+        f"opensearch.hosts: [https://{ENDPOINTS[1]}, https://{ENDPOINTS[0]}, "
+        f"https://{ENDPOINTS[2]}]"
+    )
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import json
+import logging
+import os
+from unittest.mock import patch
+
+import pytest
+from ops.model import ActiveStatus, BlockedStatus
+
+from literals import (
+    CHARM_KEY,
+    HOOK_METRICS_PORT,
+    HOOK_METRICS_SERVICE,
+    MSG_STATUS_DB_MISSING,
+)
+from managers.metrics import MetricsManager
+from tests.unit.test_reconcile import emit_update_status
+from tests.unit.test_state import build_harness
+from timing import timer
+
+logger = logging.getLogger(__name__)
+
+# not the one patched for all tests
+ensure_exporter = MetricsManager.ensure_exporter
+
+
+@pytest.fixture
+def harness(tmp_path, monkeypatch):
+    harness = build_harness(hook_metrics=True)
+    harness.charm.metrics_manager.metrics_dir = str(tmp_path)
+    monkeypatch.setenv("JUJU_DISPATCH_PATH", "hooks/update-status")
+    return harness
+
+
+@pytest.fixture(autouse=True)
+def patched_exporter():
+    with patch("managers.metrics.MetricsManager.ensure_exporter") as ensure_exporter:
+        yield ensure_exporter
+
+
+def test_update_status_exported_as_histograms(harness, patched_exporter):
+    harness.charm.unit.status = BlockedStatus(MSG_STATUS_DB_MISSING)
+    timer.reset()
+    # clearing the outdated status
+    emit_update_status(harness)
+    assert harness.charm.unit.status == ActiveStatus()
+
+    with open(harness.charm.metrics_manager.histograms_path) as f:
+        histograms = json.load(f)
+
+    assert histograms["hooks"]["update-status"]["count"] == 1
+    assert {"state_load", "health_probe", "status_write"} <= set(
+        histograms["phases"]["update-status"]
+    )
+    patched_exporter.assert_called_once()
+
+    with open(harness.charm.metrics_manager.exposition_path) as f:
+        exposition = f.read()
+
+    assert 'charm_hook_duration_seconds_count{event="update-status"} 1' in exposition
+    assert 'charm_hook_duration_seconds_bucket{event="update-status",le="+Inf"} 1' in exposition
+    assert (
+        'charm_hook_phase_duration_seconds_count{event="update-status",phase="health_probe"} 1'
+        in exposition
+    )
+
+
+def test_breaker_state_exported(harness, monkeypatch):
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-1")
+    emit_update_status(harness, opensearch_health="red")
+
+    with open(harness.charm.metrics_manager.exposition_path) as f:
+        exposition = f.read()
+
+    assert "# TYPE charm_health_breaker_state gauge" in exposition
+    assert 'charm_health_breaker_state{target="opensearch"} 2' in exposition
+    assert 'charm_health_breaker_state{target="dashboards"} 0' in exposition
+
+
+def test_histograms_accumulate_across_hooks(harness):
+    timer.reset()
+    harness.framework.commit()
+    harness.framework.commit()
+
+    with open(harness.charm.metrics_manager.exposition_path) as f:
+        exposition = f.read()
+
+    assert 'charm_hook_duration_seconds_count{event="update-status"} 2' in exposition
+    assert 'charm_hook_http_handshakes_total{event="update-status"} 0' in exposition
+    buckets = [
+        int(line.split()[-1])
+        for line in exposition.splitlines()
+        if line.startswith('charm_hook_duration_seconds_bucket{event="update-status"')
+    ]
+    assert buckets == sorted(buckets)
+
+
+def test_reconcile_outcomes_exported(tmp_path, monkeypatch):
+    harness = build_harness(hook_metrics=True, reconcile_window=300)
+    harness.charm.metrics_manager.metrics_dir = str(tmp_path)
+    monkeypatch.setenv("JUJU_DISPATCH_PATH", "hooks/update-status")
+
+    for _ in range(3):
+        emit_update_status(harness)
+
+    with open(harness.charm.metrics_manager.exposition_path) as f:
+        exposition = f.read()
+
+    assert "# TYPE charm_hook_reconcile_fast_path_total counter" in exposition
+    assert 'charm_hook_reconcile_fast_path_total{event="update-status"} 2' in exposition
+    assert 'charm_hook_reconcile_full_total{event="update-status"} 1' in exposition
+
+
+def test_scrape_config_only_exposes_enabled_metrics(harness):
+    scrape_configs = harness.charm._scrape_config()
+    assert len(scrape_configs) == 2
+    assert scrape_configs[1]["static_configs"] == [{"targets": [f"localhost:{HOOK_METRICS_PORT}"]}]
+
+    harness._update_config({"hook_metrics": False})
+    assert len(harness.charm._scrape_config()) == 1
+
+
+def test_disabled_metrics_not_recorded(tmp_path, monkeypatch, patched_exporter):
+    harness = build_harness()
+    harness.charm.metrics_manager.metrics_dir = str(tmp_path)
+    monkeypatch.setenv("JUJU_DISPATCH_PATH", "hooks/update-status")
+
+    harness.framework.commit()
+
+    assert not timer.enabled
+    assert not list(tmp_path.iterdir())
+    patched_exporter.assert_not_called()
+
+
+def test_exporter_runs_as_service(harness, charm_services):
+    harness.framework.commit()
+    with patch("workload.ODWorkload._systemctl") as systemctl:
+        ensure_exporter(harness.charm.metrics_manager)
+        ensure_exporter(harness.charm.metrics_manager)
+
+    assert [call.args for call in systemctl.call_args_list] == [
+        ("daemon-reload",),
+        ("enable", HOOK_METRICS_SERVICE),
+        ("restart", HOOK_METRICS_SERVICE),
+    ]
+    service = (charm_services / HOOK_METRICS_SERVICE).read_text()
+    export_dir = harness.charm.metrics_manager.export_dir
+    assert f"--bind 127.0.0.1 --directory {export_dir}\n" in service
+    # the recorded state is not served
+    assert os.listdir(export_dir) == ["hook_metrics.prom"]
+
+    with patch("workload.ODWorkload._systemctl") as systemctl:
+        harness.charm.on.remove.emit()
+
+    assert systemctl.call_args_list[0].args == ("disable", "--now", HOOK_METRICS_SERVICE)
+    assert not (charm_services / HOOK_METRICS_SERVICE).exists()
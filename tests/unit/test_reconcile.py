@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import logging
+import time
+from unittest.mock import PropertyMock, patch
+
+import pytest
+import responses
+from ops.model import BlockedStatus
+
+from literals import CHARM_KEY, MAX_RECONCILE_PASSES, OPENSEARCH_REL_NAME, PEER
+from tests.unit.test_state import build_harness
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def harness():
+    harness = build_harness()
+    harness._update_config({"reconcile_window": 600})
+    return harness
+
+
+def emit_update_status(
+    harness, opensearch_health: str = "green", dashboards_metrics: dict | None = None
+) -> int:
+    """Emits `update-status`, returning the number of HTTP health probes made."""
+    with (
+        patch("workload.ODWorkload.alive", return_value=True),
+        patch("managers.config.ConfigManager.config_changed", return_value=False),
+        patch("managers.tls.TLSManager.certificate_valid", return_value=True),
+        patch("os.path.exists", return_value=True),
+        patch("os.path.getsize", return_value=1),
+        responses.RequestsMock(assert_all_requests_are_fired=False) as mocked_responses,
+    ):
+        mocked_responses.add(
+            method="GET",
+            url="https://111.222.333.444:9200/_cluster/health",
+            json={"status": opensearch_health},
+        )
+        mocked_responses.add(
+            method="GET",
+            url=f"{harness.charm.state.url}/api/status",
+            json={
+                "status": {"overall": {"state": "green"}},
+                "metrics": dashboards_metrics or {},
+            },
+        )
+        harness.charm.on.update_status.emit()
+        # end of the dispatch, running the requested reconcile
+        harness.framework.commit()
+
+        return len(mocked_responses.calls)
+
+
+def test_unchanged_inputs_take_fast_path(harness, monkeypatch):
+    harness._update_config({"health_cache_ttl": 300})
+
+    # health results are reused within their TTL by later hooks
+    for hook_id, probes in enumerate([2, 0, 0]):
+        monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-{hook_id}")
+        assert emit_update_status(harness) == probes
+
+    assert harness.charm.reconcile_manager.fast_path_count == 2
+    assert harness.charm.reconcile_manager.full_count == 1
+
+
+def test_fast_path_still_checks_health(harness):
+    assert emit_update_status(harness) == 2
+    assert emit_update_status(harness) == 2
+    assert harness.charm.reconcile_manager.fast_path_count == 1
+
+    emit_update_status(harness, opensearch_health="red")
+    assert isinstance(harness.charm.app.status, BlockedStatus)
+    assert harness.charm.reconcile_manager.fast_path_count == 1
+
+
+def test_fast_path_does_not_query_snapd(harness):
+    emit_update_status(harness)
+
+    with patch("workload.ODWorkload.revision", new_callable=PropertyMock) as revision:
+        emit_update_status(harness)
+
+    assert harness.charm.reconcile_manager.fast_path_count == 1
+    revision.assert_not_called()
+
+
+def test_sidecar_configured_by_full_reconcile_only(harness, monkeypatch):
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-1")
+    with patch("managers.health.HealthManager.ensure_sidecar") as ensure_sidecar:
+        emit_update_status(harness)
+        emit_update_status(harness)
+        assert harness.charm.reconcile_manager.fast_path_count == 1
+        ensure_sidecar.assert_called_once()
+
+        with harness.hooks_disabled():
+            harness.update_relation_data(
+                harness.charm.state.opensearch_relation.id,
+                "opensearch",
+                {"version": "2.17.1"},
+            )
+        emit_update_status(harness)
+
+    assert ensure_sidecar.call_count == 2
+
+
+def test_changed_relation_data_runs_full_reconcile(harness):
+    emit_update_status(harness)
+
+    with harness.hooks_disabled():
+        harness.update_relation_data(
+            harness.charm.state.opensearch_relation.id,
+            "opensearch",
+            {"endpoints": "111.222.333.444:9200", "version": "2.17.1", "tls-ca": "<ca>"},
+        )
+
+    assert emit_update_status(harness) == 2
+
+
+def test_changed_config_runs_full_reconcile(harness):
+    emit_update_status(harness)
+
+    with harness.hooks_disabled():
+        harness.update_config({"log_level": "ERROR"})
+
+    assert emit_update_status(harness) == 2
+
+
+def test_departed_peer_runs_full_reconcile(harness):
+    peer_rel_id = harness.charm.state.peer_relation.id
+    with harness.hooks_disabled():
+        harness.add_relation_unit(peer_rel_id, "opensearch-dashboards/1")
+    emit_update_status(harness)
+
+    with harness.hooks_disabled():
+        harness.remove_relation_unit(peer_rel_id, "opensearch-dashboards/1")
+
+    assert emit_update_status(harness) == 2
+
+
+def test_expired_window_runs_full_reconcile(harness):
+    emit_update_status(harness)
+
+    with patch("time.time", return_value=time.time() + 601):
+        assert emit_update_status(harness) == 2
+
+
+def test_unhealthy_result_is_not_reused(harness):
+    assert emit_update_status(harness, opensearch_health="red") == 1
+    assert isinstance(harness.charm.app.status, BlockedStatus)
+
+    assert emit_update_status(harness, opensearch_health="red") == 1
+    assert harness.charm.reconcile_manager.fast_path_count == 0
+
+
+def test_zero_window_disables_fast_path(harness):
+    harness._update_config({"reconcile_window": 0})
+
+    assert emit_update_status(harness) == 2
+    assert emit_update_status(harness) == 2
+    assert harness.charm.reconcile_manager.fast_path_count == 0
+
+
+def dispatch_reconciling_thrice(harness) -> int:
+    """Triggers reconcile the three ways a single dispatch can, returning the HTTP probes made.
+
+    `_start` calls it directly, `RequirerEvents` emits `config-changed` after writing the CA,
+    and `_restart` emits `update-status` once the workload is back.
+    """
+    opensearch_relation = harness.charm.state.opensearch_relation
+    with harness.hooks_disabled():
+        harness.update_relation_data(
+            opensearch_relation.id, "opensearch", {"username": "admin", "password": "pass"}
+        )
+
+    with (
+        patch("workload.ODWorkload.alive", return_value=True),
+        patch("workload.ODWorkload.restart"),
+        patch("managers.health.HealthManager.wait_until_ready", return_value=True),
+        patch("workload.ODWorkload.write"),
+        patch("core.cluster.ClusterState.stable", new_callable=PropertyMock, return_value=True),
+        patch("managers.config.ConfigManager.config_changed", return_value=False),
+        patch("managers.tls.TLSManager.certificate_valid", return_value=True),
+        patch("os.path.exists", return_value=True),
+        patch("os.path.getsize", return_value=1),
+        responses.RequestsMock(assert_all_requests_are_fired=False) as mocked_responses,
+    ):
+        mocked_responses.add(
+            method="GET",
+            url="https://111.222.333.444:9200/_cluster/health",
+            json={"status": "green"},
+        )
+        mocked_responses.add(
+            method="GET",
+            url=f"{harness.charm.state.url}/api/status",
+            json={"status": {"overall": {"state": "green"}}},
+        )
+        harness.charm.on.start.emit()
+        harness.charm.on[OPENSEARCH_REL_NAME].relation_changed.emit(
+            opensearch_relation, harness.charm.app
+        )
+        harness.charm._restart(None)
+        harness.framework.commit()
+
+        return len(mocked_responses.calls)
+
+
+def test_reconcile_runs_once_per_dispatch(monkeypatch):
+    immediate = dispatch_reconciling_thrice(build_harness())
+
+    harness = build_harness()
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-start-1")
+    with patch.object(
+        harness.charm, "_reconcile", wraps=harness.charm._reconcile
+    ) as patched_reconcile:
+        scheduled = dispatch_reconciling_thrice(harness)
+
+    logger.info(f"HTTP probes per dispatch: immediate={immediate}, scheduled={scheduled}")
+    assert immediate == 3 * scheduled
+    patched_reconcile.assert_called_once()
+
+
+def test_reconcile_requested_while_reconciling_runs_again(harness, monkeypatch):
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-1")
+    runs = []
+
+    def reconcile(event):
+        runs.append(event)
+        if len(runs) == 1:
+            harness.charm.on.update_status.emit()
+
+    with patch.object(harness.charm, "_reconcile", side_effect=reconcile):
+        harness.charm.on.update_status.emit()
+        harness.charm.on[PEER].relation_changed.emit(harness.charm.state.peer_relation)
+        assert not runs
+
+        harness.framework.commit()
+
+    assert len(runs) == 2
+
+
+def test_reconcile_requests_bounded_per_dispatch(harness, monkeypatch):
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-1")
+
+    with patch.object(
+        harness.charm, "_reconcile", side_effect=lambda _: harness.charm.on.update_status.emit()
+    ) as patched_reconcile:
+        harness.charm.on.update_status.emit()
+        harness.framework.commit()
+
+    assert patched_reconcile.call_count == MAX_RECONCILE_PASSES
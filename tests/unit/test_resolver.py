@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import logging
+import socket
+import time
+from unittest.mock import patch
+
+import pytest
+
+from literals import CHARM_KEY
+from tests.unit.test_state import build_harness
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def harness():
+    return build_harness()
+
+
+def patched_socket(delay: float = 0.0, fail: bool = False):
+    """Patches the socket lookups, counting calls per function."""
+    counts = {"gethostname": 0, "gethostbyname": 0, "getfqdn": 0}
+
+    def lookup(name, value):
+        def wrapper(*args):
+            counts[name] += 1
+            time.sleep(delay)
+            if fail:
+                raise socket.gaierror("Temporary failure in name resolution")
+            return value
+
+        return wrapper
+
+    patches = [
+        patch("socket.gethostname", lookup("gethostname", "juju-1")),
+        patch("socket.gethostbyname", lookup("gethostbyname", "10.0.0.1")),
+        patch("socket.getfqdn", lookup("getfqdn", "juju-1.lxd")),
+    ]
+    return counts, patches
+
+
+def test_lookups_memoized_per_hook(harness, monkeypatch):
+    counts, patches = patched_socket()
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-certificates-relation-created-1")
+
+    with patches[0], patches[1], patches[2]:
+        server = harness.charm.state.unit_server
+        assert server.sans["sans_ip"] == ["10.0.0.1", "10.0.0.1"]
+        assert sorted(server.sans["sans_dns"]) == ["juju-1", "juju-1.lxd"]
+        assert server.private_ip == "10.0.0.1"
+
+    assert counts == {"gethostname": 1, "gethostbyname": 1, "getfqdn": 1}
+
+
+def test_lookups_cached_across_hooks_until_expiry(harness, monkeypatch):
+    counts, patches = patched_socket()
+
+    with patches[0], patches[1], patches[2]:
+        monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-1")
+        assert harness.charm.state.unit_server.fqdn == "juju-1.lxd"
+
+        monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-2")
+        assert harness.charm.state.unit_server.fqdn == "juju-1.lxd"
+        assert counts["getfqdn"] == 1
+
+        monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-3")
+        with patch("time.time", return_value=time.time() + harness.charm.state.resolver.ttl):
+            assert harness.charm.state.unit_server.fqdn == "juju-1.lxd"
+        assert counts["getfqdn"] == 2
+
+
+def test_slow_lookup_times_out_to_last_known_value(harness, monkeypatch):
+    harness.charm.state.resolver.timeout = 0.1
+
+    counts, patches = patched_socket()
+    with patches[0], patches[1], patches[2]:
+        monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-1")
+        assert harness.charm.state.unit_server.fqdn == "juju-1.lxd"
+
+    counts, patches = patched_socket(delay=1)
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-2")
+    with (
+        patches[0],
+        patches[1],
+        patches[2],
+        patch("time.time", return_value=time.time() + harness.charm.state.resolver.ttl),
+    ):
+        start = time.monotonic()
+        assert harness.charm.state.unit_server.fqdn == "juju-1.lxd"
+
+    # hostname, IP and FQDN lookups each give up after the timeout
+    assert time.monotonic() - start < 1
+
+
+def test_failed_lookup_without_known_value(harness, monkeypatch):
+    counts, patches = patched_socket(fail=True)
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-update-status-1")
+
+    with patches[0], patches[1], patches[2]:
+        assert harness.charm.state.unit_server.private_ip == ""
+        assert harness.charm.state.unit_server.sans == {}
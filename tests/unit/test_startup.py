@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+logger = logging.getLogger(__name__)
+
+# Wall time allowed for importing and building the charm on `update-status`, overridable for slow runners
+IMPORT_TIME_BUDGET = float(os.environ.get("CHARM_IMPORT_TIME_BUDGET", "0.5"))
+
+LAZY_MODULES = [
+    "charms.grafana_agent.v0.cos_agent",
+    "charms.tls_certificates_interface.v3.tls_certificates",
+    "charms.data_platform_libs.v0.upgrade",
+    "charms.rolling_ops.v0.rollingops",
+    "cryptography",
+    "cosl",
+    "pydantic",
+]
+
+STARTUP_SCRIPT = """
+import json, sys, time
+from pathlib import Path
+from unittest.mock import patch
+
+start = time.perf_counter()
+import charm
+elapsed = time.perf_counter() - start
+
+from ops.testing import Harness
+
+harness = Harness(
+    charm.OpensearchDasboardsCharm,
+    meta=Path("metadata.yaml").read_text(),
+    actions=Path("actions.yaml").read_text(),
+    config=Path("config.yaml").read_text(),
+)
+with patch("charms.operator_libs_linux.v2.snap.SnapCache"):
+    start = time.perf_counter()
+    harness.begin()
+    elapsed += time.perf_counter() - start
+
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def charm_startup(dispatch_path: str | None) -> dict:
+    """Imports and builds the charm in a fresh interpreter, as a Juju dispatch would."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(["src", "lib", *sys.path]))
+    env.pop("JUJU_DISPATCH_PATH", None)
+    if dispatch_path:
+        env["JUJU_DISPATCH_PATH"] = dispatch_path
+
+    output = subprocess.check_output([sys.executable, "-c", STARTUP_SCRIPT], env=env, text=True)
+    return json.loads(output.splitlines()[-1])
+
+
+def test_update_status_skips_lazy_imports():
+    modules = charm_startup("hooks/update-status")["modules"]
+
+    assert not [module for module in LAZY_MODULES if module in modules]
+
+
+@pytest.mark.parametrize(
+    "dispatch_path,expected",
+    [
+        ("hooks/certificates-relation-changed", "charms.tls_certificates_interface.v3"),
+        ("actions/set-tls-private-key", "charms.tls_certificates_interface.v3"),
+        ("actions/pre-upgrade-check", "charms.data_platform_libs.v0.upgrade"),
+        ("hooks/upgrade-charm", "charms.data_platform_libs.v0.upgrade"),
+        # re-emitting what the libs deferred while their peer relation was missing
+        ("hooks/upgrade-relation-created", "charms.data_platform_libs.v0.upgrade"),
+        ("hooks/restart-relation-created", "charms.rolling_ops.v0.rollingops"),
+        ("hooks/restart-relation-changed", "charms.rolling_ops.v0.rollingops"),
+        ("hooks/leader-elected", "charms.rolling_ops.v0.rollingops"),
+        ("hooks/config-changed", "charms.grafana_agent.v0.cos_agent"),
+        ("hooks/cos-agent-relation-joined", "charms.grafana_agent.v0.cos_agent"),
+    ],
+)
+def test_observing_components_loaded_for_their_events(dispatch_path, expected):
+    modules = charm_startup(dispatch_path)["modules"]
+
+    assert [module for module in modules if module.startswith(expected)]
+
+
+def test_update_status_import_time_within_budget():
+    # best of three, to keep scheduler noise out of the comparison
+    elapsed = min(charm_startup("hooks/update-status")["elapsed"] for _ in range(3))
+    baseline = min(charm_startup(None)["elapsed"] for _ in range(3))
+
+    logger.info(
+        f"charm startup time: update-status={elapsed:.3f}s, all components={baseline:.3f}s"
+    )
+    assert elapsed < IMPORT_TIME_BUDGET
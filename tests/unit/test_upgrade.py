@@ -3,8 +3,9 @@
 # See LICENSE file for licensing details.
 
 import logging
+import time
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import PropertyMock, patch
 
 import pytest
 import yaml
@@ -15,6 +16,7 @@ from ops.testing import Harness
 from charm import OpensearchDasboardsCharm
 from events.upgrade import ODUpgradeEvents, OpensearchDashboardsDependencyModel
 from literals import CHARM_KEY, DEPENDENCIES
+from managers.health import HealthManager
 from src.literals import MSG_INCOMPATIBLE_UPGRADE
 from tests.unit.test_charm import OPENSEARCH_REL_NAME
 from workload import ODWorkload
@@ -56,6 +58,17 @@ def harness():
     return harness
 
 
+@pytest.fixture(autouse=True)
+def serving(mocker):
+    mocker.patch.object(HealthManager, "wait_until_ready", return_value=True)
+
+
+@pytest.fixture(autouse=True)
+def previous_revision(installed_snap):
+    """The unit runs the revision before the one of the charm."""
+    installed_snap.revision = "1"
+
+
 def test_pre_upgrade_check_succeeds(harness, mocker):
     """pre_upgrade_check successful on a healthy system."""
     with patch("workload.ODWorkload.alive", return_value=True):
@@ -192,6 +205,7 @@ def test_upgrade_granted_succeeds(harness, mocker):
     ODWorkload.stop.assert_called_once()
     ODWorkload.install.assert_called_once()
     ODWorkload.restart.assert_called_once()
+    HealthManager.wait_until_ready.assert_called_once()
     ODUpgradeEvents.set_unit_completed.assert_called_once()
     ODUpgradeEvents.set_unit_failed.assert_not_called()
 
@@ -220,3 +234,70 @@ def test_upgrade_granted_recurses_upgrade_changed_on_leader(harness, mocker):
     harness.charm.upgrade_events._on_upgrade_granted(mock_event)
 
     ODUpgradeEvents.on_upgrade_changed.assert_called_once()
+
+
+def test_upgrade_charm_stages_snap(harness, mocker):
+    mocker.patch.object(ODWorkload, "prestage", return_value=True)
+    mocker.patch.object(HealthManager, "ensure_sidecar")
+
+    harness.charm.on.upgrade_charm.emit()
+
+    ODWorkload.prestage.assert_called_once()
+    # running the new code of the charm
+    HealthManager.ensure_sidecar.assert_called_once_with(restart=True)
+
+
+def test_upgrade_granted_skips_installed_revision(harness, mocker):
+    mocker.patch.object(ODWorkload, "up_to_date", new_callable=PropertyMock, return_value=True)
+    mocker.patch.object(ODWorkload, "stop")
+    mocker.patch.object(ODWorkload, "restart")
+    mocker.patch.object(ODWorkload, "install")
+    mocker.patch.object(ODUpgradeEvents, "post_upgrade_check")
+    mocker.patch.object(ODUpgradeEvents, "set_unit_completed")
+
+    harness.charm.upgrade_events._on_upgrade_granted(mocker.MagicMock())
+
+    ODWorkload.stop.assert_not_called()
+    ODWorkload.install.assert_not_called()
+    ODWorkload.restart.assert_not_called()
+    ODUpgradeEvents.set_unit_completed.assert_called_once()
+
+
+def test_benchmark_upgrade_downtime(harness, mocker, tmp_path):
+    """Downtime of a unit upgrading from the store, then from a staged download."""
+    download, swap = 0.2, 0.02
+
+    def snap_cli(command, *args):
+        if command == "download":
+            time.sleep(download)
+            for path in ODWorkload().staged:
+                Path(path).touch()
+        elif command == "install":
+            time.sleep(swap)
+
+    store = mocker.MagicMock()
+    store.ensure.side_effect = lambda *args, **kwargs: time.sleep(download + swap)
+    mocker.patch("workload.snap.SnapCache", return_value={ODWorkload.SNAP_NAME: store})
+    mocker.patch("workload.SNAP_STAGING_DIR", str(tmp_path))
+    mocker.patch.object(ODWorkload, "_snap_cli", side_effect=snap_cli)
+    mocker.patch.object(ODWorkload, "up_to_date", new_callable=PropertyMock, return_value=False)
+    mocker.patch.object(ODWorkload, "stop")
+    mocker.patch.object(ODWorkload, "restart")
+    mocker.patch.object(ODUpgradeEvents, "post_upgrade_check")
+    mocker.patch.object(ODUpgradeEvents, "set_unit_completed")
+
+    def downtime() -> float:
+        start = time.perf_counter()
+        harness.charm.upgrade_events._on_upgrade_granted(mocker.MagicMock())
+        return time.perf_counter() - start
+
+    results = {"store": downtime()}
+    assert harness.charm.workload.prestage()
+    results["staged"] = downtime()
+
+    logger.info(f"upgrade downtime per unit: {results}")
+    assert store.ensure.call_count == 1
+    assert results["staged"] < download
+    assert results["store"] >= download + swap
+    # staged files are removed once installed
+    assert list(tmp_path.iterdir()) == []
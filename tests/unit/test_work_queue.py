@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import logging
+from unittest.mock import PropertyMock, patch
+
+from ops.model import BlockedStatus, MaintenanceStatus
+
+from charm import OpensearchDasboardsCharm
+from events.requirer import RequirerEvents
+from literals import (
+    CHARM_KEY,
+    MSG_INSTALL_FAILED,
+    MSG_STARTING,
+    WORK_INSTALL,
+    WORK_OPENSEARCH_CA,
+    WORK_START,
+)
+from tests.unit.test_reconcile import emit_update_status
+from tests.unit.test_state import build_harness
+
+logger = logging.getLogger(__name__)
+
+HOOKS_UNTIL_STABLE = 10
+
+
+def test_queued_work_runs_once_when_stable():
+    harness = build_harness()
+    opensearch_relation = harness.charm.state.opensearch_relation
+    with harness.hooks_disabled():
+        harness.update_relation_data(
+            opensearch_relation.id, "opensearch", {"username": "admin", "password": "pass"}
+        )
+
+    with (
+        patch.object(
+            OpensearchDasboardsCharm,
+            "_start",
+            autospec=True,
+            side_effect=OpensearchDasboardsCharm._start,
+        ) as start,
+        patch.object(
+            RequirerEvents,
+            "_on_client_relation_changed",
+            autospec=True,
+            side_effect=RequirerEvents._on_client_relation_changed,
+        ) as client_relation_changed,
+        patch("workload.ODWorkload.write") as write,
+        patch("core.cluster.ClusterState.stable", new_callable=PropertyMock) as stable,
+    ):
+        stable.return_value = False
+        harness.charm.on.start.emit()
+        harness.charm.on["opensearch-client"].relation_changed.emit(
+            opensearch_relation, harness.charm.app
+        )
+
+        # each later hook first re-emits whatever was deferred, as `ops.main` does
+        for _ in range(HOOKS_UNTIL_STABLE):
+            harness.framework.reemit()
+            emit_update_status(harness)
+
+        assert harness.charm.state.work_queue.pending == [WORK_START, WORK_OPENSEARCH_CA]
+        assert isinstance(harness.charm.unit.status, MaintenanceStatus)
+
+        stable.return_value = True
+        harness.framework.reemit()
+        emit_update_status(harness)
+
+    executions = start.call_count + client_relation_changed.call_count
+    logger.info(
+        f"handler executions: queued={executions}, "
+        f"deferred={executions * (HOOKS_UNTIL_STABLE + 2)}"
+    )
+    assert start.call_count == 1
+    assert client_relation_changed.call_count == 1
+    assert not list(harness.framework._storage.notices())
+
+    ca_writes = [
+        call
+        for call in write.call_args_list
+        if call.kwargs["path"] == harness.charm.workload.paths.opensearch_ca
+    ]
+    assert len(ca_writes) == 1
+    assert harness.charm.state.work_queue.pending == []
+    assert harness.charm.unit.status.message != MSG_STARTING
+
+
+def test_starting_status_kept_until_reconciled(monkeypatch):
+    harness = build_harness()
+    monkeypatch.setenv("JUJU_CONTEXT_ID", f"{CHARM_KEY}/0-start-1")
+
+    with patch("core.cluster.ClusterState.stable", new_callable=PropertyMock, return_value=True):
+        harness.charm.on.start.emit()
+        assert harness.charm.unit.status == MaintenanceStatus(MSG_STARTING)
+
+        # the start is completed by the reconcile at the end of the dispatch
+        emit_update_status(harness)
+
+    assert harness.charm.unit.status.message != MSG_STARTING
+
+
+def test_queued_work_deduplicated():
+    harness = build_harness()
+
+    with patch("core.cluster.ClusterState.stable", new_callable=PropertyMock, return_value=False):
+        for _ in range(3):
+            harness.charm.on.start.emit()
+
+    assert harness.charm.state.work_queue.pending == [WORK_START]
+
+
+def test_failed_install_retried_until_installed():
+    harness = build_harness()
+
+    with (
+        patch("workload.ODWorkload.up_to_date", new_callable=PropertyMock, return_value=False),
+        patch("workload.ODWorkload.install", return_value=False) as install,
+        patch("charm.OpensearchDasboardsCharm.init_server") as init_server,
+    ):
+        harness.charm.on.install.emit()
+        for _ in range(3):
+            emit_update_status(harness)
+
+        assert install.call_count == 4
+        assert harness.charm.state.work_queue.pending == [WORK_INSTALL]
+        assert harness.charm.unit.status == BlockedStatus(MSG_INSTALL_FAILED)
+        init_server.assert_not_called()
+
+        install.return_value = True
+        emit_update_status(harness)
+
+    assert install.call_count == 5
+    assert harness.charm.state.work_queue.pending == []
+    assert harness.charm.unit.status.message != MSG_INSTALL_FAILED
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import logging
+from unittest.mock import MagicMock, PropertyMock, patch
+
+import pytest
+import responses
+from ops.framework import EventBase
+
+from literals import MSG_STATUS_UNAVAIL, SERVER_PORT, WORKER_UNIT
+from tests.unit.test_health import dashboards_metrics
+from tests.unit.test_state import build_harness
+from workload import ODWorkload
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def harness():
+    return build_harness(workers="3")
+
+
+@pytest.mark.parametrize(
+    "workers,cores,memory,count",
+    [("1", 16, 65536, 1), ("4", 2, 1024, 4), ("auto", 16, 65536, 16), ("auto", 16, 4096, 4)],
+)
+def test_worker_count(workers, cores, memory, count):
+    harness = build_harness(workers=workers)
+    with (
+        patch("workload.ODWorkload.cores", new_callable=PropertyMock, return_value=cores),
+        patch("workload.ODWorkload.memory", new_callable=PropertyMock, return_value=memory),
+    ):
+        assert harness.charm.config_manager.workers.count == count
+
+
+def test_single_worker_serves_unit():
+    harness = build_harness(workers="many")
+    workers = harness.charm.config_manager.workers
+
+    assert not workers.enabled
+    assert workers.urls == [harness.charm.state.url]
+    assert harness.charm.config_manager.load_balancer_config == ""
+    assert not [
+        prop
+        for prop in harness.charm.config_manager.dashboard_properties
+        if prop.startswith("server.port")
+    ]
+
+
+def test_workers_behind_load_balancer(harness):
+    bind_address = harness.charm.state.bind_address
+    config_manager = harness.charm.config_manager
+
+    assert config_manager.workers.ports == [5611, 5612, 5613]
+    assert "server.port: 5611" in config_manager.dashboard_properties
+    properties = config_manager.worker_properties(2)
+    assert [prop for prop in properties if prop.startswith("server.port")] == ["server.port: 5613"]
+    assert [prop for prop in properties if prop.startswith("path.data")] == [
+        f"path.data: {harness.charm.workload.paths.data_path}/workers/2"
+    ]
+
+    load_balancer = config_manager.load_balancer_config
+    assert f"bind {bind_address}:{SERVER_PORT}" in load_balancer
+    for worker, port in enumerate(config_manager.workers.ports):
+        assert f"server worker-{worker} {bind_address}:{port} check" in load_balancer
+
+
+def test_workers_change_restarts(harness):
+    current = harness.charm.config_manager.dashboard_properties
+
+    with (
+        patch("workload.ODWorkload.read", return_value=current),
+        patch("workload.ODWorkload.write") as write,
+        patch("workload.ODWorkload.reload") as reload,
+        patch("workload.ODWorkload.install_load_balancer", return_value=False),
+    ):
+        # not swapped in without the load balancer
+        assert not harness.charm.config_manager.config_changed()
+        write.assert_not_called()
+
+    with (
+        patch("workload.ODWorkload.read", return_value=current),
+        patch("workload.ODWorkload.write") as write,
+        patch("workload.ODWorkload.reload") as reload,
+        patch("workload.ODWorkload.install_load_balancer", return_value=True),
+    ):
+        assert harness.charm.config_manager.config_changed()
+
+    paths = [call.kwargs["path"] for call in write.call_args_list]
+    assert paths == [
+        harness.charm.workload.paths.worker_properties(1),
+        harness.charm.workload.paths.worker_properties(2),
+        harness.charm.workload.paths.properties,
+    ]
+    reload.assert_not_called()
+
+    with (
+        patch("workload.ODWorkload.read", return_value=current),
+        patch(
+            "workload.ODWorkload.load_balancer",
+            new_callable=PropertyMock,
+            return_value=harness.charm.config_manager.load_balancer_config,
+        ),
+    ):
+        assert not harness.charm.config_manager.config_changed()
+
+
+@responses.activate
+def test_every_worker_probed(harness):
+    urls = harness.charm.health_manager.workers.urls
+    for url in urls[:2]:
+        responses.add(
+            method="GET",
+            url=f"{url}/api/status",
+            json={
+                "status": {"overall": {"state": "green"}},
+                "metrics": dashboards_metrics(event_loop_delay=12),
+            },
+        )
+    responses.add(method="GET", url=f"{urls[2]}/api/status", status=503)
+
+    assert harness.charm.health_manager.status_ok() == (False, MSG_STATUS_UNAVAIL)
+    assert len(responses.calls) == 3
+    assert [metrics["up"] for metrics in harness.charm.health_manager.worker_metrics] == [
+        1.0,
+        1.0,
+        0.0,
+    ]
+    assert harness.charm.health_manager.worker_metrics[0]["event_loop_delay_ms"] == 12
+
+
+def test_restart_swaps_load_balancer_in_after_workers(harness):
+    calls = MagicMock()
+    with (
+        patch("workload.ODWorkload.set_workers", calls.set_workers),
+        patch("workload.ODWorkload.restart", calls.restart),
+        patch("workload.ODWorkload.set_load_balancer", calls.set_load_balancer),
+        patch("managers.health.HealthManager.wait_until_ready", return_value=True),
+        patch("core.models.ODServer.started", new_callable=PropertyMock, return_value=True),
+        patch("managers.config.ConfigManager.config_changed", return_value=False),
+    ):
+        harness.charm._restart(EventBase(harness.charm))
+
+    assert [call[0] for call in calls.mock_calls] == [
+        "set_workers",
+        "restart",
+        "set_load_balancer",
+    ]
+    calls.set_workers.assert_called_once_with(3)
+
+
+def test_restart_frees_port_before_single_worker():
+    harness = build_harness()
+    calls = MagicMock()
+    with (
+        patch("workload.ODWorkload.set_workers", calls.set_workers),
+        patch("workload.ODWorkload.restart", calls.restart),
+        patch("workload.ODWorkload.set_load_balancer", calls.set_load_balancer),
+        patch("managers.health.HealthManager.wait_until_ready", return_value=True),
+        patch("core.models.ODServer.started", new_callable=PropertyMock, return_value=True),
+        patch("managers.config.ConfigManager.config_changed", return_value=False),
+    ):
+        harness.charm._restart(EventBase(harness.charm))
+
+    assert [call[0] for call in calls.mock_calls] == [
+        "set_load_balancer",
+        "set_workers",
+        "restart",
+    ]
+    calls.set_load_balancer.assert_called_once_with("")
+
+
+def test_worker_metrics_exported(harness):
+    harness.charm.health_manager.worker_metrics = [
+        {"up": 1.0, "heap_usage_percent": 40.0},
+        {"up": 0.0},
+    ]
+    with (
+        patch("managers.metrics.MetricsManager.record_gauges") as record_gauges,
+        patch("managers.metrics.MetricsManager.ensure_exporter") as ensure_exporter,
+    ):
+        harness.charm._on_commit(EventBase(harness.charm))
+
+    gauges = record_gauges.call_args.args[0]
+    assert gauges["dashboards_worker_up"] == {"worker-0": 1.0, "worker-1": 0.0}
+    assert gauges["dashboards_worker_heap_usage_percent"] == {"worker-0": 40.0}
+    ensure_exporter.assert_called_once()
+
+    jobs = [job.get("job_name") for job in harness.charm._scrape_config()]
+    assert "hook_metrics" in jobs
+
+
+def test_worker_units_bound_to_service(tmp_path):
+    template = tmp_path / "worker@.service"
+    wants = tmp_path / "snap.opensearch-dashboards.opensearch-dashboards-daemon.service.wants"
+
+    def systemctl(args, **kwargs):
+        if args[1] == "enable":
+            wants.mkdir(exist_ok=True)
+            for unit in args[2:]:
+                (wants / unit).touch()
+        elif args[1] == "disable":
+            for unit in args[3:]:
+                (wants / unit).unlink()
+        return ""
+
+    with (
+        patch("workload.WORKER_UNIT_TEMPLATE", str(template)),
+        patch.object(ODWorkload.paths, "data_path", str(tmp_path / "data")),
+        patch("workload.shutil.chown"),
+        patch("workload.subprocess.check_output", side_effect=systemctl) as check_output,
+    ):
+        ODWorkload().set_workers(1)
+        check_output.assert_not_called()
+        assert not template.exists()
+
+        for count in [3, 3, 2, 1, 1]:
+            ODWorkload().set_workers(count)
+
+    unit = template.read_text()
+    assert "PartOf=snap.opensearch-dashboards.opensearch-dashboards-daemon.service" in unit
+    assert "WantedBy=snap.opensearch-dashboards.opensearch-dashboards-daemon.service" in unit
+    assert "Environment=OSD_PATH_CONF=" in unit
+
+    # only the units changing state
+    commands = [call.args[0][1:] for call in check_output.call_args_list]
+    assert commands == [
+        ["daemon-reload"],
+        ["enable", WORKER_UNIT.format(1), WORKER_UNIT.format(2)],
+        ["disable", "--now", WORKER_UNIT.format(2)],
+        ["disable", "--now", WORKER_UNIT.format(1)],
+    ]
+    assert sorted(path.name for path in (tmp_path / "data/workers").iterdir()) == ["1", "2"]
+
+
+def test_workers_reloaded_with_service():
+    with patch("workload.subprocess.check_output") as systemctl:
+        assert ODWorkload().reload()
+
+    assert systemctl.call_args.args[0] == [
+        "systemctl",
+        "kill",
+        "--signal=SIGHUP",
+        "--kill-whom=main",
+        "snap.opensearch-dashboards.opensearch-dashboards-daemon.service",
+        WORKER_UNIT.format("*"),
+    ]
+
+
+def test_load_balancer_managed_by_charm(tmp_path):
+    conf = tmp_path / "haproxy.cfg"
+    conf.write_text("# not ours\n")
+    workload = ODWorkload()
+    with (
+        patch("workload.LOAD_BALANCER_CONF", str(conf)),
+        patch("workload.LOAD_BALANCER_BIN", str(tmp_path / "haproxy")),
+        patch("workload.apt.add_package") as add_package,
+        patch("workload.subprocess.check_output") as systemctl,
+    ):
+        assert workload.load_balancer == ""
+        workload.set_load_balancer("")
+        systemctl.assert_not_called()
+
+        # never installed by the restart applying it
+        content = build_harness(workers="2").charm.config_manager.load_balancer_config
+        workload.set_load_balancer(content)
+        assert workload.load_balancer == ""
+
+        assert workload.install_load_balancer()
+        add_package.assert_called_once_with("haproxy")
+        (tmp_path / "haproxy").touch()
+        assert workload.install_load_balancer()
+        add_package.assert_called_once()
+
+        workload.set_load_balancer(content)
+        assert workload.load_balancer == content
+
+        workload.set_load_balancer("")
+        assert not conf.exists()
+
+    commands = [call.args[0][1:] for call in systemctl.call_args_list]
+    assert commands == [
+        ["enable", "haproxy.service"],
+        ["reload-or-restart", "haproxy.service"],
+        ["disable", "--now", "haproxy.service"],
+    ]
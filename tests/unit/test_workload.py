@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from socketserver import ThreadingUnixStreamServer
+from unittest.mock import MagicMock, patch
+from urllib.parse import urlsplit
+
+import pytest
+from charms.operator_libs_linux.v2 import snap
+
+from core.snapd import SnapdClient
+from workload import ODWorkload
+
+logger = logging.getLogger(__name__)
+
+SNAP = {
+    "name": ODWorkload.SNAP_NAME,
+    "channel": "2/edge",
+    "revision": "21",
+    "confinement": "strict",
+}
+SERVICES = [
+    {"snap": ODWorkload.SNAP_NAME, "name": service, "daemon": "simple", "active": True}
+    for service in [ODWorkload.SNAP_APP_SERVICE, ODWorkload.SNAP_EXPORTER_SERVICE]
+]
+
+
+@pytest.fixture
+def snapd(tmp_path):
+    """A local stand-in for the snapd API socket, counting connections and requests."""
+    seen = {"connections": 0, "requests": []}
+    installed = [dict(SNAP, name=f"other-{i}") for i in range(30)] + [SNAP]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            seen["connections"] += 1
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            seen["requests"].append(path)
+            code, result = 200, None
+            if path == "/v2/snaps":
+                result = installed
+            elif path == f"/v2/snaps/{ODWorkload.SNAP_NAME}":
+                result = SNAP
+            elif path == "/v2/apps":
+                result = SERVICES
+            else:
+                code, result = 404, {"message": "snap not installed", "kind": "snap-not-found"}
+
+            body = json.dumps({"type": "sync", "status-code": code, "result": result}).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def address_string(self):
+            return "snapd"
+
+        def log_message(self, *args):
+            pass
+
+    socket_path = str(tmp_path / "snapd.socket")
+    server = ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    seen["socket_path"] = socket_path
+
+    with patch("workload.SnapdClient", lambda: SnapdClient(socket_path=socket_path)):
+        yield seen
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_snap_looked_up_on_first_use(snapd):
+    workload = ODWorkload()
+    assert snapd["requests"] == []
+
+    assert workload.revision == "21"
+    assert workload.revision == "21"
+    assert snapd["requests"] == [f"/v2/snaps/{ODWorkload.SNAP_NAME}"]
+
+
+def test_snapd_connection_reused(snapd):
+    workload = ODWorkload()
+    for _ in range(5):
+        workload._services_active = False
+        assert workload.alive()
+
+    assert len(snapd["requests"]) == 6
+    assert snapd["connections"] == 1
+    assert workload.snapd.connections == 1
+
+
+def test_active_services_cached_per_hook(snapd):
+    workload = ODWorkload()
+
+    assert workload.alive()
+    assert workload.alive()
+    assert snapd["requests"].count("/v2/apps") == 1
+
+    with patch("charms.operator_libs_linux.v2.snap.Snap.restart"):
+        workload.restart()
+    assert snapd["requests"].count("/v2/apps") == 2
+
+
+def test_inactive_services_not_cached(snapd):
+    SERVICES[1]["active"] = False
+    try:
+        workload = ODWorkload()
+        assert not workload.alive()
+        SERVICES[1]["active"] = True
+        assert workload.alive()
+    finally:
+        SERVICES[1]["active"] = True
+
+
+def test_snapd_errors_raised(snapd):
+    client = SnapdClient(socket_path=snapd["socket_path"])
+    with pytest.raises(snap.SnapAPIError) as e:
+        client.get_installed_snap("missing")
+    assert e.value.code == 404
+
+    with pytest.raises(snap.SnapAPIError):
+        SnapdClient(socket_path=f"{snapd['socket_path']}.missing").get_installed_snap("any")
+
+
+def test_benchmark_hook_snapd_cost(snapd):
+    """A hook reading the revision and checking the services, as in update-status."""
+    hooks = 50
+
+    def snap_cache_hook():
+        # what the snap cache and `alive()` did: all installed snaps, then the services
+        # twice, each on a new connection
+        client = snap.SnapClient(socket_path=snapd["socket_path"])
+        installed = {i["name"]: i for i in client.get_installed_snaps()}
+        assert installed[ODWorkload.SNAP_NAME]["revision"] == "21"
+        for _ in range(2):
+            client.get_installed_snap_apps(ODWorkload.SNAP_NAME)
+
+    def handle_hook():
+        workload = ODWorkload()
+        assert workload.revision == "21"
+        assert workload.alive()
+        assert workload.alive()
+
+    results = {}
+    for name, hook in [("snap cache", snap_cache_hook), ("snap handle", handle_hook)]:
+        snapd["connections"], snapd["requests"] = 0, []
+        start = time.perf_counter()
+        for _ in range(hooks):
+            hook()
+        results[name] = {
+            "ms_per_hook": (time.perf_counter() - start) * 1000 / hooks,
+            "connections": snapd["connections"] / hooks,
+            "requests": len(snapd["requests"]) / hooks,
+        }
+
+    logger.info(f"snapd cost per hook: {results}")
+    assert results["snap cache"]["connections"] == 3
+    assert results["snap handle"]["connections"] == 1
+    assert results["snap handle"]["requests"] == 2
+
+
+def test_install_skipped_when_revision_installed(snapd):
+    workload = ODWorkload()
+    with (
+        patch("workload.OPENSEARCH_DASHBOARDS_SNAP_REVISION", "21"),
+        patch("workload.snap.SnapCache") as cache,
+        patch("workload.subprocess.check_output") as cli,
+    ):
+        assert workload.up_to_date
+        assert workload.install()
+        assert workload.prestage()
+
+    cache.assert_not_called()
+    cli.assert_not_called()
+
+
+def test_staged_snap_installed_without_download(snapd, tmp_path):
+    def snap_cli(args, **kwargs):
+        if args[1] == "download":
+            for path in workload.staged:
+                open(path, "w").close()
+        return ""
+
+    workload = ODWorkload()
+    with (
+        patch("workload.SNAP_STAGING_DIR", str(tmp_path)),
+        patch("workload.subprocess.check_output", side_effect=snap_cli) as cli,
+        patch("workload.snap.SnapCache") as cache,
+        patch("charms.operator_libs_linux.v2.snap.Snap.hold") as hold,
+    ):
+        (tmp_path / "opensearch-dashboards_1.snap").touch()
+        assert workload.prestage()
+        assert sorted(str(path) for path in tmp_path.iterdir()) == sorted(workload.staged)
+
+        assert workload.install()
+        snap_file, assert_file = workload.staged
+
+    commands = [call.args[0][1:] for call in cli.call_args_list]
+    assert commands[0][0] == "download"
+    assert commands[1:] == [["ack", assert_file], ["ack", assert_file], ["install", snap_file]]
+    cache.assert_not_called()
+    hold.assert_called_once()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_staged_snap_installed_when_hold_fails(snapd, tmp_path):
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    workload = ODWorkload()
+    with (
+        patch("workload.SNAP_STAGING_DIR", str(staging)),
+        patch("workload.subprocess.check_output", return_value="") as cli,
+        patch("workload.snap.SnapCache") as cache,
+        patch(
+            "charms.operator_libs_linux.v2.snap.Snap.hold",
+            side_effect=snap.SnapAPIError({}, 500, "error", "snapd unavailable"),
+        ),
+    ):
+        for path in workload.staged:
+            open(path, "w").close()
+        assert workload.install()
+
+    assert [call.args[0][1] for call in cli.call_args_list] == ["ack", "install"]
+    cache.assert_not_called()
+    assert list(staging.iterdir()) == []
+
+
+def test_failed_staging_falls_back_to_store(snapd, tmp_path):
+    workload = ODWorkload()
+    store = MagicMock()
+    with (
+        patch("workload.SNAP_STAGING_DIR", str(tmp_path)),
+        patch(
+            "workload.subprocess.check_output",
+            side_effect=subprocess.CalledProcessError(1, "snap", output="no network"),
+        ),
+        patch("workload.snap.SnapCache", return_value={ODWorkload.SNAP_NAME: store}),
+    ):
+        assert not workload.prestage()
+        assert workload.install()
+
+    store.ensure.assert_called_once()
+
+
+def test_environment_file_set_with_drop_in(tmp_path):
+    workload = ODWorkload()
+    drop_in = tmp_path / "daemon.service.d/environment.conf"
+    environment = tmp_path / "environment"
+    with (
+        patch("workload.DAEMON_DROP_IN", str(drop_in)),
+        patch.object(ODWorkload.paths, "conf_path", str(tmp_path)),
+        patch(
+            "workload.ODWorkload.write", lambda _, content, path: open(path, "w").write(content)
+        ),
+        patch("workload.subprocess.check_output") as systemctl,
+    ):
+        assert workload.environment == []
+
+        workload.set_environment(["UV_THREADPOOL_SIZE=8"])
+        workload.set_environment(
+            ["UV_THREADPOOL_SIZE=16", "NODE_OPTIONS=--max-old-space-size=1024"]
+        )
+
+        assert workload.environment == [
+            "UV_THREADPOOL_SIZE=16",
+            "NODE_OPTIONS=--max-old-space-size=1024",
+        ]
+
+    assert drop_in.read_text() == f"[Service]\nEnvironmentFile=-{environment}\n"
+    systemctl.assert_called_once()
+    assert systemctl.call_args.args[0] == ["systemctl", "daemon-reload"]
+
+
+@pytest.fixture
+def optimizer_cache(tmp_path):
+    """Builds the optimizer cache as the service would, counting the builds."""
+    builds = []
+
+    def start(workload):
+        if not workload.optimizer_cache_warm:
+            os.makedirs(workload.paths.optimizer_cache, exist_ok=True)
+            with open(f"{workload.paths.optimizer_cache}/bundle.js", "w") as f:
+                f.write(workload.revision)
+            builds.append(workload.revision)
+        workload.stamp_optimizer_cache()
+
+    with (
+        patch.object(ODWorkload.paths, "data_path", str(tmp_path / "data")),
+        patch(
+            "workload.ODWorkload.write", lambda _, content, path: open(path, "w").write(content)
+        ),
+    ):
+        yield start, builds
+
+
+def install(workload, revision):
+    """Swaps the snap to `revision`, as the upgrade does."""
+    with (
+        patch("workload.OPENSEARCH_DASHBOARDS_SNAP_REVISION", revision),
+        patch("workload.snap.SnapCache", return_value={ODWorkload.SNAP_NAME: MagicMock()}),
+    ):
+        assert workload.install()
+    workload.dashboards = MagicMock(revision=revision)
+
+
+def test_optimizer_cache_kept_per_revision(snapd, optimizer_cache, tmp_path):
+    start, builds = optimizer_cache
+    data = tmp_path / "data"
+    workload = ODWorkload()
+    assert workload.revision == "21"
+    assert not workload.optimizer_cache_warm
+
+    start(workload)
+    start(workload)
+    assert builds == ["21"]
+    assert workload.optimizer_cache_warm
+
+    install(workload, "22")
+    assert not workload.optimizer_cache_warm
+    start(workload)
+    assert (data / "optimize/bundle.js").read_text() == "22"
+
+    # rolling back restores the cache of the previous revision
+    install(workload, "21")
+    assert workload.optimizer_cache_warm
+    start(workload)
+    assert builds == ["21", "22"]
+    assert (data / "optimize/bundle.js").read_text() == "21"
+    assert sorted(path.name for path in data.iterdir()) == [
+        "optimize",
+        "optimize-22",
+        "optimize.revision",
+    ]
+
+
+def test_partial_optimizer_cache_discarded(snapd, optimizer_cache, tmp_path):
+    data = tmp_path / "data"
+    # interrupted before serving, never stamped
+    (data / "optimize").mkdir(parents=True)
+    (data / "optimize-20").mkdir()
+
+    install(ODWorkload(), "22")
+    assert list(data.iterdir()) == []
+
+
+def test_optimizer_cache_kept_when_install_fails(snapd, optimizer_cache, tmp_path):
+    start, builds = optimizer_cache
+    data = tmp_path / "data"
+    workload = ODWorkload()
+    start(workload)
+    install(workload, "22")
+    start(workload)
+
+    store = MagicMock()
+    store.ensure.side_effect = snap.SnapError("store unreachable")
+    with (
+        patch("workload.OPENSEARCH_DASHBOARDS_SNAP_REVISION", "21"),
+        patch("workload.snap.SnapCache", return_value={ODWorkload.SNAP_NAME: store}),
+    ):
+        assert not workload.install()
+
+    # still on revision 22, and its cache still serves it
+    assert workload.optimizer_cache_warm
+    assert (data / "optimize/bundle.js").read_text() == "22"
+    assert (data / "optimize-21/bundle.js").read_text() == "21"
+    assert builds == ["21", "22"]
+
+
+def test_benchmark_upgrade_rollback_cold_starts(snapd, optimizer_cache, tmp_path):
+    """Optimizer builds of a unit upgraded, rolled back, then upgraded again."""
+    start, builds = optimizer_cache
+
+    results = {}
+    for name, kept in [("rebuilt", False), ("kept", True)]:
+        shutil.rmtree(tmp_path / "data", ignore_errors=True)
+        workload = ODWorkload()
+        start(workload)
+
+        builds.clear()
+        for revision in ["22", "21", "22"]:
+            if not kept:
+                shutil.rmtree(tmp_path / "data")
+            install(workload, revision)
+            start(workload)
+            start(workload)
+        results[name] = len(builds)
+
+    logger.info(f"optimizer builds over an upgrade, rollback and re-upgrade: {results}")
+    assert results == {"rebuilt": 3, "kept": 1}